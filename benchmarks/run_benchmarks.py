@@ -0,0 +1,471 @@
+"""
+性能基准测试
+
+使用 FakeAudioBackend / FakeKeyboardBackend，不需要声卡和显示服务器:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/run_benchmarks.py -o results.json
+
+结果为 JSON，便于在不同版本之间对比。配置和缓存写入临时目录，不影响本机的设置。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+
+# 必须在导入 Qt 和程序模块之前设置
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+WORK_DIR = tempfile.mkdtemp(prefix="musicplayer-bench-")
+os.environ["HOME"] = WORK_DIR
+os.environ["XDG_CONFIG_HOME"] = os.path.join(WORK_DIR, "config")
+os.environ["APPDATA"] = os.path.join(WORK_DIR, "config")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import soundfile as sf
+from PyQt5.QtCore import QSettings
+from PyQt5.QtWidgets import QApplication
+
+from components.group import MusicGroupWidget
+from components.list import MusicListWidget
+from core.backends import FakeAudioBackend, FakeKeyboardBackend
+from core.dedup import ContentIndex
+from core.engine import AudioEngine
+from core.hotkeys import HotkeyIndex
+from core.importer import FolderImporter
+from core.ipc import IpcClient, IpcServer
+from core.library import LibraryStore
+from core.peaks import BUCKETS, PeakCache
+from core.search import SearchIndex
+from core.service import PlayerService
+from core.stream import BufferSource
+
+SAMPLERATE = 48000
+
+
+def stats(values):
+    """毫秒数组的汇总统计"""
+    values = np.asarray(values, dtype='float64')
+    return {
+        "n": int(len(values)),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def write_tone(path, seconds=1.0, samplerate=44100):
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    data = (0.2 * np.sin(2 * np.pi * 440 * t)).astype('float32')
+    sf.write(path, np.column_stack([data, data]), samplerate)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待超时")
+        time.sleep(0.0005)
+
+
+def bench_play_start(app, repeats):
+    """从 play_music / 快捷键触发到第一次音频回调和估算的 DAC 输出时刻"""
+    from main import MusicPlayerApp
+
+    music_path = os.path.join(WORK_DIR, "tone.wav")
+    write_tone(music_path)
+    keyboard = FakeKeyboardBackend()
+    player = MusicPlayerApp(
+        audio_backend=FakeAudioBackend(SAMPLERATE), keyboard_backend=keyboard)
+    player.init_service()
+    player.controller.set_device(0)
+    player.hotkey_matcher.start()
+    player.bind_hotkey("<ctrl>+1", music_path)
+
+    def measure(trigger):
+        metrics = player.controller.metrics
+        metrics.clear()
+        trigger()
+        wait_until(metrics.completed)
+        trace = metrics.completed()[0]
+        player.controller.stop_all()
+        wait_until(lambda: not player.engine.mixer.active)
+        app.processEvents()
+        return trace
+
+    def run(trigger):
+        traces = [measure(trigger) for _ in range(repeats)]
+        return {"first_callback_ms": stats(
+                    [t.stage_ms("first_callback") for t in traces]),
+                "output_ms": stats([t.latency_ms for t in traces])}
+
+    # 第一次播放需要解码 (冷启动)，之后命中缓存
+    cold = measure(lambda: player.play_music(music_path))
+    result = {"cold": {"first_callback_ms": cold.stage_ms("first_callback"),
+                       "decode_ms": cold.decode_ms},
+              "play_music": run(lambda: player.play_music(music_path)),
+              "hotkey": run(lambda: keyboard.tap("<ctrl>+1"))}
+    player.hotkey_matcher.stop()
+    player.controller.shutdown()
+    player.tray_icon.hide()
+    player.deleteLater()
+    return result
+
+
+def bench_ipc(repeats):
+    """本地接口 (无界面模式): 请求往返耗时，以及从发出请求到第一次音频回调的耗时"""
+    music_path = os.path.join(WORK_DIR, "tone.wav")
+    write_tone(music_path)
+    settings = QSettings(os.path.join(WORK_DIR, "ipc.ini"), QSettings.IniFormat)
+    service = PlayerService(os.path.join(WORK_DIR, "ipc"), settings,
+                            FakeAudioBackend(SAMPLERATE))
+    service.start()
+    service.set_device(0)
+    server = IpcServer(service, os.path.join(WORK_DIR, "ipc.sock"))
+    server.start()
+    client = IpcClient(server.socket_path)
+    metrics = service.controller.metrics
+
+    def measure():
+        metrics.clear()
+        start = time.perf_counter()
+        client.request("play", path=music_path)
+        rtt = (time.perf_counter() - start) * 1000
+        wait_until(metrics.completed)
+        first_callback = (metrics.completed()[0].first_callback - start) * 1000
+        client.request("stop")
+        wait_until(lambda: not service.engine.mixer.active)
+        return rtt, first_callback
+
+    measure()  # 第一次需要解码，之后命中缓存
+    rtts, first_callbacks = zip(*[measure() for _ in range(repeats)])
+    client.close()
+    server.stop()
+    service.close()
+    return {"request_rtt_ms": stats(rtts),
+            "request_to_first_callback_ms": stats(first_callbacks)}
+
+
+def bench_queue(tracks):
+    """分组队列播放：曲目之间输出的静音帧数 (下一首没有提前准备好时不为 0)"""
+    music_paths = []
+    for i in range(tracks):
+        music_path = os.path.join(WORK_DIR, f"queue{i:03d}.wav")
+        # 整段都是非零的直流信号，输出中出现 0 就是曲目之间的间隙
+        sf.write(music_path, np.full((SAMPLERATE // 5, 2), 0.1, dtype='float32'),
+                 SAMPLERATE)
+        music_paths.append(music_path)
+    settings = QSettings(os.path.join(WORK_DIR, "queue.ini"), QSettings.IniFormat)
+    settings.setValue("loudness_normalization", False)
+    backend = FakeAudioBackend(SAMPLERATE)
+    service = PlayerService(os.path.join(WORK_DIR, "queue"), settings, backend)
+    service.start()
+    service.set_device(0)
+    played = []
+
+    def on_event(event):
+        if event["event"] == "state" and event["playing"]:
+            played.append(event["path"])
+    service.add_listener(on_event)
+    service.play_queue(music_paths, "sequential")
+    wait_until(lambda: backend.stream is not None)
+    stream = backend.stream
+    callback = stream.callback
+    output = []
+
+    def recording_callback(outdata, frames, time_info, status):
+        callback(outdata, frames, time_info, status)
+        output.append(outdata[:frames, 0].copy())
+    stream.callback = recording_callback
+    wait_until(lambda: not service.playing() and len(played) == tracks,
+               timeout=tracks)
+    service.close()
+    signal = np.concatenate(output)
+    nonzero = np.flatnonzero(signal)
+    gap = 0
+    if len(nonzero):
+        gap = int(np.count_nonzero(signal[nonzero[0]:nonzero[-1] + 1] == 0))
+    return {"tracks": tracks, "played": len(played), "gap_frames": gap}
+
+
+def bench_callback(blocks):
+    """每个音频回调 (混音) 的耗时，按同时播放的声音数分别统计"""
+    result = {}
+    for voices in (1, 4, 8):
+        backend = FakeAudioBackend(SAMPLERATE, threaded=False)
+        engine = AudioEngine(max_voices=voices, backend=backend)
+        engine.set_device(0)
+        data = np.random.uniform(-0.1, 0.1, (SAMPLERATE * 60, 2)).astype('float32')
+        for i in range(voices):
+            engine.play(BufferSource(data, SAMPLERATE), key=i, gain=0.5)
+        stream = backend.stream
+        stream.process(10)  # 预热，同时处理增加声音的请求
+        durations = []
+        for _ in range(blocks):
+            start = time.perf_counter()
+            stream.process()
+            durations.append((time.perf_counter() - start) * 1000)
+        block_ms = stream.blocksize / SAMPLERATE * 1000
+        result[f"voices_{voices}"] = dict(
+            stats(durations), block_ms=block_ms,
+            load=float(np.mean(durations)) / block_ms)
+        engine.close()
+    return result
+
+
+def bench_import(files):
+    """文件夹导入的吞吐量 (扫描 + 探测)，以及同时计算内容摘要时的吞吐量"""
+    root = os.path.join(WORK_DIR, "import")
+    template = os.path.join(WORK_DIR, "short.wav")
+    write_tone(template, seconds=0.05)
+    for i in range(files):
+        directory = os.path.join(root, f"dir{i // 100:03d}")
+        os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(template, os.path.join(directory, f"{i:06d}.wav"))
+
+    def run(content=None):
+        done = threading.Event()
+        result = {}
+
+        def on_finished(accepted, rejected, cancelled):
+            result.update(accepted=accepted, rejected=rejected)
+            done.set()
+
+        start = time.perf_counter()
+        importer = FolderImporter(root, on_finished=on_finished, content=content)
+        importer.start()
+        done.wait()
+        elapsed = time.perf_counter() - start
+        result.update(seconds=elapsed, files_per_second=files / elapsed)
+        if content is not None:
+            # 所有文件都是同一个模板的副本
+            result.update(duplicates=len(importer.duplicates),
+                          unique=content.stats()[1])
+        return result
+
+    result = run()
+    store = LibraryStore(os.path.join(WORK_DIR, "import.db"))
+    result["with_hash"] = run(ContentIndex(store))
+    store.close()
+    return result
+
+
+def bench_update_list(app, sizes):
+    """设置音乐列表并完成一次绘制的耗时"""
+    result = {}
+    hotkeys = HotkeyIndex()
+    widget = MusicListWidget(hotkeys)
+    widget.resize(400, 600)
+    widget.show()
+    for size in sizes:
+        music_files = [f"/music/dir{i // 1000}/track{i:06d}.wav"
+                       for i in range(size)]
+        for i in range(0, size, 10):
+            hotkeys.bind(f"<ctrl>+{i}", music_files[i])
+        start = time.perf_counter()
+        widget.set_music_files(music_files)
+        app.processEvents()
+        widget.grab()  # 强制绘制可见的行
+        result[str(size)] = (time.perf_counter() - start) * 1000
+        hotkeys.clear()
+    widget.close()
+    return result
+
+
+def bench_scroll(app, size, pages):
+    """带波形缩略图的列表逐页滚动，每页重新绘制的耗时"""
+    store = LibraryStore(os.path.join(WORK_DIR, "scroll.db"))
+    peaks = PeakCache(os.path.join(WORK_DIR, "peaks.bin"), store)
+    peaks.load()
+    music_files = [f"/music/dir{i // 1000}/track{i:06d}.wav" for i in range(size)]
+    rng = np.random.default_rng(0)
+    for music_path in music_files:
+        hi = rng.integers(0, 128, BUCKETS)
+        peaks.put(music_path, 0, 0,
+                  np.column_stack([-hi, hi]).astype('int8'))
+    widget = MusicListWidget(HotkeyIndex(), peaks=peaks)
+    widget.resize(400, 600)
+    widget.show()
+    widget.set_music_files(music_files)
+    app.processEvents()
+    view = widget.music_list
+    scrollbar = view.verticalScrollBar()
+    durations = []
+    for page in range(pages):
+        start = time.perf_counter()
+        scrollbar.setValue(scrollbar.maximum() * page // pages)
+        widget.grab()
+        durations.append((time.perf_counter() - start) * 1000)
+    widget.close()
+    peaks.close()
+    store.close()
+    return {"size": size, "page_ms": stats(durations)}
+
+
+def bench_search(size, groups=200):
+    """在所有分组中搜索：建立索引、逐字输入时每次查询、增量更新的耗时"""
+    words = ["kick", "snare", "Airhorn", "applause", "Sad Trombone", "爆炸", "掌声"]
+    per_group = size // groups
+    library = {f"group{g}": [f"/music/pack{g % 37}/{words[i % len(words)]}_{g * per_group + i:06d}.wav"
+                             for i in range(per_group)]
+               for g in range(groups)}
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.rebuild(library)
+    build_ms = (time.perf_counter() - start) * 1000
+    durations = []
+    for query in ["horn", "sad trombone", "爆炸", "group1 snare", "pack3 kick", "0123"]:
+        # 模拟逐字输入
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:end])
+            durations.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for music_path in library["group0"][:100]:
+        index.move(music_path, "group0", "group1")
+    for music_path in library["group2"][:100]:
+        index.remove("group2", music_path)
+    index.add("new", [f"/music/new/track{i}.wav" for i in range(100)])
+    update_ms = (time.perf_counter() - start) * 1000 / 300
+    return {"size": size, "build_ms": round(build_ms, 1),
+            "query_ms": stats(durations), "update_ms": round(update_ms, 3)}
+
+
+def write_legacy_groups(settings, groups):
+    """按旧版本的 QSettings 数组格式写入分组"""
+    settings.beginWriteArray("groups")
+    for i, (group_name, music_files) in enumerate(groups.items()):
+        settings.setArrayIndex(i)
+        settings.setValue("name", group_name)
+        settings.beginWriteArray("music_files", len(music_files))
+        for j, music_path in enumerate(music_files):
+            settings.setArrayIndex(j)
+            settings.setValue("path", music_path)
+        settings.endArray()
+    settings.endArray()
+    settings.sync()
+
+
+def bench_groups(sizes, groups=10):
+    """从旧版本的 QSettings 迁移时 load_groups 的耗时，sizes 为总曲目数"""
+    result = {}
+    for size in sizes:
+        settings_path = os.path.join(WORK_DIR, f"groups-{size}.ini")
+        per_group = size // groups
+        write_legacy_groups(
+            QSettings(settings_path, QSettings.IniFormat),
+            {f"group{g}": [f"/music/group{g}/track{i:06d}.wav"
+                           for i in range(per_group)]
+             for g in range(groups)})
+
+        start = time.perf_counter()
+        loaded = MusicGroupWidget()
+        loaded.load_groups(QSettings(settings_path, QSettings.IniFormat))
+        load_ms = (time.perf_counter() - start) * 1000
+        result[str(size)] = {"load_ms": load_ms}
+    return result
+
+
+def bench_library(sizes, groups=10):
+    """LibraryStore: 单次修改在界面线程上的耗时、批量提交和加载的耗时"""
+    result = {}
+    for size in sizes:
+        store = LibraryStore(os.path.join(WORK_DIR, f"library-{size}.db"))
+        per_group = size // groups
+        start = time.perf_counter()
+        for g in range(groups):
+            store.add_group(f"group{g}")
+            store.add_tracks(f"group{g}", [f"/music/group{g}/track{i:06d}.wav"
+                                           for i in range(per_group)])
+        store.flush()
+        insert_ms = (time.perf_counter() - start) * 1000
+
+        edits = []
+        for i in range(100):
+            start = time.perf_counter()
+            store.move_track(f"/music/group0/track{i:06d}.wav",
+                             "group0", "group1")
+            edits.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        store.flush()
+        commit_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        store.load()
+        load_ms = (time.perf_counter() - start) * 1000
+        store.close()
+        result[str(size)] = {"insert_ms": insert_ms, "edit_ms": stats(edits),
+                             "commit_100_edits_ms": commit_ms,
+                             "load_ms": load_ms}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicPlayer 性能基准测试")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--quick", action="store_true", help="缩小规模，快速运行")
+    parser.add_argument("--only", nargs="+",
+                        choices=["play_start", "ipc", "queue", "callback", "import",
+                                 "update_list", "scroll", "search", "groups",
+                                 "library"],
+                        help="只运行指定的测试")
+    args = parser.parse_args()
+
+    quick = args.quick
+    sizes = [1000, 10000] if quick else [1000, 10000, 100000]
+    only = set(args.only or ["play_start", "ipc", "queue", "callback", "import",
+                             "update_list", "scroll", "search", "groups",
+                             "library"])
+    app = QApplication(sys.argv[:1])
+
+    results = {}
+    try:
+        if "play_start" in only:
+            results["play_start"] = bench_play_start(app, 10 if quick else 50)
+        if "ipc" in only:
+            results["ipc"] = bench_ipc(10 if quick else 50)
+        if "queue" in only:
+            results["queue"] = bench_queue(5 if quick else 20)
+        if "callback" in only:
+            results["callback"] = bench_callback(500 if quick else 5000)
+        if "import" in only:
+            results["import"] = bench_import(500 if quick else 5000)
+        if "update_list" in only:
+            results["update_list_ms"] = bench_update_list(app, sizes)
+        if "scroll" in only:
+            results["scroll"] = bench_scroll(app, 10000, 50 if quick else 200)
+        if "search" in only:
+            results["search"] = bench_search(20000 if quick else 200000)
+        if "groups" in only:
+            results["groups"] = bench_groups(sizes)
+        if "library" in only:
+            results["library"] = bench_library(sizes)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "quick": quick,
+        "results": results,
+    }
+    text = json.dumps(report, indent=4, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import logging
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                             QPushButton, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
+
+from core.metrics import export_report
+
+log = logging.getLogger(__name__)
+
+COLUMNS = ("音乐", "次数", "p50 (ms)", "p95 (ms)", "p99 (ms)", "缓存命中率")
+
+
+class DiagnosticsDialog(QDialog):
+    """显示按键到出声的延迟分位数和播放计数器，支持导出 JSON/CSV"""
+
+    def __init__(self, controller, parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.setWindowTitle("延迟诊断")
+        self.resize(720, 420)
+
+        layout = QVBoxLayout(self)
+        self.counters_label = QLabel()
+        layout.addWidget(self.counters_label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        clear_button = QPushButton("清空记录")
+        clear_button.clicked.connect(self.clear)
+        export_button = QPushButton("导出...")
+        export_button.clicked.connect(self.export)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.close)
+        buttons.addWidget(clear_button)
+        buttons.addStretch()
+        buttons.addWidget(export_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        # 打开期间定时刷新
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        report = self.controller.report()
+        counters = report["counters"]
+        self.counters_label.setText(
+            f"xrun: {counters['xruns']}    "
+            f"缓存命中/未命中: {counters['cache_hits']}/{counters['cache_misses']}    "
+            f"解码: {counters['decodes']} 次, 共 {counters['decode_ms_total']:.0f} ms")
+
+        sounds = report["sounds"]
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(sounds))
+        for row, (music_path, stats) in enumerate(sorted(sounds.items())):
+            hit_rate = stats["cache_hit_rate"]
+            values = (os.path.basename(music_path), stats["count"],
+                      stats["p50"], stats["p95"], stats["p99"],
+                      None if hit_rate is None else hit_rate * 100)
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                    item.setToolTip(music_path)
+                elif value is None:
+                    item.setText("-")
+                else:
+                    # 按数值排序
+                    item.setData(Qt.DisplayRole, round(value, 1))
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+
+    def clear(self):
+        self.controller.metrics.clear()
+        self.refresh()
+
+    def export(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出诊断数据", "latency.json",
+            "JSON (*.json);;CSV (*.csv)")
+        if not file_path:
+            return
+        try:
+            export_report(file_path, self.controller.report(),
+                          self.controller.metrics.completed())
+        except OSError as e:
+            log.error("导出诊断数据失败: %s", e)
+            QMessageBox.warning(self, "导出失败", str(e))
@@ -6,14 +6,18 @@ from PyQt5.QtWidgets import (
     QAbstractItemView, QMenu,)
 from PyQt5.QtCore import Qt, pyqtSignal
 import logging
+from core.playlist import SEQUENTIAL, SHUFFLE, LOOP
 
 log = logging.getLogger(__name__)
 
+PLAY_MODES = ((SEQUENTIAL, "顺序播放"), (SHUFFLE, "随机播放"), (LOOP, "循环播放"))
+
 
 class MusicGroupWidget(QWidget):
     groupSelected = pyqtSignal(str)
-    groupDeleted = pyqtSignal(str)
+    groupDeleted = pyqtSignal(str, list)  # group_name, music_files
     requestMoveMusic = pyqtSignal(str, str)  # music_path, target_group
+    playGroupRequested = pyqtSignal(str, str)  # group_name, mode
 
     def __init__(self):
         super().__init__()
@@ -37,6 +41,12 @@ class MusicGroupWidget(QWidget):
             self.groups[group_name] = music_files if music_files else []
             self.group_list.addItem(group_name)
 
+    def select_group(self, group_name):
+        """只改变列表中的选中项，不发出 groupSelected"""
+        items = self.group_list.findItems(group_name, Qt.MatchExactly)
+        if items:
+            self.group_list.setCurrentItem(items[0])
+
     def on_group_selected(self, item):
         group_name = item.text()
         self.groupSelected.emit(group_name)
@@ -47,6 +57,14 @@ class MusicGroupWidget(QWidget):
             group_name = item.text()
             menu = QMenu()
 
+            play_menu = menu.addMenu("播放分组")
+            for mode, text in PLAY_MODES:
+                action = QAction(text, self)
+                action.triggered.connect(
+                    lambda _, mode=mode: self.playGroupRequested.emit(group_name, mode))
+                play_menu.addAction(action)
+            menu.addSeparator()
+
             delete_action = QAction("删除分组", self)
             delete_action.triggered.connect(
                 lambda: self.delete_group(group_name))
@@ -70,8 +88,8 @@ class MusicGroupWidget(QWidget):
                     self.group_list.takeItem(row)
 
                 # 从字典中移除
-                del self.groups[group_name]
-                self.groupDeleted.emit(group_name)
+                music_files = self.groups.pop(group_name)
+                self.groupDeleted.emit(group_name, music_files)
 
     def get_music_files(self, group_name):
         return self.groups.get(group_name, [])
@@ -92,18 +110,12 @@ class MusicGroupWidget(QWidget):
         else:
             self.groups[target_group] = [music_path]
 
-    def save_groups(self, settings):
-        settings.beginWriteArray("groups")
-        for i, group_name in enumerate(self.groups.keys()):
-            settings.setArrayIndex(i)
-            settings.setValue("name", group_name)
-            settings.beginWriteArray(
-                "music_files", len(self.groups[group_name]))
-            for j, music_path in enumerate(self.groups[group_name]):
-                settings.setArrayIndex(j)
-                settings.setValue("path", music_path)
-            settings.endArray()
-        settings.endArray()
+    def set_groups(self, groups):
+        """用 {分组名: [音乐路径]} 替换所有分组"""
+        self.groups.clear()
+        self.group_list.clear()
+        for group_name, music_files in groups.items():
+            self.add_group(group_name, music_files)
 
     def load_groups(self, settings):
         self.groups.clear()
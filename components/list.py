@@ -1,50 +1,276 @@
 import os
-from PyQt5.QtWidgets import (QPushButton,
-                             QVBoxLayout, QWidget, QLabel,
-
-                             QListWidget, QListWidgetItem,
-                             QHBoxLayout,  QAction,
-                             QMenu)
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import (QVBoxLayout, QWidget, QListView,
+                             QStyledItemDelegate, QStyleOptionViewItem,
+                             QStyleOptionButton, QStyle, QApplication,
+                             QAbstractItemView, QAction, QMenu)
+from PyQt5.QtCore import (Qt, pyqtSignal, QAbstractListModel, QModelIndex,
+                          QEvent, QRect, QSize, QLineF)
+from PyQt5.QtGui import QColor, QPalette
 import logging
+import numpy as np
+from core.hotkeys import HotkeyIndex
+from core.validator import OK, MISSING, UNREADABLE, format_duration
 
 log = logging.getLogger(__name__)
 
+HotkeyRole = Qt.UserRole + 1
+PathRole = Qt.UserRole + 2
+StatusRole = Qt.UserRole + 3
+PeaksRole = Qt.UserRole + 4
+
+STATUS_TEXT = {MISSING: "文件不存在", UNREADABLE: "无法读取"}
+
+
+class MusicListModel(QAbstractListModel):
+    '''音乐列表模型，只在视图请求时才生成某一行的数据'''
+
+    def __init__(self, hotkeys, track_info=None, trim_silence=None, peaks=None):
+        super().__init__()
+        self.music_files = []
+        self.hotkeys = hotkeys  # HotkeyIndex，与主窗口共享
+        # {music_path: TrackInfo}，与主窗口共享，后台检查完成后填充
+        self.track_info = track_info if track_info is not None else {}
+        # 开启了裁剪静音的音乐路径，与 AudioAnalyzer 共享
+        self.trim_silence = trim_silence if trim_silence is not None else set()
+        self.peaks = peaks      # PeakCache，只在绘制可见的行时读取
+        self._rows = {}         # {music_path: row}，路径重复时为第一次出现的行
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.music_files)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        music_path = self.music_files[index.row()]
+        if role == Qt.DisplayRole:
+            name = os.path.basename(music_path)
+            info = self.track_info.get(music_path)
+            if info is None:
+                return name
+            if info.status != OK:
+                return f"{name}  ({STATUS_TEXT.get(info.status, info.status)})"
+            return f"{name}  [{format_duration(info.duration)}]"
+        if role == PathRole:
+            return music_path
+        if role == Qt.ToolTipRole:
+            info = self.track_info.get(music_path)
+            tooltip = music_path
+            if info is not None and info.status == OK:
+                tooltip += (f"\n{format_duration(info.duration)}, "
+                            f"{info.samplerate} Hz, {info.channels} 声道")
+            if music_path in self.trim_silence:
+                tooltip += "\n播放时裁剪首尾静音"
+            return tooltip
+        if role == HotkeyRole:
+            return self.hotkeys.hotkey_for(music_path)
+        if role == StatusRole:
+            info = self.track_info.get(music_path)
+            return info.status if info is not None else None
+        if role == PeaksRole:
+            return self.peaks.get(music_path) if self.peaks is not None else None
+        if role == Qt.ForegroundRole:
+            info = self.track_info.get(music_path)
+            if info is not None and info.status != OK:
+                return QColor(Qt.gray)
+        return None
+
+    def set_music_files(self, music_files):
+        # 复制一份，分组的列表之后的修改通过 insert_paths/remove_path 通知模型
+        self.beginResetModel()
+        self.music_files = list(music_files)
+        self._rows = {}
+        self._reindex(0)
+        self.endResetModel()
+
+    def insert_paths(self, music_paths, row=None):
+        '''在 row 处 (默认末尾) 插入若干行，其他行保持不变'''
+        if not music_paths:
+            return
+        if row is None:
+            row = len(self.music_files)
+        self.beginInsertRows(QModelIndex(), row, row + len(music_paths) - 1)
+        self.music_files[row:row] = music_paths
+        self._reindex(row)
+        self.endInsertRows()
+
+    def remove_path(self, music_path):
+        '''移除一行 (路径重复时移除第一次出现的一行)，返回是否移除'''
+        row = self._rows.get(music_path)
+        if row is None:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.music_files[row]
+        self._reindex(row)
+        self.endRemoveRows()
+        return True
+
+    def _reindex(self, start):
+        '''start 及之后的行号已变化，重新记录这些行的路径'''
+        for path in [p for p, row in self._rows.items() if row >= start]:
+            del self._rows[path]
+        for row in range(start, len(self.music_files)):
+            self._rows.setdefault(self.music_files[row], row)
+
+    def refresh_path(self, music_path):
+        '''只通知某一行数据变化，不重建整个列表'''
+        row = self._rows.get(music_path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def row_of(self, music_path):
+        return self._rows.get(music_path)
+
+    def refresh_all(self):
+        if self.music_files:
+            self.dataChanged.emit(
+                self.index(0), self.index(len(self.music_files) - 1))
+
+
+class HotkeyDelegate(QStyledItemDelegate):
+    '''绘制文件名和右侧的快捷键按钮，不为每一行创建控件'''
+    hotkeyClicked = pyqtSignal(str, object)  # music_path, current_hotkey
+
+    MARGIN = 4
+    WAVEFORM_WIDTH = 120
+
+    def _button_option(self, option, index):
+        hotkey = index.data(HotkeyRole)
+        button = QStyleOptionButton()
+        button.text = "快捷键" + (f" ({hotkey})" if hotkey else "")
+        width = option.fontMetrics.horizontalAdvance(button.text) + 24
+        rect = option.rect
+        button.rect = QRect(rect.right() - width - self.MARGIN,
+                            rect.top() + self.MARGIN // 2,
+                            width, rect.height() - self.MARGIN)
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        return button
+
+    def paint(self, painter, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        widget = opt.widget
+        style = widget.style() if widget else QApplication.style()
+        button = self._button_option(opt, index)
+
+        # 先画整行背景，再在按钮左侧依次画文件名和波形
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, opt, painter, widget)
+        right = button.rect.left() - self.MARGIN
+        peaks = index.data(PeaksRole)
+        if peaks is not None:
+            wave_rect = QRect(right - self.WAVEFORM_WIDTH, opt.rect.top(),
+                              self.WAVEFORM_WIDTH, opt.rect.height())
+            right = wave_rect.left() - self.MARGIN
+            self._paint_waveform(painter, opt, wave_rect, peaks)
+        opt.rect = QRect(opt.rect.left(), opt.rect.top(),
+                         right - opt.rect.left(), opt.rect.height())
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, widget)
+        style.drawControl(QStyle.CE_PushButton, button, painter, widget)
+
+    def _paint_waveform(self, painter, option, rect, peaks):
+        '''把 (min, max) 峰值数组按像素列合并后画成竖线'''
+        width = rect.width()
+        edges = np.linspace(0, len(peaks), width + 1).astype(int)[:-1]
+        lo = np.minimum.reduceat(peaks[:, 0], edges) / 127
+        hi = np.maximum.reduceat(peaks[:, 1], edges) / 127
+        center = rect.center().y()
+        half = (rect.height() - self.MARGIN * 2) / 2
+        left = rect.left()
+        lines = [QLineF(left + x, center - h * half, left + x, center - l * half)
+                 for x, (l, h) in enumerate(zip(lo.tolist(), hi.tolist()))]
+        group = QPalette.Normal if option.state & QStyle.State_Enabled \
+            else QPalette.Disabled
+        color = option.palette.color(
+            group, QPalette.HighlightedText if option.state & QStyle.State_Selected
+            else QPalette.Text)
+        color.setAlpha(140)
+        painter.save()
+        painter.setPen(color)
+        painter.drawLines(lines)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        return QSize(size.width(), max(size.height(), 30))
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.MouseButtonRelease
+                and event.button() == Qt.LeftButton):
+            button = self._button_option(option, index)
+            if button.rect.contains(event.pos()):
+                self.hotkeyClicked.emit(
+                    index.data(PathRole), index.data(HotkeyRole))
+                return True
+        return super().editorEvent(event, model, option, index)
+
 
 class MusicListWidget(QWidget):
     shortcutRequested = pyqtSignal(str, str)  # music_path, current_hotkey
     deleteRequested = pyqtSignal(str)
     moveRequested = pyqtSignal(str)
     playRequested = pyqtSignal(str)
+    trimSilenceRequested = pyqtSignal(str, bool)  # music_path, enabled
 
-    def __init__(self):
+    def __init__(self, hotkeys=None, track_info=None, trim_silence=None,
+                 peaks=None):
         super().__init__()
-        self.music_files = []
-        self.hotkeys = {}  # {hotkey: music_path}
+        self.hotkeys = hotkeys if hotkeys is not None else HotkeyIndex()
+        self.track_info = track_info if track_info is not None else {}
+        self.trim_silence = trim_silence if trim_silence is not None else set()
+        self.peaks = peaks
         self.init_ui()
 
+    def set_analysis(self, trim_silence, peaks):
+        """设置与 AudioAnalyzer 共享的裁剪静音集合和波形缓存"""
+        self.trim_silence = self.model.trim_silence = trim_silence
+        self.peaks = self.model.peaks = peaks
+        self.refresh_all()
+
     def init_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        self.music_list = QListWidget()
+        self.model = MusicListModel(
+            self.hotkeys, self.track_info, self.trim_silence, self.peaks)
+        self.delegate = HotkeyDelegate(self)
+        self.delegate.hotkeyClicked.connect(
+            lambda mp, hk: self.shortcutRequested.emit(mp, hk or ""))
+
+        self.music_list = QListView()
+        self.music_list.setModel(self.model)
+        self.music_list.setItemDelegate(self.delegate)
+        # 所有行等高，视图只需布局可见的行
+        self.music_list.setUniformItemSizes(True)
+        self.music_list.setSelectionMode(QAbstractItemView.SingleSelection)
         self.music_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.music_list.customContextMenuRequested.connect(
             self.show_music_context_menu)
-        self.music_list.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.music_list.doubleClicked.connect(self.on_item_double_clicked)
         layout.addWidget(self.music_list)
 
-    def on_item_double_clicked(self, item):
+    def on_item_double_clicked(self, index):
         '''双击播放'''
-        index = self.music_list.row(item)
-        music_path = self.music_files[index]
-        self.playRequested.emit(music_path)
+        self.playRequested.emit(index.data(PathRole))
+
+    def selected_music(self):
+        indexes = self.music_list.selectionModel().selectedIndexes()
+        if not indexes:
+            return None
+        return indexes[0].data(PathRole)
+
+    def select_music(self, music_path):
+        '''选中并滚动到某一行'''
+        row = self.model.row_of(music_path)
+        if row is None:
+            return
+        index = self.model.index(row)
+        self.music_list.setCurrentIndex(index)
+        self.music_list.scrollTo(index, QAbstractItemView.PositionAtCenter)
 
     def show_music_context_menu(self, pos):
-        item = self.music_list.itemAt(pos)
-        if item:
-            index = self.music_list.row(item)
-            music_path = self.music_files[index]
+        index = self.music_list.indexAt(pos)
+        if index.isValid():
+            music_path = index.data(PathRole)
 
             menu = QMenu()
 
@@ -55,8 +281,16 @@ class MusicListWidget(QWidget):
             move_action = QAction("移动到其他分组", self)
             move_action.triggered.connect(lambda: self.move_music(music_path))
 
+            trim_action = QAction("裁剪首尾静音", self)
+            trim_action.setCheckable(True)
+            trim_action.setChecked(music_path in self.trim_silence)
+            trim_action.toggled.connect(
+                lambda checked: self.trimSilenceRequested.emit(music_path, checked))
+
             menu.addAction(delete_action)
             menu.addAction(move_action)
+            menu.addSeparator()
+            menu.addAction(trim_action)
             menu.exec_(self.music_list.mapToGlobal(pos))
 
     def delete_music(self, music_path):
@@ -66,75 +300,20 @@ class MusicListWidget(QWidget):
         self.moveRequested.emit(music_path)
 
     def set_music_files(self, music_files):
-        self.music_files = music_files
-        self.update_list()
-
-    def update_list(self):
-        self.music_list.clear()
-
-        for music_path in self.music_files:
-            item = QListWidgetItem()
-            widget = QWidget()
-            layout = QHBoxLayout()
-            widget.setLayout(layout)
-
-            music_name = os.path.basename(music_path)
-            label = QLabel(music_name)
-
-            # 查找当前音乐是否有快捷键
-            current_hotkey = None
-            for hotkey, path in self.hotkeys.items():
-                if path == music_path:
-                    current_hotkey = hotkey
-                    break
-
-            btn = QPushButton(
-                "快捷键" + (f" ({current_hotkey})" if current_hotkey else ""))
-            btn.clicked.connect(
-                lambda _, mp=music_path, hk=current_hotkey: self.shortcutRequested.emit(mp, hk))
-            layout.addWidget(label)
-            layout.addWidget(btn)
-            layout.setStretch(0, 1)
-
-            item.setSizeHint(widget.sizeHint())
-            self.music_list.addItem(item)
-            self.music_list.setItemWidget(item, widget)
-
-    def set_hotkey(self, music_path, hotkey):
-        # 先移除任何现有的相同快捷键
-        if hotkey in self.hotkeys:
-            del self.hotkeys[hotkey]
-
-        # 移除该音乐的任何现有快捷键
-        for h, path in list(self.hotkeys.items()):
-            if path == music_path:
-                del self.hotkeys[h]
-
-        if hotkey:  # 如果hotkey不是None或空字符串
-            self.hotkeys[hotkey] = music_path
-
-        self.update_list()
-
-    def get_hotkey_for_music(self, music_path):
-        for hotkey, path in self.hotkeys.items():
-            if path == music_path:
-                return hotkey
-        return None
+        self.model.set_music_files(music_files)
+
+    def add_music(self, music_paths):
+        '''在列表末尾追加，不重建整个列表'''
+        self.model.insert_paths(list(music_paths))
+
+    def remove_music(self, music_path):
+        self.model.remove_path(music_path)
+
+    def refresh_music(self, *music_paths):
+        '''快捷键等数据变化后只刷新对应的行'''
+        for music_path in music_paths:
+            if music_path:
+                self.model.refresh_path(music_path)
 
-    def save_hotkeys(self, settings):
-        settings.beginWriteArray("hotkeys")
-        for i, (hotkey, music_path) in enumerate(self.hotkeys.items()):
-            settings.setArrayIndex(i)
-            settings.setValue("hotkey", hotkey)
-            settings.setValue("music_path", music_path)
-        settings.endArray()
-
-    def load_hotkeys(self, settings):
-        self.hotkeys.clear()
-        size = settings.beginReadArray("hotkeys")
-        for i in range(size):
-            settings.setArrayIndex(i)
-            hotkey = settings.value("hotkey")
-            music_path = settings.value("music_path")
-            self.hotkeys[hotkey] = music_path
-        settings.endArray()
+    def refresh_all(self):
+        self.model.refresh_all()
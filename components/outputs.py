@@ -0,0 +1,80 @@
+import logging
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                             QPushButton, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QDoubleSpinBox)
+from PyQt5.QtCore import Qt
+
+log = logging.getLogger(__name__)
+
+COLUMNS = ("输出设备", "音量 (dB)")
+
+
+class OutputDevicesDialog(QDialog):
+    """选择同时输出的设备，并分别设置每个设备的音量"""
+
+    def __init__(self, devices, primary, primary_gain_db, extra, parent=None):
+        """
+        :param devices: [(device_id, name)]
+        :param primary: 主设备 (设备下拉框中选择的设备)，总是输出
+        :param extra: {device_id: gain_db}，已启用的附加设备
+        """
+        super().__init__(parent)
+        self.setWindowTitle("多设备输出")
+        self.resize(520, 320)
+        self.devices = devices
+        self.primary = primary
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("勾选的设备与主设备同时播放，每个设备可以单独设置音量:"))
+
+        self.table = QTableWidget(len(devices), len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.Stretch)
+        self.spin_boxes = []
+        for row, (device_id, name) in enumerate(devices):
+            item = QTableWidgetItem(name)
+            if device_id == primary:
+                item.setText(f"{name} (主设备)")
+                item.setFlags(Qt.ItemIsEnabled)
+                item.setCheckState(Qt.Checked)
+                gain_db = primary_gain_db
+            else:
+                item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsUserCheckable)
+                item.setCheckState(
+                    Qt.Checked if device_id in extra else Qt.Unchecked)
+                gain_db = extra.get(device_id, 0.0)
+            self.table.setItem(row, 0, item)
+            spin_box = QDoubleSpinBox()
+            spin_box.setRange(-60.0, 12.0)
+            spin_box.setSingleStep(1.0)
+            spin_box.setDecimals(1)
+            spin_box.setValue(gain_db)
+            self.table.setCellWidget(row, 1, spin_box)
+            self.spin_boxes.append(spin_box)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        ok_button = QPushButton("确定")
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("取消")
+        cancel_button.clicked.connect(self.reject)
+        buttons.addStretch()
+        buttons.addWidget(ok_button)
+        buttons.addWidget(cancel_button)
+        layout.addLayout(buttons)
+
+    def result_outputs(self):
+        """返回 (主设备音量 dB, {附加设备: 音量 dB})"""
+        primary_gain_db = 0.0
+        extra = {}
+        for row, (device_id, _) in enumerate(self.devices):
+            gain_db = self.spin_boxes[row].value()
+            if device_id == self.primary:
+                primary_gain_db = gain_db
+            elif self.table.item(row, 0).checkState() == Qt.Checked:
+                extra[device_id] = gain_db
+        return primary_gain_db, extra
@@ -0,0 +1,89 @@
+import os
+from PyQt5.QtWidgets import (QVBoxLayout, QWidget, QLineEdit, QListWidget,
+                             QListWidgetItem)
+from PyQt5.QtCore import Qt, pyqtSignal, QEvent
+import logging
+
+log = logging.getLogger(__name__)
+
+# 最多显示的结果数
+MAX_RESULTS = 50
+
+
+class SearchWidget(QWidget):
+    '''在所有分组中搜索音乐，输入时即时显示结果'''
+    resultActivated = pyqtSignal(str, str)  # group_name, music_path
+
+    def __init__(self, index):
+        """
+        :param index: SearchIndex，与主窗口共享，由主窗口在音乐库变化时更新
+        """
+        super().__init__()
+        self.index = index
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索所有分组 (文件名、分组名、路径)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.update_results)
+        self.search_edit.returnPressed.connect(self.activate_current)
+        self.search_edit.installEventFilter(self)
+        layout.addWidget(self.search_edit)
+
+        self.result_list = QListWidget()
+        self.result_list.setMaximumHeight(200)
+        self.result_list.itemActivated.connect(self.on_item_activated)
+        self.result_list.itemClicked.connect(self.on_item_activated)
+        self.result_list.hide()
+        layout.addWidget(self.result_list)
+
+    def focus_search(self):
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+
+    def update_results(self, text=None):
+        if text is None:
+            text = self.search_edit.text()
+        self.result_list.clear()
+        if not text.strip():
+            self.result_list.hide()
+            return
+        for group_name, music_path in self.index.search(text, MAX_RESULTS):
+            item = QListWidgetItem(
+                f"{os.path.basename(music_path)}  —  {group_name}")
+            item.setToolTip(music_path)
+            item.setData(Qt.UserRole, (group_name, music_path))
+            self.result_list.addItem(item)
+        if self.result_list.count():
+            self.result_list.setCurrentRow(0)
+        self.result_list.setVisible(self.result_list.count() > 0)
+
+    def eventFilter(self, obj, event):
+        # 在搜索框中用上下键选择结果，焦点留在搜索框中
+        if (obj is self.search_edit and event.type() == QEvent.KeyPress
+                and event.key() in (Qt.Key_Up, Qt.Key_Down)
+                and self.result_list.count()):
+            step = -1 if event.key() == Qt.Key_Up else 1
+            row = self.result_list.currentRow() + step
+            self.result_list.setCurrentRow(
+                max(0, min(row, self.result_list.count() - 1)))
+            return True
+        if (obj is self.search_edit and event.type() == QEvent.KeyPress
+                and event.key() == Qt.Key_Escape):
+            self.search_edit.clear()
+            return True
+        return super().eventFilter(obj, event)
+
+    def activate_current(self):
+        item = self.result_list.currentItem()
+        if item is not None:
+            self.on_item_activated(item)
+
+    def on_item_activated(self, item):
+        group_name, music_path = item.data(Qt.UserRole)
+        self.resultActivated.emit(group_name, music_path)
@@ -0,0 +1,259 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+HOP_SECONDS = 0.1         # 能量按 100ms 一块计算
+WINDOW_HOPS = 4           # 400ms 窗口，75% 重叠
+ABSOLUTE_GATE_DB = -70.0
+RELATIVE_GATE_DB = -10.0
+PEAK_CEILING_DB = -1.0    # 增益后的峰值上限
+MAX_BOOST_DB = 12.0
+MAX_CUT_DB = -24.0
+SILENCE_THRESHOLD = 10 ** (-60 / 20)  # -60 dBFS 以下视为静音
+PRE_ROLL_SECONDS = 0.005  # 保留起音前的一小段，避免切掉瞬态
+# 文件数达到该值时使用进程池，少量文件直接在当前线程中分析
+PROCESS_POOL_THRESHOLD = 8
+# 进程池用 spawn 启动子进程：本进程中有 Qt、音频和数据库线程，
+# fork 出的子进程可能继承一把被其他线程持有的锁而死锁
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _db(power):
+    return 10 * np.log10(power)
+
+
+def gated_loudness(energies):
+    """
+    由每 100ms 的能量 (各声道均方和) 计算门限积分响度 (dB)
+
+    窗口和门限与 ITU-R BS.1770 相同 (400ms 窗口、-70 dB 绝对门限、-10 dB 相对门限)，
+    但不做 K 计权。全部低于门限 (静音) 时返回 None。
+    """
+    energies = np.asarray(energies, dtype='float64')
+    if len(energies) == 0:
+        return None
+    if len(energies) < WINDOW_HOPS:
+        windows = np.array([energies.mean()])
+    else:
+        windows = np.convolve(energies, np.full(WINDOW_HOPS, 1 / WINDOW_HOPS),
+                              mode='valid')
+    with np.errstate(divide='ignore'):
+        levels = _db(windows)
+    gated = windows[levels > ABSOLUTE_GATE_DB]
+    if len(gated) == 0:
+        return None
+    threshold = _db(gated.mean()) + RELATIVE_GATE_DB
+    with np.errstate(divide='ignore'):
+        gated = gated[_db(gated) > threshold]
+    return float(_db(gated.mean()))
+
+
+def measure_file(music_path):
+    """
+    分块读取整个文件，返回 (loudness, peak, start_s, end_s)，不把整个文件解码到内存
+
+    start_s/end_s 是第一个和最后一个高于静音阈值的采样的时刻 (秒)，
+    与采样率无关，可以直接用于转换后的数据。
+    在进程池中执行，只依赖 numpy 和 soundfile。
+    """
+    import soundfile as sf
+    with sf.SoundFile(music_path) as f:
+        samplerate = f.samplerate
+        hop = max(1, int(samplerate * HOP_SECONDS))
+        energies = []
+        peak = 0.0
+        rest = None
+        offset = 0
+        first = last = None
+        for block in f.blocks(blocksize=hop * 50, dtype='float32',
+                              always_2d=True):
+            if len(block):
+                level = np.abs(block).max(axis=1)
+                peak = max(peak, float(level.max()))
+                loud = np.flatnonzero(level > SILENCE_THRESHOLD)
+                if len(loud):
+                    if first is None:
+                        first = offset + loud[0]
+                    last = offset + loud[-1] + 1
+                offset += len(block)
+            if rest is not None:
+                block = np.concatenate([rest, block])
+            n = len(block) // hop
+            if n:
+                frames = block[:n * hop].reshape(n, hop, block.shape[1])
+                energies.append(np.square(frames).mean(axis=1).sum(axis=1))
+            rest = block[n * hop:]
+        if rest is not None and len(rest):
+            energies.append(np.square(rest).mean(axis=0).sum(keepdims=True))
+    energies = np.concatenate(energies) if energies else np.zeros(0)
+    if first is None:
+        # 整个文件都是静音，不裁剪
+        start_s, end_s = 0.0, offset / samplerate
+    else:
+        start_s = max(0.0, float(first) / samplerate - PRE_ROLL_SECONDS)
+        end_s = float(last) / samplerate
+    return gated_loudness(energies), peak, start_s, end_s
+
+
+def _measure(music_path):
+    """进程池的任务：返回 (path, mtime_ns, size, *measure_file)，失败时返回 None"""
+    try:
+        st = os.stat(music_path)
+        result = measure_file(music_path)
+    except Exception:
+        return None
+    return (music_path, st.st_mtime_ns, st.st_size) + result
+
+
+def compute_gain(loudness, peak, target_db):
+    """把响度调整到 target_db 的线性增益，同时保证峰值不超过上限"""
+    if loudness is None:
+        return 1.0
+    gain_db = min(target_db - loudness, MAX_BOOST_DB)
+    if peak > 0:
+        gain_db = min(gain_db, PEAK_CEILING_DB - 20 * np.log10(peak))
+    gain_db = max(gain_db, MAX_CUT_DB)
+    return float(10 ** (gain_db / 20))
+
+
+class AudioAnalyzer:
+    """
+    音频分析：响度标准化和首尾静音
+
+    一次读取同时得到响度、峰值和首尾静音的位置，结果按 (mtime, size) 保存在
+    LibraryStore 中，文件不变时不会重复分析。每个文件的增益预先算好放在字典里，
+    播放时 gain_for 只是一次查找，混音器对整段声音乘以同一个增益；
+    开启了裁剪静音的文件由 trim_for 给出播放的起止时刻。
+    给出 content (ContentIndex) 时按规范路径保存结果，内容相同的文件只分析一次；
+    裁剪静音是每个路径单独的选项。
+    """
+
+    def __init__(self, store, target_db=-18.0, enabled=True, content=None,
+                 on_stale=None):
+        """
+        :param on_stale: on_stale(music_path)，播放时发现文件在分析后被修改时调用，
+                         用于安排重新分析
+        """
+        self.store = store
+        self.content = content
+        self.on_stale = on_stale
+        self.target_db = target_db
+        self.enabled = enabled  # 是否启用响度标准化
+        # {path: (mtime_ns, size, loudness, peak, start_s, end_s)}
+        self._results = {}
+        self._gains = {}        # {path: 线性增益}
+        self._stale = set()     # 已安排重新分析的路径，避免重复安排
+        self.trim_silence = store.load_trim_silence()  # 开启了裁剪静音的音乐路径
+        self._loaded = False
+        self._lock = threading.Lock()  # 同一时间只运行一个分析任务
+
+    def _key(self, music_path):
+        if self.content is None:
+            return music_path
+        return self.content.canonical(music_path)
+
+    def gain_for(self, music_path):
+        if not self.enabled:
+            return 1.0
+        return self._gains.get(self._key(music_path), 1.0)
+
+    def offsets(self, music_path):
+        """
+        返回去掉首尾静音后的 (start_s, end_s)，尚未分析时返回 None
+
+        与 AudioCache 一样按 (mtime_ns, size) 检查，文件在分析后被修改时也返回 None
+        (按原样播放)，并通过 on_stale 安排重新分析。
+        """
+        # 规范路径的文件有变化时 resolve 返回原路径
+        key = (self.content.resolve(music_path) if self.content is not None
+               else music_path)
+        result = self._results.get(key)
+        if result is None:
+            return None
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        if result[:2] != (st.st_mtime_ns, st.st_size):
+            if self.on_stale is not None and key not in self._stale:
+                self._stale.add(key)
+                self.on_stale(music_path)
+            return None
+        return result[4:6]
+
+    def trim_for(self, music_path):
+        """播放时使用：未开启裁剪静音时返回 None"""
+        if music_path not in self.trim_silence:
+            return None
+        return self.offsets(music_path)
+
+    def set_trim_silence(self, music_path, enabled):
+        if enabled:
+            self.trim_silence.add(music_path)
+        else:
+            self.trim_silence.discard(music_path)
+        self.store.set_trim_silence(music_path, enabled)
+
+    def set_target(self, target_db):
+        self.target_db = target_db
+        self._gains = {path: compute_gain(r[2], r[3], target_db)
+                       for path, r in self._results.items()}
+
+    def analyze(self, music_paths, workers=None, cancel=None):
+        """
+        分析尚未分析或已变化的文件，返回新分析的文件数，需在后台线程中调用
+
+        :param cancel: threading.Event，设置后不再分析剩下的文件，已完成的结果照常保存
+        """
+        with self._lock:
+            if not self._loaded:
+                self._results = self.store.load_analysis()
+                self.set_target(self.target_db)
+                self._loaded = True
+
+            todo = []
+            for music_path in dict.fromkeys(map(self._key, music_paths)):
+                try:
+                    st = os.stat(music_path)
+                except OSError:
+                    continue
+                result = self._results.get(music_path)
+                if result is None or result[:2] != (st.st_mtime_ns, st.st_size):
+                    todo.append(music_path)
+            if not todo:
+                return 0
+
+            start = time.perf_counter()
+            rows = []
+            if len(todo) >= PROCESS_POOL_THRESHOLD:
+                with ProcessPoolExecutor(workers, mp_context=POOL_CONTEXT) as pool:
+                    for row in pool.map(_measure, todo, chunksize=4):
+                        if cancel is not None and cancel.is_set():
+                            pool.shutdown(cancel_futures=True)
+                            break
+                        rows.append(row)
+            else:
+                for music_path in todo:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    rows.append(_measure(music_path))
+            rows = [r for r in rows if r is not None]
+
+            gains = dict(self._gains)
+            for path, *result in rows:
+                self._results[path] = tuple(result)
+                self._stale.discard(path)
+                gains[path] = compute_gain(result[2], result[3], self.target_db)
+            # 整体替换，播放线程读取时不会看到修改到一半的字典
+            self._gains = gains
+            self.store.update_analysis(rows)
+            log.info("音频分析: %d 个文件, 失败 %d 个, 用时 %.2fs", len(rows),
+                     len(todo) - len(rows), time.perf_counter() - start)
+            return len(rows)
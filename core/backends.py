@@ -0,0 +1,205 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from core.hotkeys import MODIFIERS, parse_hotkey
+
+log = logging.getLogger(__name__)
+
+# 与 sounddevice 回调的 time 参数字段相同
+TimeInfo = namedtuple(
+    "TimeInfo", ["inputBufferAdcTime", "outputBufferDacTime", "currentTime"])
+
+
+class SoundDeviceBackend:
+    """
+    通过 sounddevice (PortAudio) 输出到真实设备
+
+    sounddevice 在第一次使用时才导入：加载 PortAudio 较慢，不放在程序启动路径上。
+    """
+
+    def query_devices(self):
+        """返回 ([(device_id, name)], 默认输出设备)，只包含输出设备"""
+        import sounddevice as sd
+        devices = [(i, device['name'])
+                   for i, device in enumerate(sd.query_devices())
+                   if device['max_output_channels'] > 0]
+        return devices, sd.default.device[1]
+
+    def device_info(self, device_id):
+        import sounddevice as sd
+        return sd.query_devices(device_id, 'output')
+
+    def open_stream(self, **kwargs):
+        import sounddevice as sd
+        return sd.OutputStream(**kwargs)
+
+
+class FakeAudioBackend:
+    """
+    不需要声卡的本地输出，用于基准测试和无音频设备的环境
+
+    threaded=True 时由后台线程持续拉取回调：realtime=True 按块时长模拟实时节奏，
+    否则尽可能快地调用。threaded=False 时只在调用 FakeOutputStream.process 时执行回调。
+    devices 为模拟的输出设备数，编号从 0 开始，格式都相同。
+    """
+
+    def __init__(self, samplerate=48000, channels=2, realtime=True,
+                 threaded=True, output_latency=0.01, devices=1):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.realtime = realtime
+        self.threaded = threaded
+        self.output_latency = output_latency
+        self.devices = devices
+        self.stream = None  # 最近打开的输出流
+        self.streams = {}   # {device_id: 最近为该设备打开的输出流}
+
+    def query_devices(self):
+        return [(i, self._name(i)) for i in range(self.devices)], 0
+
+    def device_info(self, device_id):
+        return {"name": self._name(device_id or 0),
+                "default_samplerate": float(self.samplerate),
+                "max_output_channels": self.channels}
+
+    @staticmethod
+    def _name(device_id):
+        return "Fake Output" if device_id == 0 else f"Fake Output {device_id}"
+
+    def open_stream(self, samplerate, channels, blocksize, callback,
+                    device=None, **kwargs):
+        self.stream = FakeOutputStream(
+            callback, samplerate, channels, blocksize or 1024,
+            self.realtime, self.threaded, self.output_latency)
+        self.streams[device] = self.stream
+        return self.stream
+
+
+class FakeOutputStream:
+    """模拟的输出流，回调的数据直接丢弃"""
+
+    def __init__(self, callback, samplerate, channels, blocksize,
+                 realtime=True, threaded=True, output_latency=0.01):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.threaded = threaded
+        self.output_latency = output_latency
+        self.blocks = 0
+        self._outdata = np.zeros((blocksize, channels), dtype='float32')
+        self._running = threading.Event()
+        self._thread = None
+
+    @property
+    def active(self):
+        return self._running.is_set()
+
+    def start(self):
+        self._running.set()
+        if self.threaded:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def process(self, blocks=1):
+        """同步执行若干次回调 (threaded=False 时使用)"""
+        for _ in range(blocks):
+            now = time.perf_counter()
+            self.callback(self._outdata, self.blocksize,
+                          TimeInfo(0.0, now + self.output_latency, now), 0)
+            self.blocks += 1
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        deadline = time.perf_counter()
+        while self._running.is_set():
+            self.process()
+            if self.realtime:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # 落后太多时不追赶，相当于一次 xrun
+                    deadline = time.perf_counter()
+
+
+class PynputKeyboardBackend:
+    """通过 pynput 监听全局键盘事件"""
+
+    def listen(self, on_press, on_release):
+        """开始监听，返回带 stop() 的监听器"""
+        # 延迟导入：pynput 导入时会连接显示服务器
+        from pynput import keyboard
+        listener = keyboard.Listener(
+            on_press=on_press, on_release=on_release, daemon=True)
+        listener.start()
+        return listener
+
+
+# 模拟的按键对象：与 pynput 相同，特殊键有 name，普通键有 char，
+# vk 为虚拟键码 (可选，用于模拟按下和松开时字符不同的情况)
+FakeKey = namedtuple("FakeKey", ["name", "char", "vk"], defaults=[None])
+
+
+class FakeKeyboardBackend:
+    """由程序注入按键事件的键盘，用于基准测试和没有显示服务器的环境"""
+
+    def __init__(self):
+        self._listeners = []
+
+    def listen(self, on_press, on_release):
+        listener = _FakeListener(self, on_press, on_release)
+        self._listeners.append(listener)
+        return listener
+
+    @staticmethod
+    def key(name):
+        """按 pynput 的规则构造按键: 单个字符为普通键，其余为特殊键"""
+        name = name.lower()
+        if len(name) == 1:
+            return FakeKey(None, name)
+        return FakeKey(name, None)
+
+    def press(self, name):
+        for listener in list(self._listeners):
+            listener.on_press(self.key(name))
+
+    def release(self, name):
+        for listener in list(self._listeners):
+            listener.on_release(self.key(name))
+
+    def tap(self, hotkey):
+        """按下并松开一个 "<ctrl>+a" 形式的组合键"""
+        mask, key_name = parse_hotkey(hotkey)
+        modifiers = [name for name, bit in MODIFIERS.items() if mask & bit]
+        for name in modifiers:
+            self.press(name)
+        self.press(key_name)
+        self.release(key_name)
+        for name in reversed(modifiers):
+            self.release(name)
+
+
+class _FakeListener:
+    def __init__(self, backend, on_press, on_release):
+        self.backend = backend
+        self.on_press = on_press
+        self.on_release = on_release
+
+    def stop(self):
+        if self in self.backend._listeners:
+            self.backend._listeners.remove(self)
@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from core.resample import convert
+
+log = logging.getLogger(__name__)
+
+
+def decode_file(music_path, samplerate=None, channels=None):
+    """
+    解码整个音频文件，返回 (frames, channels) 的 float32 数组和采样率
+
+    指定了 samplerate/channels 时同时转换为该格式 (通常是输出设备的格式)。
+    """
+    import soundfile as sf
+    data, file_samplerate = sf.read(music_path, dtype='float32', always_2d=True)
+    if samplerate is None:
+        return data, file_samplerate
+    return convert(data, file_samplerate, samplerate,
+                   channels or data.shape[1]), samplerate
+
+
+class AudioCache:
+    """
+    已解码音频的内存缓存
+
+    以 (路径, mtime, 格式) 为键，文件被修改后旧条目自动失效；
+    总占用超过 max_bytes 时按最近最少使用 (LRU) 的顺序淘汰。
+    设置了目标格式后，缓存的是已经转换为该采样率/声道数的数据，播放时无需重采样。
+    配置了磁盘缓存时，未命中会先尝试映射磁盘缓存，解码结果也会写入磁盘缓存。
+    映射的磁盘缓存不占堆内存，不计入 max_bytes，只按条目数 max_mapped 限制
+    (每个映射占用一个文件描述符)。
+    """
+
+    def __init__(self, max_bytes, disk_cache=None, max_mapped=512):
+        self.max_bytes = max_bytes
+        self.max_mapped = max_mapped
+        self.disk_cache = disk_cache
+        self.samplerate = None  # 目标格式，None 表示保持文件原格式
+        self.channels = None
+        self.current_bytes = 0    # 堆内存中的数组占用的字节数
+        self.mapped = 0           # 映射的磁盘缓存条目数
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0          # 实际解码的次数 (不含磁盘缓存命中)
+        self.decode_seconds = 0.0
+        self._entries = OrderedDict()  # {(path, mtime_ns, 格式): (data, samplerate)}
+        self._keys = {}                # {path: key}
+        self._lock = threading.Lock()
+
+    def get(self, music_path, trace=None):
+        """
+        返回 (data, samplerate)，未命中时解码并放入缓存
+
+        :param trace: 可选的 metrics.Trace，记录是否命中和加载耗时
+        """
+        st = os.stat(music_path)
+        samplerate, channels = self.samplerate, self.channels
+        key = (music_path, st.st_mtime_ns, samplerate, channels)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if trace is not None:
+                    trace.cache_hit = True
+                return entry
+            self.misses += 1
+
+        # 解码放在锁外，避免阻塞其他线程的命中查询
+        start = time.perf_counter()
+        entry = self._load(music_path, st, samplerate, channels)
+        if trace is not None:
+            trace.cache_hit = False
+            trace.decode_ms = (time.perf_counter() - start) * 1000
+        self._put(key, entry)
+        return entry
+
+    def set_format(self, samplerate, channels):
+        """设置目标格式，格式变化时清空内存缓存"""
+        if (samplerate, channels) != (self.samplerate, self.channels):
+            self.samplerate, self.channels = samplerate, channels
+            self.clear()
+
+    def _load(self, music_path, st, samplerate, channels):
+        if self.disk_cache is None:
+            return self._decode(music_path, samplerate, channels)
+        entry = self.disk_cache.load(music_path, samplerate, channels, st)
+        if entry is not None:
+            return entry
+        data, rate = self._decode(music_path, samplerate, channels)
+        if self.disk_cache.store(music_path, data, rate, st,
+                                 native=samplerate is None):
+            # 改用映射的磁盘缓存，释放解码得到的堆内存
+            entry = self.disk_cache.load(music_path, samplerate, channels, st)
+            if entry is not None:
+                return entry
+        return data, rate
+
+    def _decode(self, music_path, samplerate, channels):
+        start = time.perf_counter()
+        entry = decode_file(music_path, samplerate, channels)
+        with self._lock:
+            self.decodes += 1
+            self.decode_seconds += time.perf_counter() - start
+        return entry
+
+    def contains(self, music_path):
+        try:
+            key = (music_path, os.stat(music_path).st_mtime_ns,
+                   self.samplerate, self.channels)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._entries
+
+    def warm(self, music_paths):
+        """预先解码一批文件，失败的文件只记录日志"""
+        for music_path in music_paths:
+            try:
+                self.get(music_path)
+            except Exception as e:
+                log.warning("预加载 %s 失败: %s", music_path, e)
+
+    def invalidate(self, music_path):
+        with self._lock:
+            self._remove(music_path)
+        if self.disk_cache is not None:
+            self.disk_cache.invalidate(
+                music_path, self.samplerate, self.channels)
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.current_bytes = 0
+            self.mapped = 0
+
+    def _put(self, key, entry):
+        nbytes = _heap_bytes(entry[0])
+        with self._lock:
+            self._remove(key[0])
+            # 单个文件超过整个预算，或解码期间目标格式已改变时不缓存
+            if nbytes > self.max_bytes or key[2:] != (self.samplerate, self.channels):
+                return
+            self._entries[key] = entry
+            self._keys[key[0]] = key
+            self._account(entry[0], 1)
+            self._evict()
+
+    def _account(self, data, sign):
+        if isinstance(data, np.memmap):
+            self.mapped += sign
+        else:
+            self.current_bytes += sign * data.nbytes
+
+    def _remove(self, music_path):
+        key = self._keys.pop(music_path, None)
+        if key is not None:
+            data, _ = self._entries.pop(key)
+            self._account(data, -1)
+
+    def _evict(self):
+        # 从最久未使用的条目开始，只淘汰超出限制的那一类
+        for key in list(self._entries):
+            heap_over = self.current_bytes > self.max_bytes
+            mapped_over = self.mapped > self.max_mapped
+            if not (heap_over or mapped_over):
+                break
+            mapped = isinstance(self._entries[key][0], np.memmap)
+            if mapped_over if mapped else heap_over:
+                self._remove(key[0])
+
+
+def _heap_bytes(data):
+    return 0 if isinstance(data, np.memmap) else data.nbytes
@@ -0,0 +1,344 @@
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+from core.metrics import LatencyMetrics
+from core.playlist import SEQUENTIAL, PlayQueue
+from core.stream import BufferSource, ChainSource, StreamingSource, should_stream
+
+log = logging.getLogger(__name__)
+
+PLAY = "play"
+STOP = "stop"
+TOGGLE = "toggle"
+STOP_ALL = "stop_all"
+SET_DEVICE = "set_device"
+SET_PROFILE = "set_profile"
+SET_OUTPUTS = "set_outputs"
+WARM = "warm"
+FILL_DISK_CACHE = "fill_disk_cache"
+PLAY_QUEUE = "play_queue"
+QUEUE_READY = "queue_ready"
+ADVANCE = "advance"
+IDLE = "idle"
+SHUTDOWN = "shutdown"
+
+# 队列播放的声音在混音器中的键
+QUEUE_KEY = "queue"
+
+# timestamp 为命令产生时的 time.perf_counter()，
+# 快捷键在按键回调中直接投递命令，因此也就是按键事件的时刻
+Command = namedtuple("Command", ["kind", "arg", "timestamp"])
+
+
+class PlaybackController:
+    """
+    音频控制线程
+
+    快捷键线程、界面线程和音频回调都只向队列投递命令，由这个线程按顺序执行，
+    音频引擎只会在这一个线程中被修改。状态变化和错误通过回调通知界面，
+    回调在控制线程中执行，界面需要自行转发到 GUI 线程 (例如 Qt 信号)。
+
+    队列播放时整个队列是混音器中的一路声音 (ChainSource)。当前一首开始播放后，
+    下一首在后台线程中打开 (解码或开始流式读取)，准备好后交给 ChainSource，
+    两首之间在音频回调中直接衔接，不在边界处解码。
+    """
+
+    def __init__(self, engine, audio_cache, stream_threshold,
+                 on_state=None, on_error=None, gain_for=None, trim_for=None,
+                 resolve=None):
+        self.engine = engine
+        self.audio_cache = audio_cache
+        self.stream_threshold = stream_threshold
+        self.gain_for = gain_for  # gain_for(music_path)，返回预先算好的音量增益
+        self.trim_for = trim_for  # trim_for(music_path)，返回 (start_s, end_s) 或 None
+        self.resolve = resolve    # resolve(music_path)，返回内容相同且未变化的规范路径
+        self.on_state = on_state  # on_state(playing, music_path)
+        self.on_error = on_error  # on_error(music_path, message)
+        self.metrics = LatencyMetrics()
+        self._playlist = None  # 正在播放的队列 PlayQueue
+        self._chain = None     # 队列的 ChainSource
+        self._queue_id = 0     # 每次开始或结束队列时递增，丢弃过期的预加载结果
+        self._warm_paths = {}  # 预加载过的文件 (有序)，输出格式变化后重新预加载
+        self._warm_id = 0      # 输出格式变化时递增，旧格式的预加载线程提前退出
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        engine.on_idle = lambda: self.submit(IDLE)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, kind, arg=None):
+        self._queue.put(Command(kind, arg, time.perf_counter()))
+
+    def play(self, music_path):
+        self.submit(PLAY, music_path)
+
+    def stop(self, music_path):
+        self.submit(STOP, music_path)
+
+    def toggle(self, music_path):
+        self.submit(TOGGLE, music_path)
+
+    def stop_all(self):
+        self.submit(STOP_ALL)
+
+    def set_device(self, device_id):
+        self.submit(SET_DEVICE, device_id)
+
+    def set_profile(self, profile):
+        self.submit(SET_PROFILE, profile)
+
+    def set_outputs(self, gain=1.0, extra=()):
+        """主设备的音量和同时输出的附加设备 [(device_id, gain)]"""
+        self.submit(SET_OUTPUTS, (gain, list(extra)))
+
+    def play_queue(self, music_paths, mode=SEQUENTIAL):
+        """按 mode (playlist.MODES) 依次播放，替换正在播放的队列"""
+        self.submit(PLAY_QUEUE, (list(music_paths), mode))
+
+    @property
+    def queue_current(self):
+        """队列中正在播放的音乐路径，没有播放队列时为 None"""
+        chain = self._chain
+        return chain.key if chain is not None else None
+
+    def warm(self, music_paths):
+        """在确定输出格式后，于后台预先解码并转换一批文件"""
+        self.submit(WARM, list(music_paths))
+
+    def fill_disk_cache(self, music_paths, on_done=None):
+        """
+        按输出设备的格式把一批文件写入磁盘缓存，在后台线程中执行
+
+        :param on_done: on_done(写入数, 失败数)，在后台线程中调用
+        """
+        self.submit(FILL_DISK_CACHE, (list(music_paths), on_done))
+
+    def shutdown(self, timeout=2):
+        self.submit(SHUTDOWN)
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def report(self):
+        """汇总延迟统计和各项计数器，用于诊断面板和导出"""
+        cache = self.audio_cache
+        return {
+            "counters": {
+                "xruns": self.engine.xruns,
+                "cache_hits": cache.hits,
+                "cache_misses": cache.misses,
+                "decodes": cache.decodes,
+                "decode_ms_total": cache.decode_seconds * 1000,
+            },
+            "sounds": self.metrics.summary(),
+        }
+
+    def source_path(self, music_path):
+        """内容相同的文件共用一份缓存，规范路径的文件变化或不存在时 resolve 返回原路径"""
+        if self.resolve is None:
+            return music_path
+        return self.resolve(music_path)
+
+    def open_source(self, music_path, trace=None):
+        """
+        大文件流式解码，其余文件整体解码 (优先使用已解码缓存)
+
+        开启了裁剪静音时只播放 (start_s, end_s) 之间的部分：
+        流式解码直接从 start_s 开始读取，缓存的数据只取切片，不复制。
+        """
+        samplerate, channels = self.engine.ensure_format()
+        self.audio_cache.set_format(samplerate, channels)
+        trim = self.trim_for(music_path) if self.trim_for is not None else None
+        start_s, end_s = trim or (0.0, None)
+        source_path = self.source_path(music_path)
+        if should_stream(source_path, self.stream_threshold):
+            source = StreamingSource(source_path, samplerate, channels,
+                                     start_s=start_s, end_s=end_s)
+            source.start()
+            return source
+        data, samplerate = self.audio_cache.get(source_path, trace)
+        if trim is not None:
+            data = data[int(start_s * samplerate):int(end_s * samplerate)]
+        return BufferSource(data, samplerate)
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            if command.kind == SHUTDOWN:
+                self._warm_id += 1  # 预加载线程提前退出
+                self.engine.close()
+                return
+            try:
+                self._dispatch(command)
+            except Exception as e:
+                log.error("执行命令 %s 失败: %s", command.kind, e)
+                if command.kind in (PLAY, TOGGLE):
+                    self._notify(self.on_error, command.arg, str(e))
+            self.engine.collect_finished()
+
+    def _dispatch(self, command):
+        kind, arg = command.kind, command.arg
+        if kind == TOGGLE:
+            kind = STOP if self.engine.is_playing(arg) else PLAY
+
+        if kind == PLAY:
+            trace = self.metrics.start(arg, command.timestamp)
+            trace.dispatch = time.perf_counter()
+            source = self.open_source(arg, trace)
+            trace.loaded = time.perf_counter()
+            self.engine.play(source, key=arg, gain=self._gain(arg), trace=trace)
+            trace.started = time.perf_counter()
+            self._notify(self.on_state, True, arg)
+        elif kind == STOP:
+            self.engine.stop(arg)
+            if arg == QUEUE_KEY:
+                self._end_queue()
+        elif kind == STOP_ALL:
+            self.engine.stop_all()
+            self._end_queue()
+            self._notify(self.on_state, False, None)
+        elif kind in (SET_DEVICE, SET_PROFILE):
+            # 重新打开输出流会停止所有声音
+            if kind == SET_DEVICE:
+                old_format = (self.audio_cache.samplerate,
+                              self.audio_cache.channels)
+                self.engine.set_device(arg)
+                # 缓存按新设备的格式重新转换
+                new_format = (self.engine.samplerate, self.engine.channels)
+                self.audio_cache.set_format(*new_format)
+                if new_format != old_format and self._warm_paths:
+                    # 启动时设备枚举完成前可能已按默认设备的格式预加载过
+                    self._warm_id += 1
+                    self._start_warm(list(self._warm_paths))
+            else:
+                self.engine.set_profile(arg)
+            self._end_queue()
+            self._notify(self.on_state, False, None)
+        elif kind == SET_OUTPUTS:
+            self.engine.set_outputs(*arg)
+        elif kind == WARM:
+            self.audio_cache.set_format(*self.engine.ensure_format())
+            # 内容相同的文件只解码一次
+            paths = [p for p in dict.fromkeys(map(self.source_path, arg))
+                     if not should_stream(p, self.stream_threshold)]
+            self._warm_paths.update(dict.fromkeys(paths))
+            self._start_warm(paths)
+        elif kind == FILL_DISK_CACHE:
+            # 输出格式只在控制线程中确定，设备尚未打开时按默认设备的格式
+            threading.Thread(target=self._fill_disk_cache,
+                             args=(*arg, *self.engine.ensure_format()),
+                             daemon=True).start()
+        elif kind == PLAY_QUEUE:
+            self._start_queue(*arg, command.timestamp)
+        elif kind == QUEUE_READY:
+            self._on_queue_ready(*arg)
+        elif kind == ADVANCE:
+            if arg == self._queue_id:
+                self._chain.release()
+                self._notify(self.on_state, True, self._chain.key)
+                self._prefetch()
+        elif kind == IDLE:
+            if not self.engine.mixer.active:
+                self._end_queue()
+                self._notify(self.on_state, False, None)
+
+    def _start_warm(self, music_paths):
+        threading.Thread(target=self._warm, args=(music_paths, self._warm_id),
+                         daemon=True).start()
+
+    def _fill_disk_cache(self, music_paths, on_done, samplerate, channels):
+        disk_cache = self.audio_cache.disk_cache
+        if disk_cache is None:
+            result = (0, 0)
+        else:
+            result = disk_cache.fill(music_paths, samplerate, channels)
+        if on_done is not None:
+            on_done(*result)
+
+    def _warm(self, music_paths, warm_id):
+        # 格式再次变化时由新的线程从头预加载
+        for music_path in music_paths:
+            if warm_id != self._warm_id:
+                return
+            self.audio_cache.warm([music_path])
+
+    def _gain(self, music_path):
+        return self.gain_for(music_path) if self.gain_for is not None else 1.0
+
+    def _start_queue(self, music_paths, mode, timestamp):
+        self.engine.stop(QUEUE_KEY)
+        self._end_queue()
+        playlist = PlayQueue(music_paths, mode)
+        # 第一首与普通播放一样在控制线程中打开，无法播放的文件跳过
+        while True:
+            music_path = playlist.next()
+            if music_path is None:
+                return
+            trace = self.metrics.start(music_path, timestamp)
+            trace.dispatch = time.perf_counter()
+            try:
+                source = self.open_source(music_path, trace)
+                break
+            except Exception as e:
+                log.error("播放 %s 失败: %s", music_path, e)
+                self._notify(self.on_error, music_path, str(e))
+                playlist.skip(music_path)
+        trace.loaded = time.perf_counter()
+        queue_id = self._queue_id
+        chain = ChainSource(source, self._gain(music_path), music_path,
+                            on_advance=lambda: self.submit(ADVANCE, queue_id))
+        # 下一首准备好之前第一首就可能播完，先标记后面还有
+        chain.more = True
+        self._playlist, self._chain = playlist, chain
+        self.engine.play(chain, key=QUEUE_KEY, trace=trace)
+        trace.started = time.perf_counter()
+        self._notify(self.on_state, True, music_path)
+        self._prefetch()
+
+    def _prefetch(self):
+        """在后台线程中打开队列的下一首，完成后投递 QUEUE_READY"""
+        music_path = self._playlist.next()
+        if music_path is None:
+            self._chain.more = False
+            return
+        self._chain.more = True
+        queue_id = self._queue_id
+
+        def run():
+            try:
+                source = self.open_source(music_path)
+            except Exception as e:
+                source = e
+            self.submit(QUEUE_READY, (queue_id, music_path, source))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_queue_ready(self, queue_id, music_path, source):
+        failed = isinstance(source, Exception)
+        if queue_id != self._queue_id or not self.engine.is_playing(QUEUE_KEY):
+            # 队列已经停止、被替换，或者被混音器淘汰
+            if not failed:
+                source.close()
+            if queue_id == self._queue_id:
+                self._end_queue()
+            return
+        if failed:
+            log.error("播放 %s 失败: %s", music_path, source)
+            self._notify(self.on_error, music_path, str(source))
+            self._playlist.skip(music_path)
+            self._prefetch()
+            return
+        self._chain.set_next(source, self._gain(music_path), music_path)
+
+    def _end_queue(self):
+        """队列的声音已停止或即将停止，它的音频源由引擎关闭"""
+        self._queue_id += 1
+        self._playlist = self._chain = None
+
+    @staticmethod
+    def _notify(callback, *args):
+        if callback is not None:
+            callback(*args)
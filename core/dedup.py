@@ -0,0 +1,201 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20  # 分块读取，大文件不会整个读进内存
+
+
+def hash_file(music_path, chunk_size=CHUNK_SIZE):
+    """
+    返回文件内容的 blake2b 摘要 (十六进制)
+
+    大块数据的摘要计算会释放 GIL，可以在线程池中并行。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(music_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _hash(music_path):
+    """返回 (path, mtime_ns, size, hash)，失败时返回 None"""
+    try:
+        st = os.stat(music_path)
+        return music_path, st.st_mtime_ns, st.st_size, hash_file(music_path)
+    except OSError:
+        return None
+
+
+def _unchanged(music_path, entry):
+    """文件的 (mtime_ns, size) 是否与保存的摘要记录一致"""
+    try:
+        st = os.stat(music_path)
+    except OSError:
+        return False
+    return (st.st_mtime_ns, st.st_size) == entry[:2]
+
+
+class ContentIndex:
+    """
+    按内容去重
+
+    同一个文件夹导入到多个分组、或者同一段音频有多个副本时，内容相同的文件
+    对应同一个规范路径 (第一个被计算的路径)。解码缓存、音频分析和波形缓存都以
+    规范路径为键，内存和磁盘占用只与不同的音频数量有关。
+
+    {路径: (mtime_ns, size, 摘要)} 和 {摘要: 规范路径} 保存在 LibraryStore 中，
+    文件不变时只需要一次 stat。canonical 只是字典查找，可以在播放路径上调用；
+    文件变化后在下一次 update 时重新计算。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._hashes = {}     # {path: (mtime_ns, size, hash)}
+        self._canonical = {}  # {hash: 规范路径}
+        self._members = {}    # {hash: {path}}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """读取保存的摘要，需在后台线程中调用"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            hashes, canonical = self.store.load_content()
+            members = {}
+            for path, (_, _, digest) in hashes.items():
+                members.setdefault(digest, set()).add(path)
+            fixes = []
+            for digest, paths in members.items():
+                if canonical.get(digest) not in paths:
+                    canonical[digest] = min(paths)
+                    fixes.append((digest, canonical[digest]))
+            if fixes:
+                self.store.set_canonical(fixes)
+            self._hashes, self._canonical, self._members = hashes, canonical, members
+
+    def canonical(self, music_path):
+        """返回内容相同的文件共用的规范路径，尚未计算时返回路径本身"""
+        entry = self._hashes.get(music_path)
+        if entry is None:
+            return music_path
+        return self._canonical.get(entry[2], music_path)
+
+    def resolve(self, music_path):
+        """
+        返回播放时可以代替 music_path 读取的规范路径
+
+        与 canonical 不同，会检查两个文件的 mtime 和大小是否与计算摘要时一致，
+        任何一个在计算后被修改或删除时返回 music_path 本身。
+        """
+        entry = self._hashes.get(music_path)
+        if entry is None:
+            return music_path
+        source = self._canonical.get(entry[2], music_path)
+        if source == music_path:
+            return music_path
+        source_entry = self._hashes.get(source)
+        if (source_entry is None or source_entry[2] != entry[2]
+                or not _unchanged(music_path, entry)
+                or not _unchanged(source, source_entry)):
+            return music_path
+        return source
+
+    def paths_for(self, music_path):
+        """返回与 music_path 内容相同的所有路径 (包括它自己)"""
+        with self._lock:
+            entry = self._hashes.get(music_path)
+            if entry is None:
+                return [music_path]
+            return list(self._members.get(entry[2], (music_path,)))
+
+    def update(self, music_paths, pool=None, workers=8):
+        """
+        计算新文件和已变化文件的摘要，需在后台线程中调用
+
+        :param pool: 可选的 ThreadPoolExecutor，导入时与文件探测共用
+        :return: 与其他文件内容相同的路径列表
+        """
+        self.load()
+        music_paths = list(dict.fromkeys(music_paths))
+        todo = []
+        for music_path in music_paths:
+            try:
+                st = os.stat(music_path)
+            except OSError:
+                continue
+            entry = self._hashes.get(music_path)
+            if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+                todo.append(music_path)
+        if todo:
+            start = time.perf_counter()
+            if pool is not None:
+                rows = list(pool.map(_hash, todo))
+            elif len(todo) == 1:
+                rows = [_hash(todo[0])]
+            else:
+                with ThreadPoolExecutor(min(workers, len(todo))) as own_pool:
+                    rows = list(own_pool.map(_hash, todo))
+            rows = [r for r in rows if r is not None]
+            self._apply(rows)
+            log.info("内容摘要: %d 个文件, 用时 %.2fs",
+                     len(rows), time.perf_counter() - start)
+        return [p for p in music_paths if self.canonical(p) != p]
+
+    def _apply(self, rows):
+        new_canonical = []
+        with self._lock:
+            for music_path, mtime_ns, size, digest in rows:
+                old = self._hashes.get(music_path)
+                if old is not None and old[2] != digest:
+                    new_canonical.extend(self._detach(music_path, old[2]))
+                self._hashes[music_path] = (mtime_ns, size, digest)
+                self._members.setdefault(digest, set()).add(music_path)
+                if digest not in self._canonical:
+                    self._canonical[digest] = music_path
+                    new_canonical.append((digest, music_path))
+        self.store.update_content(rows)
+        if new_canonical:
+            self.store.set_canonical(new_canonical)
+
+    def discard(self, music_path):
+        """文件被删除或修改后调用，它是规范路径时由同内容的其他文件接替"""
+        with self._lock:
+            entry = self._hashes.pop(music_path, None)
+            if entry is None:
+                return
+            changes = self._detach(music_path, entry[2])
+        self.store.remove_content([music_path])
+        if changes:
+            self.store.set_canonical(changes)
+
+    def _detach(self, music_path, digest):
+        """从摘要的成员中移除，返回需要保存的 [(摘要, 新规范路径)]"""
+        paths = self._members.get(digest)
+        if paths is not None:
+            paths.discard(music_path)
+        if self._canonical.get(digest) != music_path:
+            return []
+        if paths:
+            self._canonical[digest] = min(paths)
+            return [(digest, self._canonical[digest])]
+        self._members.pop(digest, None)
+        del self._canonical[digest]
+        self.store.remove_canonical([digest])
+        return []
+
+    def stats(self):
+        """返回 (已计算的文件数, 不同内容数)"""
+        return len(self._hashes), len(self._canonical)
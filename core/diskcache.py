@@ -0,0 +1,182 @@
+import os
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.cache import decode_file
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"MPPC"
+VERSION = 1
+# magic, version, channels, samplerate, frames, 源文件 mtime_ns, 源文件大小
+HEADER = struct.Struct("<4sHHIQqQ")
+HEADER_SIZE = 64  # 头部补齐到 64 字节，数据区保持对齐
+
+
+class PcmDiskCache:
+    """
+    已解码音频的磁盘缓存
+
+    每个源文件和目标格式对应一个 .pcm 文件：固定长度的头部记录采样率、声道数和源文件的
+    mtime/大小，后面是 float32 交错采样数据。读取时用 numpy.memmap 映射，
+    不把整个文件复制到堆内存。源文件变化后条目自动失效，总大小超过上限时
+    删除最久未使用的条目。
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # 估算的总大小，超过上限时再扫描目录校正
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _file_for(self, music_path, samplerate, channels):
+        key = f"{music_path}|{samplerate}|{channels}"
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".pcm")
+
+    def load(self, music_path, samplerate=None, channels=None, st=None):
+        """返回 (memmap 数组, samplerate)，不存在或已过期时返回 None"""
+        cache_file = self._file_for(music_path, samplerate, channels)
+        try:
+            st = st or os.stat(music_path)
+            with open(cache_file, "rb") as f:
+                header = f.read(HEADER.size)
+        except OSError:
+            return None
+        if len(header) != HEADER.size:
+            self._remove(cache_file)
+            return None
+        magic, version, file_channels, file_samplerate, frames, mtime_ns, size = \
+            HEADER.unpack(header)
+        if (magic != MAGIC or version != VERSION
+                or mtime_ns != st.st_mtime_ns or size != st.st_size
+                or samplerate not in (None, file_samplerate)
+                or channels not in (None, file_channels)):
+            # 源文件已被修改或缓存格式过旧
+            self._remove(cache_file)
+            return None
+        try:
+            data = np.memmap(cache_file, dtype="float32", mode="r",
+                             offset=HEADER_SIZE, shape=(frames, file_channels))
+            # 更新修改时间，淘汰时按最近使用排序
+            os.utime(cache_file)
+        except (OSError, ValueError) as e:
+            log.warning("读取缓存 %s 失败: %s", cache_file, e)
+            return None
+        return data, file_samplerate
+
+    def store(self, music_path, data, samplerate, st=None, native=False):
+        """
+        写入缓存，先写临时文件再原子替换
+
+        :param native: 数据是文件原格式 (未指定目标格式) 时为 True
+        """
+        st = st or os.stat(music_path)
+        header = HEADER.pack(MAGIC, VERSION, data.shape[1], samplerate,
+                             data.shape[0], st.st_mtime_ns, st.st_size)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+                np.ascontiguousarray(data, dtype="float32").tofile(f)
+            if native:
+                cache_file = self._file_for(music_path, None, None)
+            else:
+                cache_file = self._file_for(
+                    music_path, samplerate, data.shape[1])
+            os.replace(tmp_path, cache_file)
+        except OSError as e:
+            log.warning("写入缓存 %s 失败: %s", music_path, e)
+            self._remove(tmp_path)
+            return False
+        with self._lock:
+            if self._total is not None:
+                self._total += HEADER_SIZE + data.nbytes
+        if self._total is None or self._total > self.max_bytes:
+            self.enforce_limit()
+        return True
+
+    def contains(self, music_path, samplerate=None, channels=None):
+        cache_file = self._file_for(music_path, samplerate, channels)
+        try:
+            st = os.stat(music_path)
+            with open(cache_file, "rb") as f:
+                header = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return (header[0] == MAGIC and header[1] == VERSION
+                and header[5] == st.st_mtime_ns and header[6] == st.st_size)
+
+    def invalidate(self, music_path, samplerate=None, channels=None):
+        self._remove(self._file_for(music_path, samplerate, channels))
+
+    def fill(self, music_paths, samplerate=None, channels=None, workers=None):
+        """并行解码 (并转换为目标格式) 尚未缓存的文件，返回 (写入数, 失败数)"""
+        def fill_one(music_path):
+            if self.contains(music_path, samplerate, channels):
+                return None
+            try:
+                st = os.stat(music_path)
+                data, rate = decode_file(music_path, samplerate, channels)
+                return self.store(music_path, data, rate, st,
+                                  native=samplerate is None)
+            except Exception as e:
+                log.warning("缓存 %s 失败: %s", music_path, e)
+                return False
+
+        with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+            results = list(pool.map(fill_one, music_paths))
+        return results.count(True), results.count(False)
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.enforce_limit()
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def enforce_limit(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+            self._total = total
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".pcm"):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((entry.path, st.st_size, st.st_mtime))
+        except OSError:
+            pass
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # 文件不存在，或在 Windows 上仍被映射
+            return False
@@ -0,0 +1,209 @@
+import logging
+
+from core.backends import SoundDeviceBackend
+from core.mixer import Mixer, Voice
+
+log = logging.getLogger(__name__)
+
+# 输出流的延迟配置: 固定块大小，回调中的缓冲区可以预先分配
+LATENCY_PROFILES = {
+    "normal": {"blocksize": 1024, "latency": "high"},
+    "low": {"blocksize": 256, "latency": "low"},
+}
+
+
+class _Output:
+    """附加的输出设备：独立的输出流和混音器"""
+
+    def __init__(self, device, gain, max_voices):
+        self.device = device
+        self.channels = None
+        self.stream = None
+        self.failed = False  # 打开失败后不再重试，直到重新设置输出或设备
+        self.mixer = Mixer(max_voices, gain)
+
+
+class AudioEngine:
+    """
+    常驻的音频输出引擎
+
+    每个输出设备只打开一次 OutputStream，之后播放声音只是向混音器添加一路声音，
+    不再在每次触发时打开/关闭设备。输出流固定使用设备的默认采样率，
+    音频源需要预先转换为 samplerate/channels 指定的格式。
+    设备由 backend 提供，默认是 sounddevice，基准测试时可换成 FakeAudioBackend。
+
+    可以同时输出到多个设备：附加设备以主设备的采样率打开各自的输出流和混音器，
+    每个声音在各个混音器中通过 source.tap() 共用同一份解码数据，只是读取位置不同。
+    每个设备的回调互不等待，一个设备卡顿不会影响其他设备。
+    """
+
+    def __init__(self, max_voices=8, on_idle=None, profile="normal",
+                 backend=None):
+        self.backend = backend or SoundDeviceBackend()
+        self.device = None
+        self.samplerate = None
+        self.channels = 2
+        self.stream = None
+        self.profile = LATENCY_PROFILES[profile]
+        self.mixer = Mixer(max_voices)
+        self.outputs = []  # 附加的输出设备 [_Output]
+        self.on_idle = on_idle  # 所有声音播放结束时调用 (在音频线程中)
+        # 回调中只做整数自增，由界面线程定期读取
+        self.xruns = 0
+
+    def set_device(self, device_id):
+        if device_id != self.device or self.samplerate is None:
+            self.close()
+            self.device = device_id
+            info = self.backend.device_info(device_id)
+            self.samplerate = int(info['default_samplerate'])
+            self.channels = min(2, info['max_output_channels'])
+
+    def ensure_format(self):
+        """确保已经确定输出格式，返回 (samplerate, channels)"""
+        if self.samplerate is None:
+            self.set_device(self.device)
+        return self.samplerate, self.channels
+
+    def set_outputs(self, gain=1.0, extra=()):
+        """
+        设置主设备的音量和附加的输出设备
+
+        :param extra: [(device_id, gain)]，与主设备相同的设备会被忽略
+        """
+        self.mixer.gain = gain
+        extra = dict(extra)
+        outputs = []
+        for output in self.outputs:
+            if output.device in extra:
+                output.mixer.gain = extra.pop(output.device)
+                output.failed = False
+                outputs.append(output)
+            else:
+                self._close_output(output)
+        outputs.extend(_Output(device, g, self.mixer.max_voices)
+                       for device, g in extra.items())
+        self.outputs = outputs
+
+    def set_profile(self, profile):
+        """切换延迟配置，下次播放时按新配置重新打开输出流"""
+        if LATENCY_PROFILES[profile] is not self.profile:
+            self.close()
+            self.profile = LATENCY_PROFILES[profile]
+
+    def play(self, source, key=None, gain=1.0, trace=None):
+        self.collect_finished()
+        self.ensure_format()
+        if source.samplerate != self.samplerate:
+            raise ValueError(
+                f"音频采样率 {source.samplerate} 与输出设备 {self.samplerate} 不一致")
+        self._ensure_stream()
+        blocksize = self.profile["blocksize"]
+        for output in self.outputs:
+            if output.device != self.device and self._ensure_output(output):
+                output.mixer.add(Voice(source.tap(), key, gain, blocksize,
+                                       output.channels))
+        self.mixer.add(Voice(source, key, gain, blocksize, self.channels, trace))
+
+    def _mixers(self):
+        return [self.mixer] + [output.mixer for output in self.outputs]
+
+    def stop(self, key):
+        for mixer in self._mixers():
+            mixer.remove(key)
+
+    def stop_all(self):
+        for mixer in self._mixers():
+            mixer.clear()
+
+    def set_gain(self, key, gain):
+        for mixer in self._mixers():
+            for voice in mixer.voices:
+                if voice.key == key:
+                    voice.gain = gain
+
+    def is_playing(self, key):
+        return self.mixer.is_playing(key)
+
+    def collect_finished(self):
+        """关闭已结束声音的音频源，需在非音频线程中调用"""
+        for mixer in self._mixers():
+            while mixer.finished:
+                mixer.finished.popleft().source.close()
+
+    def close(self):
+        for output in self.outputs:
+            self._close_output(output)
+            output.failed = False
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        # 设备关闭后回调不再运行，直接清空所有声音
+        self.mixer.finished.extend(self.mixer.reset())
+        self.collect_finished()
+
+    def _close_output(self, output):
+        if output.stream is not None:
+            output.stream.stop()
+            output.stream.close()
+            output.stream = None
+        for voice in output.mixer.reset():
+            voice.source.close()
+        while output.mixer.finished:
+            output.mixer.finished.popleft().source.close()
+
+    def _ensure_output(self, output):
+        """打开附加设备的输出流，失败时记录日志并返回 False"""
+        if output.stream is not None:
+            return True
+        if output.failed:
+            return False
+        try:
+            info = self.backend.device_info(output.device)
+            output.channels = min(2, info['max_output_channels'])
+            output.stream = self.backend.open_stream(
+                device=output.device,
+                samplerate=self.samplerate,
+                channels=output.channels,
+                dtype='float32',
+                blocksize=self.profile["blocksize"],
+                latency=self.profile["latency"],
+                callback=self._output_callback(output),
+            )
+            output.stream.start()
+        except Exception as e:
+            log.error("打开输出设备 %s 失败: %s", output.device, e)
+            output.stream = None
+            output.failed = True
+            return False
+        return True
+
+    def _ensure_stream(self):
+        if self.stream is not None:
+            return
+        self.stream = self.backend.open_stream(
+            device=self.device,
+            samplerate=self.samplerate,
+            channels=self.channels,
+            dtype='float32',
+            blocksize=self.profile["blocksize"],
+            latency=self.profile["latency"],
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time, status):
+        if status:
+            self.xruns += 1
+        if self.mixer.mix(outdata, frames, time) and self.on_idle is not None:
+            self.on_idle()
+
+    def _output_callback(self, output):
+        mixer = output.mixer
+
+        def callback(outdata, frames, time, status):
+            if status:
+                self.xruns += 1
+            mixer.mix(outdata, frames)
+        return callback
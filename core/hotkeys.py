@@ -0,0 +1,242 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+# 修饰键位掩码
+MOD_CTRL = 1
+MOD_SHIFT = 2
+MOD_ALT = 4
+MOD_CMD = 8
+
+MODIFIERS = {
+    'ctrl': MOD_CTRL,
+    'shift': MOD_SHIFT,
+    'alt': MOD_ALT,
+    'cmd': MOD_CMD,
+}
+
+
+def parse_hotkey(hotkey):
+    """
+    把 "<Ctrl>+<Shift>+a" 形式的快捷键解析为 (修饰键掩码, 按键名)
+
+    按键名统一为小写，普通字符为字符本身，功能键为 pynput 的 Key 名称 (如 "f1")。
+    """
+    mask = 0
+    key_name = None
+    for part in hotkey.split('+'):
+        name = part.strip()
+        if name.startswith('<') and name.endswith('>'):
+            name = name[1:-1]
+        name = name.lower()
+        if name in MODIFIERS:
+            mask |= MODIFIERS[name]
+        elif name:
+            key_name = name
+    if key_name is None:
+        raise ValueError(f"快捷键缺少普通按键: {hotkey}")
+    return mask, key_name
+
+
+def _modifier_bit(key):
+    # 只有 keyboard.Key 枚举成员有 name 属性，普通按键 (KeyCode) 没有
+    name = getattr(key, 'name', None)
+    if name:
+        return MODIFIERS.get(name.split('_')[0], 0)
+    return 0
+
+
+def _key_name(key):
+    name = getattr(key, 'name', None)
+    if name:
+        return name
+    char = getattr(key, 'char', None)
+    if not char:
+        return None
+    # 按住 Ctrl 时部分平台返回控制字符 (Ctrl+A -> '\x01')
+    if len(char) == 1 and ord(char) < 32:
+        char = chr(ord(char) + 96)
+    return char.lower()
+
+
+def _key_id(key):
+    """
+    按键的稳定标识，用于配对按下和松开事件
+
+    同一个物理按键在按下和松开时报告的字符可能不同 (Shift+1 按下时是 '!'，
+    先松开 Shift 后松开 1 时是 '1')，因此优先使用虚拟键码。
+    特殊键 (keyboard.Key) 的键码在 value 上；没有键码时退回按键名。
+    """
+    vk = getattr(key, 'vk', None)
+    if vk is None:
+        vk = getattr(getattr(key, 'value', None), 'vk', None)
+    if vk is not None:
+        return vk
+    return _key_name(key)
+
+
+class HotkeyMatcher:
+    """
+    全局快捷键匹配器
+
+    只启动一个常驻的键盘监听线程，自己维护修饰键状态 (位掩码)，
+    用 {(修饰键掩码, 按键名): 动作} 的字典查找，增删绑定不需要重启监听线程。
+    键盘事件来自 backend (默认 pynput，测试时可换成 FakeKeyboardBackend)。
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._bindings = {}
+        self._modifiers = 0
+        self._held = {}        # {按键标识: 修饰键位}，左右两侧的修饰键分别记录
+        self._pressed = set()  # 已按下的普通键的标识，忽略按住时的自动重复
+        self._listener = None
+
+    def add(self, hotkey, action):
+        self._bindings[parse_hotkey(hotkey)] = action
+
+    def remove(self, hotkey):
+        try:
+            self._bindings.pop(parse_hotkey(hotkey), None)
+        except ValueError:
+            pass
+
+    def clear(self):
+        self._bindings.clear()
+
+    def __len__(self):
+        return len(self._bindings)
+
+    def get_backend(self):
+        if self.backend is None:
+            from core.backends import PynputKeyboardBackend
+            self.backend = PynputKeyboardBackend()
+        return self.backend
+
+    def start(self):
+        if self._listener is not None:
+            return
+        self.reset()
+        self._listener = self.get_backend().listen(
+            self._on_press, self._on_release)
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self.reset()
+
+    def reset(self):
+        """清除按键状态，漏掉松开事件 (焦点或键盘抓取变化) 后调用"""
+        self._modifiers = 0
+        self._held.clear()
+        self._pressed.clear()
+
+    def _set_modifier(self, key, bit, down):
+        key_id = _key_id(key)
+        if down:
+            if self._held.get(key_id) == bit:
+                return  # 修饰键的自动重复
+            self._held[key_id] = bit
+        elif self._held.pop(key_id, None) is None:
+            # 没有记录过按下的修饰键: 状态已经不可信，按该位全部松开处理
+            self._held = {k: b for k, b in self._held.items() if b != bit}
+        modifiers = 0
+        for held_bit in self._held.values():
+            modifiers |= held_bit
+        if modifiers != self._modifiers:
+            # 组合变化后是新的组合键，之前记录的普通键不再算作自动重复，
+            # 也避免漏掉的松开事件让某个键一直被忽略
+            self._modifiers = modifiers
+            self._pressed.clear()
+
+    def _on_press(self, key):
+        bit = _modifier_bit(key)
+        if bit:
+            self._set_modifier(key, bit, True)
+            return
+        name = _key_name(key)
+        if name is None:
+            return
+        key_id = _key_id(key)
+        if key_id in self._pressed:
+            return
+        self._pressed.add(key_id)
+        action = self._bindings.get((self._modifiers, name))
+        if action is not None:
+            try:
+                action()
+            except Exception as e:
+                # 动作出错不能让监听线程退出
+                log.error("快捷键动作执行失败: %s", e)
+
+    def _on_release(self, key):
+        bit = _modifier_bit(key)
+        if bit:
+            self._set_modifier(key, bit, False)
+            return
+        self._pressed.discard(_key_id(key))
+
+
+class HotkeyIndex:
+    """
+    快捷键与音乐路径的双向索引
+
+    主窗口和音乐列表共用同一个实例，两个方向的查找都是 O(1)。
+    每个快捷键只对应一首音乐，每首音乐也只有一个快捷键。
+    """
+
+    def __init__(self):
+        self._by_hotkey = {}  # {hotkey: music_path}
+        self._by_path = {}    # {music_path: hotkey}
+
+    def __len__(self):
+        return len(self._by_hotkey)
+
+    def __contains__(self, hotkey):
+        return hotkey in self._by_hotkey
+
+    def items(self):
+        return list(self._by_hotkey.items())
+
+    def paths(self):
+        return list(self._by_path)
+
+    def path_for(self, hotkey):
+        return self._by_hotkey.get(hotkey)
+
+    def hotkey_for(self, music_path):
+        return self._by_path.get(music_path)
+
+    def conflict(self, hotkey, music_path):
+        """快捷键已被其他音乐占用时返回那首音乐的路径"""
+        other = self._by_hotkey.get(hotkey)
+        return other if other is not None and other != music_path else None
+
+    def bind(self, hotkey, music_path):
+        """
+        绑定快捷键，同时解除该音乐原有的快捷键和该快捷键原有的音乐
+
+        :return: (该音乐原来的快捷键, 原来占用该快捷键的音乐)
+        """
+        old_hotkey = self.unbind_path(music_path)
+        displaced = self.unbind_hotkey(hotkey)
+        self._by_hotkey[hotkey] = music_path
+        self._by_path[music_path] = hotkey
+        return old_hotkey, displaced
+
+    def unbind_hotkey(self, hotkey):
+        music_path = self._by_hotkey.pop(hotkey, None)
+        if music_path is not None:
+            del self._by_path[music_path]
+        return music_path
+
+    def unbind_path(self, music_path):
+        hotkey = self._by_path.pop(music_path, None)
+        if hotkey is not None:
+            del self._by_hotkey[hotkey]
+        return hotkey
+
+    def clear(self):
+        self._by_hotkey.clear()
+        self._by_path.clear()
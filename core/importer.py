@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.aiff')
+
+
+def scan_audio_files(root, cancel_event=None):
+    """用 os.scandir 递归扫描目录，逐个生成音频文件路径"""
+    stack = [root]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            log.warning("无法读取目录 %s: %s", directory, e)
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                    yield entry.path
+            except OSError:
+                continue
+        # 逆序入栈，保证按名称顺序遍历子目录
+        stack.extend(reversed(subdirs))
+
+
+def probe_audio_file(music_path):
+    """能被 soundfile 识别的文件才导入，损坏或不支持的文件提前排除"""
+    import soundfile as sf
+    try:
+        sf.info(music_path)
+        return True
+    except Exception:
+        return False
+
+
+class FolderImporter:
+    """
+    后台导入文件夹
+
+    扫描在后台线程中进行，文件探测在线程池中并行执行，
+    结果按批通过 on_batch 回调返回。所有回调都在后台线程中执行。
+    给出 content (ContentIndex) 时在同一个线程池中计算内容摘要，
+    与已有文件内容相同的路径记录在 duplicates 中。
+    """
+
+    def __init__(self, root, on_batch=None, on_progress=None,
+                 on_finished=None, workers=8, batch_size=256, content=None):
+        self.root = root
+        self.content = content
+        self.duplicates = []
+        self.on_batch = on_batch          # on_batch(music_paths)
+        self.on_progress = on_progress    # on_progress(scanned, accepted)
+        self.on_finished = on_finished    # on_finished(accepted, rejected, cancelled)
+        self.workers = workers
+        self.batch_size = batch_size
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _run(self):
+        start = time.perf_counter()
+        scanned = accepted = 0
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                chunk = []
+                for music_path in scan_audio_files(self.root, self._cancel):
+                    chunk.append(music_path)
+                    if len(chunk) >= self.batch_size:
+                        accepted += self._process(pool, chunk)
+                        scanned += len(chunk)
+                        self._notify(self.on_progress, scanned, accepted)
+                        chunk = []
+                    if self.cancelled:
+                        break
+                if chunk and not self.cancelled:
+                    accepted += self._process(pool, chunk)
+                    scanned += len(chunk)
+                    self._notify(self.on_progress, scanned, accepted)
+        except Exception as e:
+            log.error("导入文件夹 %s 失败: %s", self.root, e)
+
+        elapsed = time.perf_counter() - start
+        log.info("导入 %s: 扫描 %d 个文件, 导入 %d 个, 用时 %.2fs (%.0f 文件/秒)%s",
+                 self.root, scanned, accepted, elapsed,
+                 scanned / elapsed if elapsed > 0 else 0,
+                 ", 已取消" if self.cancelled else "")
+        self._notify(self.on_finished, accepted,
+                     scanned - accepted, self.cancelled)
+
+    def _process(self, pool, chunk):
+        ok = list(pool.map(probe_audio_file, chunk))
+        batch = [p for p, good in zip(chunk, ok) if good]
+        if batch and self.content is not None:
+            try:
+                self.duplicates.extend(self.content.update(batch, pool))
+            except Exception as e:
+                log.warning("计算内容摘要失败: %s", e)
+        if batch:
+            self._notify(self.on_batch, batch)
+        return len(batch)
+
+    @staticmethod
+    def _notify(callback, *args):
+        if callback is not None:
+            callback(*args)
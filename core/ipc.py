@@ -0,0 +1,275 @@
+"""
+本地进程间接口：通过 Unix 域套接字播放、停止和列出音乐
+
+协议为每行一个 JSON 对象，每个请求对应一行响应:
+
+    {"cmd": "play", "path": "..."}          -> {"ok": true}
+    {"cmd": "toggle", "path": "..."}        -> {"ok": true}
+    {"cmd": "stop"} 或 {"cmd": "stop", "path": "..."}
+    {"cmd": "play_group", "group": "...", "mode": "sequential"|"shuffle"|"loop"}
+    {"cmd": "list"}   -> {"ok": true, "groups": {分组: [路径]}, "hotkeys": {快捷键: 路径}}
+    {"cmd": "status"} -> {"ok": true, "playing": [路径]}
+    {"cmd": "subscribe"} -> {"ok": true}，之后这个连接只用于推送状态事件 (见 PlayerService)
+
+出错时响应 {"ok": false, "error": "..."}。同一个连接可以连续发送多个请求，
+需要低延迟的客户端应保持连接，不要每次触发都重新连接。
+"""
+import os
+import json
+import queue
+import socket
+import logging
+import threading
+
+from core.playlist import MODES, SEQUENTIAL
+
+log = logging.getLogger(__name__)
+
+_SUBSCRIBE = object()
+
+
+def default_socket_path(config_dir):
+    """优先放在 XDG_RUNTIME_DIR (只有当前用户可以访问)，否则放在配置目录"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir or not os.path.isdir(runtime_dir):
+        runtime_dir = str(config_dir)
+    return os.path.join(runtime_dir, "musicplayer.sock")
+
+
+def _listening(socket_path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+class _Subscriber:
+    """订阅状态事件的连接，事件先放进队列，由连接自己的线程发送"""
+
+    def __init__(self, conn, max_pending=256):
+        self.conn = conn
+        self.events = queue.Queue(max_pending)
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # 客户端不读取事件，断开它，不能让控制线程等待
+            self.close()
+
+    def close(self):
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.events.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            try:
+                self.conn.sendall(_encode(event))
+            except OSError:
+                return
+
+
+class IpcServer:
+    """
+    在 Unix 域套接字上提供 PlayerService
+
+    每个连接一个线程，请求只是向控制线程投递命令，不等待播放开始，
+    已缓存的声音与快捷键触发走同一条路径。套接字文件只有当前用户可以访问；
+    已有程序 (例如另一个实例) 在同一路径监听时不启动。
+    """
+
+    def __init__(self, service, socket_path):
+        self.service = service
+        self.socket_path = str(socket_path)
+        self._sock = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """开始监听，返回是否成功"""
+        if not hasattr(socket, "AF_UNIX"):
+            log.warning("当前系统不支持 Unix 域套接字，不提供本地接口")
+            return False
+        if os.path.exists(self.socket_path):
+            if _listening(self.socket_path):
+                log.warning("%s 已被其他程序使用，不提供本地接口", self.socket_path)
+                return False
+            os.unlink(self.socket_path)  # 上次异常退出留下的文件
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.socket_path)
+        except OSError as e:
+            sock.close()
+            log.error("监听 %s 失败: %s", self.socket_path, e)
+            return False
+        finally:
+            os.umask(umask)
+        sock.listen(16)
+        self._sock = sock
+        self.service.add_listener(self._broadcast)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        log.info("本地接口: %s", self.socket_path)
+        return True
+
+    def stop(self):
+        if self._sock is None:
+            return
+        self.service.remove_listener(self._broadcast)
+        sock, self._sock = self._sock, None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def _broadcast(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(event)
+
+    def _accept_loop(self):
+        sock = self._sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return  # 已停止
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                for line in conn.makefile("rb"):
+                    response = self._handle_line(line)
+                    if response is _SUBSCRIBE:
+                        self._stream_events(conn)
+                        return
+                    conn.sendall(_encode(response))
+            except OSError:
+                pass
+
+    def _handle_line(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError
+        except ValueError:
+            return {"ok": False, "error": "无效的请求"}
+        try:
+            return self.handle(request)
+        except Exception as e:
+            log.error("处理请求 %s 失败: %s", request.get("cmd"), e)
+            return {"ok": False, "error": str(e)}
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        path = request.get("path")
+        if path is not None and not isinstance(path, str):
+            return {"ok": False, "error": "path 必须是字符串"}
+        if cmd in ("play", "toggle"):
+            if path is None:
+                return {"ok": False, "error": "缺少 path"}
+            if cmd == "play":
+                self.service.play(path)
+            else:
+                self.service.toggle(path)
+        elif cmd == "stop":
+            self.service.stop(path)
+        elif cmd == "play_group":
+            mode = request.get("mode", SEQUENTIAL)
+            if mode not in MODES:
+                return {"ok": False, "error": f"未知的播放模式: {mode}"}
+            groups, _ = self.service.library.load()
+            music_paths = groups.get(request.get("group"))
+            if not music_paths:
+                return {"ok": False, "error": "分组不存在或为空"}
+            self.service.play_queue(music_paths, mode)
+        elif cmd == "status":
+            return {"ok": True, "playing": self.service.playing()}
+        elif cmd == "list":
+            groups, hotkeys = self.service.library.load()
+            return {"ok": True, "groups": groups, "hotkeys": dict(hotkeys)}
+        elif cmd == "subscribe":
+            return _SUBSCRIBE
+        else:
+            return {"ok": False, "error": f"未知命令: {cmd}"}
+        return {"ok": True}
+
+    def _stream_events(self, conn):
+        subscriber = _Subscriber(conn)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            conn.sendall(_encode({"ok": True}))
+            subscriber.run()
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+def _encode(message):
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class IpcClient:
+    """IpcServer 的客户端，保持一个连接，可以连续发送请求"""
+
+    def __init__(self, socket_path, timeout=5.0):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(str(socket_path))
+        self._reader = self._sock.makefile("rb")
+
+    def request(self, cmd, **kwargs):
+        self._sock.sendall(_encode(dict(kwargs, cmd=cmd)))
+        return self._read()
+
+    def events(self):
+        """订阅状态事件，逐个返回事件字典，之后这个连接不能再发送请求"""
+        response = self.request("subscribe")
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error"))
+        self._sock.settimeout(None)
+        while True:
+            event = self._read()
+            if event is None:
+                return
+            yield event
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,482 @@
+import time
+import queue
+import sqlite3
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS music_groups (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    group_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_group ON tracks (group_name, position);
+CREATE INDEX IF NOT EXISTS tracks_path ON tracks (path);
+CREATE TABLE IF NOT EXISTS hotkeys (
+    hotkey TEXT PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS watched_dirs (
+    root TEXT PRIMARY KEY,
+    group_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dir_index (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, path)
+);
+CREATE TABLE IF NOT EXISTS file_index (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (root, path)
+);
+CREATE TABLE IF NOT EXISTS track_info (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    samplerate INTEGER NOT NULL,
+    channels INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analysis (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    loudness REAL,
+    peak REAL NOT NULL,
+    start_s REAL NOT NULL,
+    end_s REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sound_options (
+    path TEXT PRIMARY KEY,
+    trim_silence INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS peaks (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    slot INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS content_hashes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS canonical_paths (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL
+);
+"""
+
+# 升级脚本: MIGRATIONS[n] 把版本 n 的数据库升级到 n + 1
+MIGRATIONS = {}
+
+_APPEND_TRACK = """
+INSERT INTO tracks (group_name, path, position)
+VALUES (?1, ?2, (SELECT COALESCE(MAX(position), -1) + 1
+                 FROM tracks WHERE group_name = ?1))
+"""
+_REMOVE_TRACK = """
+DELETE FROM tracks WHERE id = (
+    SELECT id FROM tracks WHERE group_name = ? AND path = ?
+    ORDER BY position LIMIT 1)
+"""
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class LibraryStore:
+    """
+    音乐库 (分组、音乐和快捷键) 的 SQLite 存储
+
+    每次修改只写入变化的行。写操作先放进队列，由后台线程在 delay 秒内合并成
+    一个事务提交，界面线程不做磁盘 I/O。某条语句出错时整批回滚，再逐条重新提交，
+    只丢弃出错的语句。
+    读取 (启动时加载) 使用单独的连接，数据库为 WAL 模式，读写互不阻塞。
+    """
+
+    def __init__(self, db_path, delay=0.5):
+        self.db_path = str(db_path)
+        self.delay = delay
+        self._queue = queue.SimpleQueue()
+        conn = self._connect()
+        try:
+            self._upgrade(conn)
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _upgrade(conn):
+        """创建新数据库，或按 MIGRATIONS 逐个版本升级旧数据库"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"音乐库版本 {version} 高于程序支持的版本 {SCHEMA_VERSION}")
+        if version == 0:
+            conn.executescript(SCHEMA)
+        else:
+            for v in range(version, SCHEMA_VERSION):
+                conn.executescript(MIGRATIONS[v])
+        # PRAGMA 不支持参数绑定
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # 读取
+
+    def load(self):
+        """返回 ({分组名: [音乐路径]}, [(快捷键, 音乐路径)])，分组保持原有顺序"""
+        conn = self._connect()
+        try:
+            groups = {name: [] for name, in conn.execute(
+                "SELECT name FROM music_groups ORDER BY position")}
+            for group_name, path in conn.execute(
+                    "SELECT group_name, path FROM tracks ORDER BY position, id"):
+                groups.setdefault(group_name, []).append(path)
+            hotkeys = conn.execute("SELECT hotkey, path FROM hotkeys").fetchall()
+        finally:
+            conn.close()
+        return groups, hotkeys
+
+    def load_watched(self):
+        """返回 {监视的目录: 分组名}"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT root, group_name FROM watched_dirs"))
+        finally:
+            conn.close()
+
+    def load_index(self, root):
+        """返回监视目录的索引 ({目录: mtime_ns}, {目录: {文件: (mtime_ns, size)}})"""
+        conn = self._connect()
+        try:
+            dirs = dict(conn.execute(
+                "SELECT path, mtime_ns FROM dir_index WHERE root = ?", (root,)))
+            files = {d: {} for d in dirs}
+            for path, directory, mtime_ns, size in conn.execute(
+                    "SELECT path, dir, mtime_ns, size FROM file_index "
+                    "WHERE root = ?", (root,)):
+                files.setdefault(directory, {})[path] = (mtime_ns, size)
+        finally:
+            conn.close()
+        return dirs, files
+
+    def load_track_info(self):
+        """返回缓存的音频信息 {路径: (mtime_ns, size, duration, samplerate, channels)}"""
+        conn = self._connect()
+        try:
+            return {row[0]: row[1:] for row in conn.execute(
+                "SELECT path, mtime_ns, size, duration, samplerate, channels "
+                "FROM track_info")}
+        finally:
+            conn.close()
+
+    def load_analysis(self):
+        """返回音频分析结果 {路径: (mtime_ns, size, loudness, peak, start_s, end_s)}"""
+        conn = self._connect()
+        try:
+            return {row[0]: row[1:] for row in conn.execute(
+                "SELECT path, mtime_ns, size, loudness, peak, start_s, end_s "
+                "FROM analysis")}
+        finally:
+            conn.close()
+
+    def load_trim_silence(self):
+        """返回开启了裁剪静音的音乐路径集合"""
+        conn = self._connect()
+        try:
+            return {path for path, in conn.execute(
+                "SELECT path FROM sound_options WHERE trim_silence")}
+        finally:
+            conn.close()
+
+    def load_peaks(self):
+        """返回波形缓存的索引 {路径: (mtime_ns, size, 记录号)}"""
+        conn = self._connect()
+        try:
+            return {row[0]: row[1:] for row in conn.execute(
+                "SELECT path, mtime_ns, size, slot FROM peaks")}
+        finally:
+            conn.close()
+
+    def load_content(self):
+        """返回 ({路径: (mtime_ns, size, 摘要)}, {摘要: 规范路径})"""
+        conn = self._connect()
+        try:
+            hashes = {row[0]: row[1:] for row in conn.execute(
+                "SELECT path, mtime_ns, size, hash FROM content_hashes")}
+            canonical = dict(conn.execute("SELECT hash, path FROM canonical_paths"))
+        finally:
+            conn.close()
+        return hashes, canonical
+
+    def get_meta(self, key, default=None):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else default
+
+    def is_empty(self):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM music_groups)").fetchone()[0] == 1
+        finally:
+            conn.close()
+
+    # 写入 (异步，按队列顺序执行)
+
+    def set_meta(self, key, value):
+        self._submit("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def add_group(self, name):
+        self._submit(
+            "INSERT OR IGNORE INTO music_groups (name, position) "
+            "VALUES (?1, (SELECT COALESCE(MAX(position), -1) + 1 FROM music_groups))",
+            (name,))
+
+    def remove_group(self, name):
+        self._submit("DELETE FROM tracks WHERE group_name = ?", (name,))
+        self._submit("DELETE FROM music_groups WHERE name = ?", (name,))
+
+    def add_tracks(self, group_name, music_paths):
+        """追加到分组末尾"""
+        self._submit(_APPEND_TRACK, [(group_name, p) for p in music_paths],
+                     many=True)
+
+    def remove_track(self, group_name, music_path):
+        """从分组中移除一首音乐 (同一路径出现多次时只移除第一次出现)"""
+        self._submit(_REMOVE_TRACK, (group_name, music_path))
+
+    def move_track(self, music_path, source_group, target_group):
+        self.remove_track(source_group, music_path)
+        self.add_tracks(target_group, [music_path])
+
+    def set_hotkey(self, hotkey, music_path):
+        """绑定快捷键，替换该音乐原有的快捷键和该快捷键原有的音乐"""
+        self._submit("DELETE FROM hotkeys WHERE hotkey = ? OR path = ?",
+                     (hotkey, music_path))
+        self._submit("INSERT INTO hotkeys VALUES (?, ?)", (hotkey, music_path))
+
+    def remove_hotkey(self, hotkey):
+        self._submit("DELETE FROM hotkeys WHERE hotkey = ?", (hotkey,))
+
+    def add_watched(self, root, group_name):
+        """记录监视的目录，旧的索引作废"""
+        self.remove_watched(root)
+        self._submit("INSERT INTO watched_dirs VALUES (?, ?)", (root, group_name))
+
+    def remove_watched(self, root):
+        self._submit("DELETE FROM watched_dirs WHERE root = ?", (root,))
+        self._submit("DELETE FROM dir_index WHERE root = ?", (root,))
+        self._submit("DELETE FROM file_index WHERE root = ?", (root,))
+
+    def update_index(self, root, dirs=(), removed_dirs=(), files=(),
+                     removed_files=()):
+        """
+        更新监视目录的索引
+
+        :param dirs: [(目录, mtime_ns)]，新增或变化的目录
+        :param files: [(文件, 所在目录, mtime_ns, size)]，新增或变化的文件
+        """
+        if dirs:
+            self._submit("INSERT OR REPLACE INTO dir_index VALUES (?, ?, ?)",
+                         [(root, d, m) for d, m in dirs], many=True)
+        if removed_dirs:
+            self._submit("DELETE FROM dir_index WHERE root = ? AND path = ?",
+                         [(root, d) for d in removed_dirs], many=True)
+        if files:
+            self._submit("INSERT OR REPLACE INTO file_index VALUES (?, ?, ?, ?, ?)",
+                         [(root, p, d, m, size) for p, d, m, size in files],
+                         many=True)
+        if removed_files:
+            self._submit("DELETE FROM file_index WHERE root = ? AND path = ?",
+                         [(root, p) for p in removed_files], many=True)
+
+    def update_track_info(self, rows):
+        """rows: [(路径, mtime_ns, size, duration, samplerate, channels)]"""
+        self._submit("INSERT OR REPLACE INTO track_info VALUES (?, ?, ?, ?, ?, ?)",
+                     list(rows), many=True)
+
+    def update_analysis(self, rows):
+        """rows: [(路径, mtime_ns, size, loudness, peak, start_s, end_s)]"""
+        self._submit("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     list(rows), many=True)
+
+    def update_peaks(self, rows):
+        """rows: [(路径, mtime_ns, size, 记录号)]"""
+        self._submit("INSERT OR REPLACE INTO peaks VALUES (?, ?, ?, ?)",
+                     list(rows), many=True)
+
+    def remove_peaks(self, music_paths):
+        self._submit("DELETE FROM peaks WHERE path = ?",
+                     [(p,) for p in music_paths], many=True)
+
+    def clear_peaks(self):
+        self._submit("DELETE FROM peaks", ())
+
+    def update_content(self, rows):
+        """rows: [(路径, mtime_ns, size, 摘要)]"""
+        self._submit("INSERT OR REPLACE INTO content_hashes VALUES (?, ?, ?, ?)",
+                     list(rows), many=True)
+
+    def remove_content(self, music_paths):
+        self._submit("DELETE FROM content_hashes WHERE path = ?",
+                     [(p,) for p in music_paths], many=True)
+
+    def set_canonical(self, rows):
+        """rows: [(摘要, 规范路径)]"""
+        self._submit("INSERT OR REPLACE INTO canonical_paths VALUES (?, ?)",
+                     list(rows), many=True)
+
+    def remove_canonical(self, hashes):
+        self._submit("DELETE FROM canonical_paths WHERE hash = ?",
+                     [(h,) for h in hashes], many=True)
+
+    def set_trim_silence(self, music_path, enabled):
+        self._submit("INSERT OR REPLACE INTO sound_options VALUES (?, ?)",
+                     (music_path, int(enabled)))
+
+    def replace_all(self, groups, hotkeys):
+        """用给定的内容替换整个音乐库 (用于迁移旧的设置)"""
+        self._submit("DELETE FROM tracks", ())
+        self._submit("DELETE FROM music_groups", ())
+        self._submit("DELETE FROM hotkeys", ())
+        for name, music_paths in groups.items():
+            self.add_group(name)
+            self.add_tracks(name, music_paths)
+        for hotkey, music_path in hotkeys:
+            self.set_hotkey(hotkey, music_path)
+
+    def flush(self, timeout=None):
+        """立即提交队列中的所有写操作并等待完成"""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        self._queue.put((_CLOSE, None))
+        self._thread.join(timeout)
+
+    def _submit(self, sql, params, many=False):
+        self._queue.put((sql, params, many))
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch, waiters, closing = [], [], False
+            deadline = time.monotonic() + self.delay
+            while True:
+                if item[0] is _FLUSH:
+                    waiters.append(item[1])
+                elif item[0] is _CLOSE:
+                    closing = True
+                else:
+                    batch.append(item)
+                # 收到 flush/close 时不再等待后续写操作
+                timeout = deadline - time.monotonic()
+                if waiters or closing or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(conn, batch)
+            for done in waiters:
+                done.set()
+            if closing:
+                conn.close()
+                return
+
+    @staticmethod
+    def _commit(conn, batch):
+        start = time.perf_counter()
+        try:
+            with conn:
+                for sql, params, many in batch:
+                    if many:
+                        conn.executemany(sql, params)
+                    else:
+                        conn.execute(sql, params)
+        except sqlite3.Error as e:
+            # 整批已回滚，逐条重新提交，其余的修改不受出错语句影响
+            log.warning("保存音乐库失败 (%d 个操作)，逐条重试: %s", len(batch), e)
+            for sql, params, many in batch:
+                try:
+                    with conn:
+                        if many:
+                            conn.executemany(sql, params)
+                        else:
+                            conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    log.error("保存音乐库失败: %s (%s)", e, sql.strip())
+            return
+        log.debug("保存音乐库: %d 个操作, 用时 %.1f ms",
+                  len(batch), (time.perf_counter() - start) * 1000)
+
+
+def migrate_qsettings(store, settings):
+    """
+    旧版本把音乐库保存在 QSettings 数组中，首次启动时导入数据库
+
+    只在数据库为空时导入，返回导入的分组数
+    """
+    if store.get_meta("qsettings_migrated"):
+        return 0
+    groups, hotkeys = {}, []
+    if store.is_empty() and settings.contains("groups/size"):
+        size = settings.beginReadArray("groups")
+        for i in range(size):
+            settings.setArrayIndex(i)
+            group_name = settings.value("name")
+            music_files = []
+            file_count = settings.beginReadArray("music_files")
+            for j in range(file_count):
+                settings.setArrayIndex(j)
+                music_files.append(settings.value("path"))
+            settings.endArray()
+            groups.setdefault(group_name, music_files)
+        settings.endArray()
+        size = settings.beginReadArray("hotkeys")
+        for i in range(size):
+            settings.setArrayIndex(i)
+            hotkey = settings.value("hotkey")
+            music_path = settings.value("music_path")
+            if hotkey and music_path:
+                hotkeys.append((hotkey, music_path))
+        settings.endArray()
+        store.replace_all(groups, hotkeys)
+    store.set_meta("qsettings_migrated", 1)
+    store.flush()
+    return len(groups)
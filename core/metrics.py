@@ -0,0 +1,118 @@
+import os
+import csv
+import json
+import threading
+from collections import deque
+
+import numpy as np
+
+# 导出和统计中使用的阶段，值为相对按键时刻的毫秒数
+STAGES = ("dispatch", "loaded", "started", "first_callback", "output")
+
+
+class Trace:
+    """
+    一次触发从按键到声音输出的各阶段时间戳 (time.perf_counter 秒)
+
+    output 是根据回调中的 outputBufferDacTime 推算的声音实际离开设备的时刻。
+    """
+    __slots__ = ("music_path", "key_event", "dispatch", "loaded", "started",
+                 "first_callback", "output", "cache_hit", "decode_ms")
+
+    def __init__(self, music_path, key_event):
+        self.music_path = music_path
+        self.key_event = key_event
+        self.dispatch = None
+        self.loaded = None
+        self.started = None
+        self.first_callback = None
+        self.output = None
+        self.cache_hit = None
+        self.decode_ms = None
+
+    @property
+    def complete(self):
+        return self.first_callback is not None
+
+    def stage_ms(self, stage):
+        value = getattr(self, stage)
+        return None if value is None else (value - self.key_event) * 1000
+
+    @property
+    def latency_ms(self):
+        """按键到声音输出的总延迟，没有 DAC 时间时以第一次回调为准"""
+        end = self.output if self.output is not None else self.first_callback
+        return None if end is None else (end - self.key_event) * 1000
+
+    def to_dict(self):
+        row = {"music_path": self.music_path,
+               "cache_hit": self.cache_hit,
+               "decode_ms": self.decode_ms,
+               "latency_ms": self.latency_ms}
+        for stage in STAGES:
+            row[stage + "_ms"] = self.stage_ms(stage)
+        return row
+
+
+class LatencyMetrics:
+    """保存最近的触发记录，按音乐统计延迟分位数"""
+
+    def __init__(self, max_traces=2000):
+        self.traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def start(self, music_path, key_event):
+        trace = Trace(music_path, key_event)
+        with self._lock:
+            self.traces.append(trace)
+        return trace
+
+    def completed(self):
+        with self._lock:
+            return [t for t in self.traces if t.complete]
+
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+
+    def summary(self):
+        """{music_path: {count, p50, p95, p99, cache_hit_rate}}，延迟单位为毫秒"""
+        by_path = {}
+        for trace in self.completed():
+            by_path.setdefault(trace.music_path, []).append(trace)
+        result = {}
+        for music_path, traces in by_path.items():
+            latencies = np.array([t.latency_ms for t in traces])
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            hits = [t.cache_hit for t in traces if t.cache_hit is not None]
+            result[music_path] = {
+                "count": len(traces),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "cache_hit_rate": sum(hits) / len(hits) if hits else None,
+            }
+        return result
+
+
+def export_json(file_path, report):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+
+def export_csv(file_path, traces):
+    rows = [t.to_dict() for t in traces]
+    fields = ["music_path", "latency_ms"] + [s + "_ms" for s in STAGES] + \
+        ["cache_hit", "decode_ms"]
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def export_report(file_path, report, traces):
+    """按扩展名导出为 JSON (汇总 + 明细) 或 CSV (明细)"""
+    if os.path.splitext(file_path)[1].lower() == ".csv":
+        export_csv(file_path, traces)
+    else:
+        export_json(file_path, dict(report, traces=[t.to_dict() for t in traces]))
@@ -0,0 +1,169 @@
+import time
+import logging
+import itertools
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class Voice:
+    """混音器中的一路声音"""
+
+    def __init__(self, source, key=None, gain=1.0, blocksize=1024,
+                 out_channels=2, trace=None):
+        self.source = source
+        self.key = key        # 通常是音乐路径，用于停止/查询
+        self.gain = gain
+        self.trace = trace    # metrics.Trace，第一次被混音时记录时间后清空
+        self.serial = 0       # 加入混音器的顺序，由 Mixer.add 设置
+        # 在控制线程中预先分配好缓冲区，回调中不再分配内存
+        self._scratch = np.zeros((blocksize, source.channels), dtype='float32')
+        # 声道映射: 单声道广播到所有声道，多余的声道丢弃
+        channels = source.channels
+        if channels == out_channels or channels == 1:
+            self._src_cols = self._dst_cols = slice(None)
+        elif channels > out_channels:
+            self._src_cols, self._dst_cols = slice(0, out_channels), slice(None)
+        else:
+            self._src_cols, self._dst_cols = slice(None), slice(0, channels)
+
+    def mix_into(self, outdata, frames, time_info=None):
+        """把本路声音叠加到 outdata，返回是否已经播放完毕"""
+        if self.trace is not None:
+            self._stamp(time_info)
+        if frames > len(self._scratch):
+            # 只有设备不按固定块大小回调时才会发生
+            self._scratch = np.zeros(
+                (frames, self._scratch.shape[1]), dtype='float32')
+        block = self._scratch[:frames]
+        n = self.source.read(block)
+
+        src = self._scratch[:n, self._src_cols]
+        if self.gain != 1.0:
+            np.multiply(src, self.gain, out=src)
+        dst = outdata[:n, self._dst_cols]
+        np.add(dst, src, out=dst)
+        return self.source.finished
+
+    def _stamp(self, time_info):
+        """记录第一次回调的时刻，并按 DAC 时间推算声音实际输出的时刻"""
+        trace, self.trace = self.trace, None
+        trace.first_callback = time.perf_counter()
+        if time_info is not None:
+            delay = time_info.outputBufferDacTime - time_info.currentTime
+            # 部分驱动不提供时间信息，此时两个值都是 0
+            if time_info.currentTime > 0 and delay >= 0:
+                trace.output = trace.first_callback + delay
+
+
+class Mixer:
+    """
+    多路混音器
+
+    增删声音的请求先放进队列，由音频回调在每个周期开始时取出处理。
+    活动声音放在预先分配的固定长度槽位列表中，回调只替换槽位的元素，
+    增删声音和声音结束时都不重建列表；其他线程只读取槽位的快照。
+    gain 是整个输出 (设备) 的音量，混音完成后对输出乘一次。
+    """
+
+    def __init__(self, max_voices=8, gain=1.0):
+        self.max_voices = max_voices
+        self.gain = gain
+        self.slots = [None] * max_voices  # 长度不变，空槽位为 None
+        self.count = 0            # 占用的槽位数
+        self.finished = deque()   # 已结束待关闭的声音
+        self._pending = deque()   # (操作, 参数)
+        self._serial = itertools.count()
+
+    @property
+    def voices(self):
+        """活动声音的快照，按槽位顺序"""
+        return [v for v in self.slots if v is not None]
+
+    def add(self, voice):
+        # 开始的先后顺序，槽位用完时淘汰最早开始的声音
+        voice.serial = next(self._serial)
+        self._pending.append(("add", voice))
+
+    def remove(self, key):
+        self._pending.append(("remove", key))
+
+    def clear(self):
+        self._pending.append(("clear", None))
+
+    def reset(self):
+        """音频流已停止时使用：直接清空并返回所有声音"""
+        voices = self.voices + [arg for op, arg in self._pending if op == "add"]
+        for i in range(self.max_voices):
+            self.slots[i] = None
+        self.count = 0
+        self._pending.clear()
+        return voices
+
+    def is_playing(self, key):
+        if any(v is not None and v.key == key for v in self.slots):
+            return True
+        return any(op == "add" and arg.key == key
+                   for op, arg in list(self._pending))
+
+    @property
+    def active(self):
+        return self.count > 0 or bool(self._pending)
+
+    def _add(self, voice):
+        slots = self.slots
+        free = oldest = -1
+        for i in range(self.max_voices):
+            v = slots[i]
+            if v is None:
+                free = i
+                break
+            if oldest < 0 or v.serial < slots[oldest].serial:
+                oldest = i
+        if free < 0:
+            # 超出上限时淘汰最早开始的声音
+            self.finished.append(slots[oldest])
+            slots[oldest] = voice
+        else:
+            slots[free] = voice
+            self.count += 1
+
+    def _remove(self, key, everything=False):
+        slots = self.slots
+        for i in range(self.max_voices):
+            v = slots[i]
+            if v is not None and (everything or v.key == key):
+                self.finished.append(v)
+                slots[i] = None
+                self.count -= 1
+
+    def mix(self, outdata, frames, time_info=None):
+        """
+        在音频回调中调用，返回本周期是否有声音变为全部结束
+
+        :param time_info: 回调的 time 参数，用于记录延迟
+        """
+        changed = False
+        while self._pending:
+            op, arg = self._pending.popleft()
+            if op == "add":
+                self._add(arg)
+            else:
+                self._remove(arg, everything=op == "clear")
+            changed = True
+
+        outdata.fill(0)
+        slots = self.slots
+        if self.count:
+            for i in range(self.max_voices):
+                voice = slots[i]
+                if voice is not None and voice.mix_into(outdata, frames, time_info):
+                    self.finished.append(voice)
+                    slots[i] = None
+                    self.count -= 1
+                    changed = True
+            if self.gain != 1.0:
+                np.multiply(outdata, self.gain, out=outdata)
+        return changed and not self.count
@@ -0,0 +1,266 @@
+import os
+import time
+import struct
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+BUCKETS = 512
+MAGIC = b"MPPK"
+VERSION = 1
+# magic, version, buckets
+HEADER = struct.Struct("<4sHH")
+HEADER_SIZE = 16
+RECORD_SIZE = BUCKETS * 2  # 每个桶的 (min, max)，各一个 int8
+# 文件数达到该值时使用进程池，少量文件直接在当前线程中计算
+PROCESS_POOL_THRESHOLD = 8
+# 每计算完这么多个文件就写入并通知界面刷新一次
+BATCH_SIZE = 256
+# 与 analysis 相同，进程池用 spawn 启动，不 fork 带有其他线程的进程
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def compute_peaks(music_path, buckets=BUCKETS):
+    """
+    分块读取整个文件，返回 (buckets, 2) 的 int8 数组，每行为该段所有声道的 (min, max)
+
+    数值按 127 量化，不把整个文件解码到内存。在进程池中执行，只依赖 numpy 和 soundfile。
+    """
+    import soundfile as sf
+    with sf.SoundFile(music_path) as f:
+        # 帧数少于桶数时每帧一个桶，最后再展开到 buckets 个，
+        # 否则重复的起始帧号会让开头的桶一直是空的
+        count = min(buckets, max(f.frames, 1))
+        lo = np.full(count, np.inf, dtype='float32')
+        hi = np.full(count, -np.inf, dtype='float32')
+        # 每个桶起始的帧号 (严格递增)
+        edges = np.arange(count) * max(f.frames, 1) // count
+        offset = 0
+        for block in f.blocks(blocksize=65536, dtype='float32', always_2d=True):
+            n = len(block)
+            if not n:
+                continue
+            first = np.searchsorted(edges, offset, side='right') - 1
+            last = np.searchsorted(edges, offset + n, side='left')
+            # 块内每一段的起点，第一段接着上一块的最后一个桶
+            starts = np.maximum(edges[first:last] - offset, 0)
+            lo[first:last] = np.minimum(
+                lo[first:last], np.minimum.reduceat(block.min(axis=1), starts))
+            hi[first:last] = np.maximum(
+                hi[first:last], np.maximum.reduceat(block.max(axis=1), starts))
+            offset += n
+    peaks = np.zeros((count, 2), dtype='int8')
+    filled = lo <= hi
+    peaks[filled, 0] = _quantize(lo[filled])
+    peaks[filled, 1] = _quantize(hi[filled])
+    if count < buckets:
+        peaks = peaks[np.arange(buckets) * count // buckets]
+    return peaks
+
+
+def _quantize(values):
+    return np.clip(np.round(values * 127), -127, 127).astype('int8')
+
+
+def _compute(music_path):
+    """进程池的任务：返回 (path, mtime_ns, size, peaks)，失败时返回 None"""
+    try:
+        st = os.stat(music_path)
+        peaks = compute_peaks(music_path)
+    except Exception:
+        return None
+    return music_path, st.st_mtime_ns, st.st_size, peaks
+
+
+class PeakCache:
+    """
+    波形缩略图缓存
+
+    所有文件的峰值数组存放在一个二进制文件中：16 字节的头部之后是定长的记录，
+    每条 BUCKETS * 2 字节。{路径: (mtime_ns, size, 记录号)} 的索引保存在 LibraryStore 中，
+    文件变化后重新计算并写回原来的记录，删除的文件空出的记录会被复用。
+
+    get 只在列表绘制某一行时调用，按需读取一条记录，最近读取的记录保存在内存中，
+    滚动大列表时只有可见的行会被读取。给出 content (ContentIndex) 时以规范路径为键，
+    内容相同的文件共用一条记录。
+    """
+
+    def __init__(self, cache_file, store, max_entries=4096, content=None):
+        self.cache_file = str(cache_file)
+        self.store = store
+        self.content = content
+        self.max_entries = max_entries
+        self._index = {}         # {path: (mtime_ns, size, slot)}
+        self._free = []          # 空闲的记录号
+        self._next_slot = 0
+        self._entries = OrderedDict()  # {path: peaks}，最近读取的记录
+        self._loaded = False
+        self._file = None
+        self._lock = threading.Lock()          # 保护文件读写和 _entries
+        self._compute_lock = threading.Lock()  # 同一时间只运行一个计算任务
+
+    def get(self, music_path):
+        """返回 (BUCKETS, 2) 的 int8 数组，尚未计算时返回 None"""
+        if self.content is not None:
+            music_path = self.content.canonical(music_path)
+        with self._lock:
+            peaks = self._entries.get(music_path)
+            if peaks is not None:
+                self._entries.move_to_end(music_path)
+                return peaks
+            entry = self._index.get(music_path)
+            if entry is None or self._file is None:
+                return None
+            try:
+                self._file.seek(HEADER_SIZE + entry[2] * RECORD_SIZE)
+                record = self._file.read(RECORD_SIZE)
+            except OSError as e:
+                log.warning("读取波形缓存失败: %s", e)
+                return None
+            if len(record) != RECORD_SIZE:
+                return None
+            peaks = np.frombuffer(record, dtype='int8').reshape(BUCKETS, 2)
+            self._entries[music_path] = peaks
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return peaks
+
+    def put(self, music_path, mtime_ns, size, peaks):
+        """写入一条记录，返回索引行 (path, mtime_ns, size, slot)，需先调用 load"""
+        peaks = np.ascontiguousarray(peaks, dtype='int8')
+        with self._lock:
+            entry = self._index.get(music_path)
+            if entry is not None:
+                slot = entry[2]
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                slot = self._next_slot
+                self._next_slot += 1
+            self._file.seek(HEADER_SIZE + slot * RECORD_SIZE)
+            self._file.write(peaks.tobytes())
+            self._index[music_path] = (mtime_ns, size, slot)
+            self._entries.pop(music_path, None)
+        return music_path, mtime_ns, size, slot
+
+    def invalidate(self, music_path):
+        """文件被删除后调用，空出的记录留给以后的文件使用"""
+        with self._lock:
+            self._entries.pop(music_path, None)
+            entry = self._index.pop(music_path, None)
+            if entry is None:
+                return
+            self._free.append(entry[2])
+        self.store.remove_peaks([music_path])
+
+    def load(self):
+        """打开缓存文件并读取索引，需在后台线程中调用"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            index = self.store.load_peaks()
+            try:
+                self._file, reused = self._open()
+            except OSError as e:
+                log.warning("打开波形缓存 %s 失败: %s", self.cache_file, e)
+                return
+            if not reused:
+                # 新文件或格式不符，旧的索引作废
+                index = {}
+                self.store.clear_peaks()
+            used = {slot for _, _, slot in index.values()}
+            self._next_slot = max(used) + 1 if used else 0
+            self._free = sorted(set(range(self._next_slot)) - used, reverse=True)
+            self._index = index
+
+    def _open(self):
+        """返回 (文件, 是否沿用已有的内容)"""
+        header = HEADER.pack(MAGIC, VERSION, BUCKETS).ljust(HEADER_SIZE, b"\0")
+        try:
+            f = open(self.cache_file, "r+b")
+        except FileNotFoundError:
+            f = open(self.cache_file, "w+b")
+        if f.read(HEADER_SIZE) == header:
+            return f, True
+        f.seek(0)
+        f.truncate()
+        f.write(header)
+        f.flush()
+        return f, False
+
+    def compute(self, music_paths, workers=None, on_ready=None, cancel=None):
+        """
+        计算尚未缓存或已变化的文件，返回新计算的文件数，需在后台线程中调用
+
+        :param on_ready: on_ready([路径])，每写入一批后在当前线程中调用，
+                         路径为规范路径
+        :param cancel: threading.Event，设置后写完当前一批即停止
+        """
+        with self._compute_lock:
+            self.load()
+            if self._file is None:
+                return 0
+            if self.content is not None:
+                music_paths = map(self.content.canonical, music_paths)
+            todo = []
+            for music_path in dict.fromkeys(music_paths):
+                try:
+                    st = os.stat(music_path)
+                except OSError:
+                    continue
+                entry = self._index.get(music_path)
+                if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+                    todo.append(music_path)
+            if not todo:
+                return 0
+
+            start = time.perf_counter()
+            done = 0
+            if len(todo) >= PROCESS_POOL_THRESHOLD:
+                with ProcessPoolExecutor(workers, mp_context=POOL_CONTEXT) as pool:
+                    for batch in _batches(pool.map(_compute, todo, chunksize=4)):
+                        done += self._write(batch, on_ready)
+                        if cancel is not None and cancel.is_set():
+                            pool.shutdown(cancel_futures=True)
+                            break
+            else:
+                for batch in _batches(map(_compute, todo)):
+                    done += self._write(batch, on_ready)
+                    if cancel is not None and cancel.is_set():
+                        break
+            log.info("波形缩略图: %d 个文件, 失败 %d 个, 用时 %.2fs", done,
+                     len(todo) - done, time.perf_counter() - start)
+            return done
+
+    def _write(self, results, on_ready):
+        rows = [self.put(*r) for r in results if r is not None]
+        with self._lock:
+            self._file.flush()
+        self.store.update_peaks(rows)
+        if rows and on_ready is not None:
+            on_ready([row[0] for row in rows])
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _batches(results):
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,46 @@
+import random
+
+SEQUENTIAL = "sequential"
+SHUFFLE = "shuffle"
+LOOP = "loop"
+MODES = (SEQUENTIAL, SHUFFLE, LOOP)
+
+
+class PlayQueue:
+    """
+    分组的播放顺序
+
+    SEQUENTIAL 按列表顺序播放一遍，SHUFFLE 打乱顺序播放一遍，
+    LOOP 按列表顺序循环播放。只负责决定下一首，不涉及解码和播放。
+    """
+
+    def __init__(self, music_paths, mode=SEQUENTIAL, rng=None):
+        if mode not in MODES:
+            raise ValueError(f"未知的播放模式: {mode}")
+        self.mode = mode
+        self.music_paths = list(music_paths)
+        if mode == SHUFFLE:
+            (rng or random).shuffle(self.music_paths)
+        self.position = 0
+
+    def __len__(self):
+        return len(self.music_paths)
+
+    def next(self):
+        """返回下一首的路径，播放完毕时返回 None"""
+        if not self.music_paths:
+            return None
+        if self.position >= len(self.music_paths):
+            if self.mode != LOOP:
+                return None
+            self.position = 0
+        music_path = self.music_paths[self.position]
+        self.position += 1
+        return music_path
+
+    def skip(self, music_path):
+        """从队列中去掉无法播放的文件，避免循环播放时反复出错"""
+        index = self.position - 1
+        if 0 <= index < len(self.music_paths) and self.music_paths[index] == music_path:
+            del self.music_paths[index]
+            self.position = index
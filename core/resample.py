@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 每次计算的输出帧数，限制临时数组 (CHUNK_FRAMES * 声道数 * 系数个数) 的大小
+CHUNK_FRAMES = 8192
+# 通带上限占目标 Nyquist 频率的比例，之上到 Nyquist 频率是过渡带
+ROLLOFF = 0.9
+# Kaiser 窗的 beta，约 86 dB 阻带衰减
+KAISER_BETA = 8.6
+# 不变采样率时的系数个数，降采样时按比例增加
+TAPS = 96
+
+
+def remix(data, channels):
+    """把 (frames, ch) 的音频转换为指定的声道数"""
+    src = data.shape[1]
+    if src == channels:
+        return data
+    if channels == 1:
+        return data.mean(axis=1, keepdims=True, dtype='float32')
+    if src == 1:
+        return np.repeat(data, channels, axis=1)
+    if src > channels:
+        return np.ascontiguousarray(data[:, :channels])
+    out = np.zeros((len(data), channels), dtype='float32')
+    out[:, :src] = data
+    return out
+
+
+def _design_table(up, down, taps, rolloff=ROLLOFF, beta=KAISER_BETA):
+    """
+    设计多相滤波器系数表
+
+    返回 (table, half)：table[phase] 是相位 phase/up 处的 2*half 个系数，
+    作用于以 floor(输出时刻) 为中心的 2*half 个输入样本。
+    截止频率 (-6 dB) 在通带上限和 Nyquist 频率的中点，Nyquist 频率处已进入阻带，
+    降采样时高于目标 Nyquist 频率的成分不会混叠到可听频段。
+    """
+    ratio = min(1.0, up / down)  # 降采样时按目标采样率降低截止频率
+    cutoff = ratio * (1 + rolloff) / 2
+    half = int(math.ceil(taps / 2 / ratio))
+    offsets = np.arange(-half + 1, half + 1)
+    t = np.arange(up)[:, None] / up - offsets[None, :]
+    window = np.kaiser(2 * half + 1, beta)
+    # 窗函数按 t 线性插值，t 的范围是 (-half, half]
+    w = np.interp(t, np.linspace(-half, half, 2 * half + 1), window)
+    table = cutoff * np.sinc(cutoff * t) * w
+    # 每个相位归一化，保证直流增益为 1
+    table /= table.sum(axis=1, keepdims=True)
+    return table.astype('float32'), half
+
+
+class Resampler:
+    """
+    有状态的多相重采样器
+
+    可以一次处理整个文件，也可以分块处理流式数据，分块结果与整体处理一致。
+    """
+
+    def __init__(self, src_rate, dst_rate, channels, taps=TAPS):
+        g = math.gcd(int(src_rate), int(dst_rate))
+        self.up = int(dst_rate) // g
+        self.down = int(src_rate) // g
+        self.channels = channels
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            self._table, self._half = _design_table(self.up, self.down, taps)
+            # 开头补 half 个零，_start 是 _buf[0] 对应的输入帧序号
+            self._buf = np.zeros((self._half, channels), dtype='float32')
+            self._start = -self._half
+        self._n = 0         # 下一个输出帧序号
+        self._in_frames = 0
+
+    def process(self, block, final=False):
+        """输入一块 (frames, channels) 数据，返回已能计算出的输出帧"""
+        if self.passthrough:
+            return block
+        self._in_frames += len(block)
+        buf = np.concatenate([self._buf, block]) if len(block) else self._buf
+        if final:
+            # 末尾补零，把剩余的输出全部算出来
+            buf = np.concatenate(
+                [buf, np.zeros((self._half, self.channels), dtype='float32')])
+            n_end = -(-self._in_frames * self.up // self.down)
+        else:
+            # 输出帧 n 需要的最后一个输入帧是 floor(n*down/up) + half
+            last = self._start + len(buf) - self._half - 1
+            n_end = -(-(last + 1) * self.up // self.down)
+        n_end = max(n_end, self._n)
+
+        out = np.empty((n_end - self._n, self.channels), dtype='float32')
+        # windows[i] 是从 buf[i] 开始的 2*half 帧，形状 (声道数, 2*half)；
+        # 输入还不够计算下一个输出帧时 buf 可能比 2*half 短
+        if n_end > self._n:
+            windows = sliding_window_view(buf, 2 * self._half, axis=0)
+        for pos in range(self._n, n_end, CHUNK_FRAMES):
+            stop = min(pos + CHUNK_FRAMES, n_end)
+            t = np.arange(pos, stop, dtype=np.int64) * self.down
+            base = t // self.up - self._half + 1 - self._start
+            coefs = self._table[t % self.up]
+            # 每个输出帧: (声道数, 2*half) @ (2*half, 1)
+            np.matmul(windows[base], coefs[:, :, None],
+                      out=out[pos - self._n:stop - self._n, :, None])
+        self._n = n_end
+
+        # 只保留之后的输出还会用到的输入
+        keep_from = (n_end * self.down) // self.up - self._half + 1
+        drop = min(max(keep_from - self._start, 0), len(buf))
+        self._buf = buf[drop:].copy()
+        self._start += drop
+        return out
+
+
+def convert(data, samplerate, target_rate, target_channels):
+    """把整段音频转换为目标采样率和声道数"""
+    data = remix(data, target_channels)
+    if int(samplerate) == int(target_rate):
+        return np.ascontiguousarray(data, dtype='float32')
+    return Resampler(samplerate, target_rate, target_channels).process(
+        data, final=True)
@@ -0,0 +1,245 @@
+import os
+import bisect
+from array import array
+from itertools import islice
+
+# 参与排序的候选数上限，命中很多时只在前面的候选中排序，保证查询耗时有上限
+POOL_SIZE = 500
+# 批量添加超过该数量时整体重新排序，否则逐个插入
+BULK_THRESHOLD = 1000
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    所有分组中音乐的内存搜索索引
+
+    每个 (分组, 路径) 是一个条目。文件名 (小写) 建立三元组倒排索引和有序的前缀表，
+    分组名和所在目录作为标签，按标签记录条目集合。查询时每个词先按文件名前缀、
+    再按文件名子串、最后按标签和目录路径查找候选，多个词要求全部匹配，
+    结果按匹配位置和文件名长度排序。
+
+    导入、移动、删除时增量更新。删除只把条目标记为失效，
+    失效条目多于有效条目时才整体重建。只在界面线程中使用。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._ids = {}          # {(分组, 路径): id}
+        self._keys = []         # id -> (分组, 路径)
+        self._names = []        # id -> 小写文件名，失效的条目为 None
+        self._dirs = []         # id -> 所在目录
+        self._grams = {}        # {三元组: array of id}，可能包含失效的 id
+        self._sorted = []       # [(小写文件名, id)]，用于前缀查找
+        self._group_members = {}  # {分组: {id}}
+        self._dir_members = {}    # {目录: {id}}
+        # 分组名和目录的小写形式，分开记录：分组名可能与某个目录的路径相同
+        self._group_lower = {}
+        self._dir_lower = {}
+        self._tags = ((self._group_members, self._group_lower),
+                      (self._dir_members, self._dir_lower))
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def rebuild(self, groups):
+        """groups: {分组名: [音乐路径]}"""
+        self.clear()
+        new = []
+        for group_name, music_paths in groups.items():
+            self._add(group_name, music_paths, new)
+        self._sorted = sorted(new)
+
+    def add(self, group_name, music_paths):
+        new = []
+        self._add(group_name, music_paths, new)
+        if len(new) > BULK_THRESHOLD:
+            self._sorted.extend(new)
+            self._sorted.sort()
+        else:
+            for item in new:
+                bisect.insort(self._sorted, item)
+
+    def _add(self, group_name, music_paths, new):
+        grams = self._grams
+        group_ids = self._member(self._group_members, self._group_lower, group_name)
+        for music_path in music_paths:
+            key = (group_name, music_path)
+            if key in self._ids:
+                continue
+            i = len(self._keys)
+            directory, name = os.path.split(music_path)
+            name = name.lower()
+            self._ids[key] = i
+            self._keys.append(key)
+            self._names.append(name)
+            self._dirs.append(directory)
+            for gram in _trigrams(name):
+                postings = grams.get(gram)
+                if postings is None:
+                    postings = grams[gram] = array('i')
+                postings.append(i)
+            group_ids.add(i)
+            self._member(self._dir_members, self._dir_lower, directory).add(i)
+            new.append((name, i))
+        if not group_ids:
+            self._discard(self._group_members, self._group_lower, group_name, None)
+
+    @staticmethod
+    def _member(members, lower, tag):
+        ids = members.get(tag)
+        if ids is None:
+            ids = members[tag] = set()
+            lower[tag] = tag.lower()
+        return ids
+
+    def remove(self, group_name, music_path):
+        i = self._ids.pop((group_name, music_path), None)
+        if i is None:
+            return
+        name = self._names[i]
+        index = bisect.bisect_left(self._sorted, (name, i))
+        if index < len(self._sorted) and self._sorted[index] == (name, i):
+            del self._sorted[index]
+        self._discard(self._group_members, self._group_lower, group_name, i)
+        self._discard(self._dir_members, self._dir_lower, self._dirs[i], i)
+        self._names[i] = None
+        self._dead += 1
+        if self._dead > 1000 and self._dead > len(self._ids):
+            self._compact()
+
+    @staticmethod
+    def _discard(members, lower, tag, i):
+        ids = members.get(tag)
+        if ids is not None:
+            ids.discard(i)
+            if not ids:
+                del members[tag]
+                del lower[tag]
+
+    def move(self, music_path, source_group, target_group):
+        i = self._ids.pop((source_group, music_path), None)
+        if i is None:
+            self.add(target_group, [music_path])
+            return
+        if (target_group, music_path) in self._ids:
+            # 目标分组已有这首音乐，相当于删除
+            self._ids[(source_group, music_path)] = i
+            self.remove(source_group, music_path)
+            return
+        self._ids[(target_group, music_path)] = i
+        self._keys[i] = (target_group, music_path)
+        self._discard(self._group_members, self._group_lower, source_group, i)
+        self._member(self._group_members, self._group_lower, target_group).add(i)
+
+    def remove_group(self, group_name):
+        for i in list(self._group_members.get(group_name, ())):
+            self.remove(*self._keys[i])
+
+    def _compact(self):
+        groups = {}
+        for i, (group_name, music_path) in enumerate(self._keys):
+            if self._names[i] is not None:
+                groups.setdefault(group_name, []).append(music_path)
+        self.rebuild(groups)
+
+    def search(self, text, limit=100):
+        """返回按相关度排序的 [(分组, 路径)]，所有词都要匹配 (不区分大小写)"""
+        terms = text.lower().split()
+        if not terms:
+            return []
+        # 用估计候选最少的词查找，其余的词逐个检查。
+        # 少于 3 个字符的词只能按前缀查找文件名，尽量不用它来查找
+        terms.sort(key=lambda term: (len(term) < 3, self._estimate(term)))
+        first, rest = terms[0], terms[1:]
+        filters = []
+        for term in rest:
+            groups = {tag for tag, lower in self._group_lower.items() if term in lower}
+            if len(groups) == len(self._group_members):
+                continue  # 所有分组名都包含这个词，不需要检查
+            dirs = {tag for tag, lower in self._dir_lower.items() if term in lower}
+            filters.append((term, groups, dirs))
+        pool = list(islice(_unique(self._filter(self._candidates(first), filters)),
+                           POOL_SIZE))
+        pool.sort(key=lambda i: self._rank(i, terms))
+        return [self._keys[i] for i in pool[:limit]]
+
+    def _estimate(self, term):
+        """估计一个词的候选数"""
+        entries = self._sorted
+        count = (bisect.bisect_left(entries, (term + "\U0010ffff",))
+                 - bisect.bisect_left(entries, (term,)))
+        if len(term) >= 3:
+            count += min((len(self._grams.get(gram, ())) for gram in _trigrams(term)),
+                         default=0)
+        for members, lower in self._tags:
+            for tag, ids in members.items():
+                if term in lower[tag]:
+                    count += len(ids)
+        return count
+
+    def _candidates(self, term):
+        """按相关度从高到低依次产生候选 (可能重复)"""
+        # 文件名前缀
+        entries = self._sorted
+        for k in range(bisect.bisect_left(entries, (term,)), len(entries)):
+            name, i = entries[k]
+            if not name.startswith(term):
+                break
+            yield i
+        # 文件名子串：从最短的倒排表中查找
+        if len(term) >= 3:
+            postings = []
+            for gram in _trigrams(term):
+                ids = self._grams.get(gram)
+                if ids is None:
+                    postings = None
+                    break
+                postings.append(ids)
+            if postings:
+                names = self._names
+                for i in min(postings, key=len):
+                    name = names[i]
+                    if name is not None and term in name:
+                        yield i
+        # 分组名、目录
+        for members, lower in self._tags:
+            for tag, ids in members.items():
+                if term in lower[tag]:
+                    yield from ids
+
+    def _filter(self, candidates, filters):
+        names, keys, dirs = self._names, self._keys, self._dirs
+        for i in candidates:
+            name = names[i]
+            for term, groups, directories in filters:
+                if not (term in name or keys[i][0] in groups or dirs[i] in directories):
+                    break
+            else:
+                yield i
+
+    def _rank(self, i, terms):
+        name = self._names[i]
+        score = 0
+        for term in terms:
+            if name.startswith(term):
+                score -= 3
+            elif term in name:
+                score -= 2
+            else:
+                score -= 1
+        return score, len(name), name
+
+
+def _unique(ids):
+    seen = set()
+    for i in ids:
+        if i not in seen:
+            seen.add(i)
+            yield i
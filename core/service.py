@@ -0,0 +1,239 @@
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+
+from core.analysis import AudioAnalyzer
+from core.cache import AudioCache
+from core.controller import QUEUE_KEY, PlaybackController
+from core.dedup import ContentIndex
+from core.diskcache import PcmDiskCache
+from core.engine import AudioEngine
+from core.library import LibraryStore
+from core.peaks import PeakCache
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class PlayerService:
+    """
+    播放核心：音乐库、解码缓存、音频分析、音频引擎和控制线程
+
+    不依赖 Qt 界面，图形界面 (main.py) 和无界面的守护进程 (daemon.py) 都基于它，
+    IpcServer 再把它提供给其他程序。两种模式共用同一份设置 (QSettings) 和音乐库。
+
+    状态变化和错误以事件字典通知 add_listener 注册的回调，回调在控制线程中执行，
+    不能阻塞:
+        {"event": "state", "playing": bool, "path": str 或 None}
+        {"event": "error", "path": str, "message": str}
+    """
+
+    def __init__(self, config_dir, settings, audio_backend=None):
+        """
+        :param settings: 需要提供 value(key, default, type=...) 和 setValue(key, value)
+        """
+        config_dir = Path(config_dir)
+        self.settings = settings
+        value = settings.value
+        # 磁盘上的已解码音频缓存，重启后首次播放也无需解码
+        self.disk_cache = PcmDiskCache(
+            config_dir / "pcm_cache",
+            value("disk_cache_size_mb", 4096, type=int) * MB)
+        # 分组、音乐和快捷键保存在 SQLite 中，每次修改只写入变化的行
+        self.library = LibraryStore(config_dir / "library.db")
+        # 内容摘要，内容相同的文件共用解码缓存、分析结果和波形
+        self.content = ContentIndex(self.library)
+        # 已解码音频缓存，避免每次触发都重新解码
+        self.audio_cache = AudioCache(
+            value("cache_size_mb", 512, type=int) * MB, self.disk_cache)
+        # 超过该大小的文件使用流式解码播放
+        self.stream_threshold = value("stream_threshold_mb", 64, type=int) * MB
+        # 波形缩略图，在后台计算，绘制时按需读取
+        self.peaks = PeakCache(config_dir / "peaks.bin", self.library,
+                               content=self.content)
+        # 常驻输出流 + 多路混音器
+        self.engine = AudioEngine(
+            value("max_voices", 8, type=int),
+            profile=value("latency_profile", "normal", type=str),
+            backend=audio_backend)
+        # 预先分析每个文件的响度和首尾静音，播放时只乘以一个增益、只取一段切片
+        self.analyzer = AudioAnalyzer(
+            self.library,
+            target_db=value("loudness_target_db", -18.0, type=float),
+            enabled=value("loudness_normalization", True, type=bool),
+            content=self.content,
+            on_stale=lambda music_path: self.analyze([music_path]))
+        # 所有播放命令经由控制线程的队列执行，调用方不直接操作引擎
+        self.controller = PlaybackController(
+            self.engine, self.audio_cache, self.stream_threshold,
+            on_state=self._on_state, on_error=self._on_error,
+            gain_for=self.analyzer.gain_for, trim_for=self.analyzer.trim_for,
+            resolve=self.content.resolve)
+        self._listeners = []
+        # 后台任务 (预解码、分析)，关闭时先等它们结束再关闭音乐库和波形文件
+        self._closing = threading.Event()
+        self._tasks = set()
+        self._tasks_lock = threading.Lock()
+
+    def start(self):
+        self.controller.start()
+        self.apply_outputs()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _emit(self, event):
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                log.error("处理事件 %s 失败: %s", event["event"], e)
+
+    def _on_state(self, playing, music_path):
+        self._emit({"event": "state", "playing": playing, "path": music_path})
+
+    def _on_error(self, music_path, message):
+        self._emit({"event": "error", "path": music_path, "message": message})
+
+    # 播放
+
+    def play(self, music_path):
+        self.controller.play(music_path)
+
+    def stop(self, music_path=None):
+        """停止一个声音，不指定时停止全部"""
+        if music_path is None:
+            self.controller.stop_all()
+        else:
+            self.controller.stop(music_path)
+
+    def toggle(self, music_path):
+        self.controller.toggle(music_path)
+
+    def play_queue(self, music_paths, mode):
+        """依次播放一组音乐，mode 见 core.playlist.MODES"""
+        self.controller.play_queue(music_paths, mode)
+
+    def playing(self):
+        """正在播放的音乐路径 (快照)，队列只列出当前的一首"""
+        paths = []
+        for voice in self.engine.mixer.voices:
+            if voice.key == QUEUE_KEY:
+                current = self.controller.queue_current
+                if current is not None:
+                    paths.append(current)
+            else:
+                paths.append(voice.key)
+        return paths
+
+    def set_device(self, device_id):
+        self.controller.set_device(device_id)
+
+    def output_settings(self):
+        """返回 (主设备音量 dB, {附加设备: 音量 dB})"""
+        primary_gain_db = self.settings.value("output_gain_db", 0.0, type=float)
+        try:
+            extra = {int(device_id): float(gain_db) for device_id, gain_db in
+                     json.loads(self.settings.value(
+                         "extra_outputs", "{}", type=str)).items()}
+        except (ValueError, AttributeError):
+            extra = {}
+        return primary_gain_db, extra
+
+    def set_outputs(self, primary_gain_db, extra):
+        """保存并应用多设备输出设置，extra: {附加设备: 音量 dB}"""
+        self.settings.setValue("output_gain_db", primary_gain_db)
+        self.settings.setValue("extra_outputs", json.dumps(extra))
+        self.apply_outputs()
+
+    def apply_outputs(self):
+        primary_gain_db, extra = self.output_settings()
+        self.controller.set_outputs(
+            10 ** (primary_gain_db / 20),
+            [(device_id, 10 ** (gain_db / 20))
+             for device_id, gain_db in extra.items()])
+
+    # 音乐库和缓存
+
+    def warm(self, music_paths):
+        """预先解码，先读取内容摘要，内容相同的文件只解码一次"""
+        def run():
+            try:
+                self.content.load()
+            except Exception as e:
+                log.error("读取内容摘要失败: %s", e)
+            if not self._closing.is_set():
+                self.controller.warm(music_paths)
+
+        self._start_task(run)
+
+    def analyze(self, music_paths, on_peaks_ready=None):
+        """
+        在后台依次计算内容摘要、分析音频和计算波形，避免两个进程池同时占满 CPU
+
+        :param on_peaks_ready: on_peaks_ready([路径])，包括与规范路径内容相同的所有路径
+        """
+        def on_ready(canonical_paths):
+            on_peaks_ready([p for c in canonical_paths
+                            for p in self.content.paths_for(c)])
+
+        def run():
+            try:
+                self.content.update(music_paths)
+            except Exception as e:
+                log.error("计算内容摘要失败: %s", e)
+            if self._closing.is_set():
+                return
+            try:
+                self.analyzer.analyze(music_paths, cancel=self._closing)
+            except Exception as e:
+                log.error("音频分析失败: %s", e)
+            if self._closing.is_set():
+                return
+            try:
+                self.peaks.compute(music_paths, cancel=self._closing,
+                                   on_ready=on_ready if on_peaks_ready else None)
+            except Exception as e:
+                log.error("计算波形失败: %s", e)
+
+        self._start_task(run)
+
+    def _start_task(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                with self._tasks_lock:
+                    self._tasks.discard(thread)
+
+        thread = threading.Thread(target=run, daemon=True)
+        with self._tasks_lock:
+            if self._closing.is_set():
+                return
+            self._tasks.add(thread)
+        thread.start()
+
+    def close(self, timeout=10):
+        """停止播放，等待后台任务结束，最后关闭波形文件和音乐库"""
+        with self._tasks_lock:
+            self._closing.set()
+            tasks = list(self._tasks)
+        # 控制线程退出前会关闭输出流
+        self.controller.shutdown()
+        deadline = time.monotonic() + timeout
+        for thread in tasks:
+            thread.join(max(0, deadline - time.monotonic()))
+            if thread.is_alive():
+                log.warning("后台任务未在 %d 秒内结束", timeout)
+                break
+        self.peaks.close()
+        self.library.close()
@@ -0,0 +1,349 @@
+import os
+import threading
+import logging
+
+import numpy as np
+
+from core.resample import Resampler, remix
+
+log = logging.getLogger(__name__)
+
+
+def should_stream(music_path, threshold_bytes):
+    """超过阈值的大文件使用流式解码，不整体读入内存"""
+    try:
+        return os.path.getsize(music_path) > threshold_bytes
+    except OSError:
+        return False
+
+
+class BufferSource:
+    """从已解码的完整数组中读取音频"""
+
+    def __init__(self, data, samplerate):
+        self.data = data
+        self.samplerate = samplerate
+        self.channels = data.shape[1]
+        self.position = 0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.data)
+
+    def read(self, out):
+        """把下一段音频写入 out，返回写入的帧数"""
+        n = min(len(self.data) - self.position, len(out))
+        np.copyto(out[:n], self.data[self.position:self.position + n])
+        self.position += n
+        return n
+
+    def tap(self):
+        """同一段数据的另一个读取位置 (用于同时输出到多个设备)，不复制数据"""
+        return BufferSource(self.data, self.samplerate)
+
+    def close(self):
+        pass
+
+
+class RingBuffer:
+    """
+    单生产者的环形缓冲区，可以有多个读取者
+
+    读写位置都是只增不减的绝对帧数，生产者只改 _write，每个读取者只改自己的读取位置，
+    因此音频回调中读取时不需要加锁。可写空间按读得最快的读取者计算，
+    落后太多 (数据已被覆盖) 的读取者直接跳到最快的位置，慢的设备不会拖住其他设备。
+    margin 是生产者一次最多写入的帧数。
+    """
+
+    def __init__(self, capacity, channels, margin=0):
+        self.capacity = capacity
+        self.margin = margin
+        self._buf = np.zeros((capacity, channels), dtype='float32')
+        self._reads = [0]
+        self._write = 0
+
+    def add_reader(self):
+        """增加一个从最早的未覆盖数据开始读取的读取者，返回它的编号"""
+        self._reads.append(max(min(self._reads), self._write - self.capacity))
+        return len(self._reads) - 1
+
+    def available(self, reader=0):
+        return self._write - self._reads[reader]
+
+    @property
+    def space(self):
+        return self.capacity - (self._write - max(self._reads))
+
+    def write(self, block):
+        """写入 block，调用方需保证 space >= len(block)"""
+        n = len(block)
+        start = self._write % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = block[:first]
+        self._buf[:n - first] = block[first:]
+        self._write += n
+
+    def read(self, out, reader=0):
+        position = self._reads[reader]
+        if self._write - position > self.capacity - self.margin:
+            # 要读的数据可能正在被覆盖
+            position = max(self._reads)
+        n = min(self._write - position, len(out))
+        start = position % self.capacity
+        first = min(n, self.capacity - start)
+        np.copyto(out[:first], self._buf[start:start + first])
+        np.copyto(out[first:n], self._buf[:n - first])
+        self._reads[reader] = position + n
+        return n
+
+
+class StreamingSource:
+    """
+    流式解码的音频源
+
+    后台线程按块读取文件写入环形缓冲区，回调只从缓冲区读取，
+    内存占用与文件长度无关。指定了目标格式时，重采样也在后台线程中完成。
+    start_s/end_s 指定只播放文件中的一段 (秒)。
+    """
+
+    def __init__(self, music_path, samplerate=None, channels=None,
+                 block_frames=4096, buffer_blocks=16, start_s=0.0, end_s=None):
+        self.music_path = music_path
+        self.block_frames = block_frames
+        import soundfile as sf
+        self._file = sf.SoundFile(music_path)
+        file_rate = self._file.samplerate
+        start = int(start_s * file_rate)
+        if start:
+            self._file.seek(start)
+        # 剩余要读取的文件帧数，None 表示读到文件末尾
+        self._remaining = None if end_s is None else \
+            max(0, int(end_s * file_rate) - start)
+        self.samplerate = samplerate or self._file.samplerate
+        self.channels = channels or self._file.channels
+        self._resampler = Resampler(
+            self._file.samplerate, self.samplerate, self.channels)
+        # 重采样后一块的帧数可能变多 (最后一块还包含滤波器的尾部)，按最大值预留
+        ratio = max(1.0, self.samplerate / self._file.samplerate)
+        self._max_block = int((block_frames + 512) * ratio)
+        self._ring = RingBuffer(self._max_block * buffer_blocks, self.channels,
+                                margin=self._max_block)
+        self._block = np.zeros(
+            (block_frames, self._file.channels), dtype='float32')
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.underruns = 0
+
+    def start(self):
+        # 同步读入第一块，保证第一次回调就有数据可播
+        self._fill_once()
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+
+    @property
+    def finished(self):
+        return self._eof and self._ring.available() == 0
+
+    def read(self, out):
+        n = self._ring.read(out)
+        if n < len(out) and not self._eof:
+            # 解码跟不上：补静音，继续播放
+            self.underruns += 1
+            out[n:].fill(0)
+            return len(out)
+        return n
+
+    def tap(self):
+        """共用解码结果的另一个读取位置 (用于同时输出到多个设备)"""
+        return StreamTap(self)
+
+    def close(self, timeout=1):
+        self._stop.set()
+        if self._thread is None:
+            # 没有读取线程，文件由这里关闭
+            self._file.close()
+        elif self._thread is not threading.current_thread():
+            # 文件由读取线程退出时关闭，等待超时也不会关闭正在读取的文件
+            self._thread.join(timeout)
+        # 其他读取位置读完已解码的部分后结束
+        self._eof = True
+
+    def _fill_once(self):
+        frames = self.block_frames
+        if self._remaining is not None:
+            frames = min(frames, self._remaining)
+        block = self._file.read(
+            frames, dtype='float32', always_2d=True, out=self._block[:frames])
+        if self._remaining is not None:
+            self._remaining -= len(block)
+        final = len(block) < self.block_frames or self._remaining == 0
+        block = self._resampler.process(
+            remix(block, self.channels), final=final)
+        if len(block):
+            self._ring.write(block)
+        if final:
+            self._eof = True
+
+    def _reader(self):
+        # 等待缓冲区有空位的间隔，约为半块音频的时长
+        wait = self.block_frames / self.samplerate / 2
+        try:
+            while not self._eof and not self._stop.is_set():
+                if self._ring.space < self._max_block:
+                    self._stop.wait(wait)
+                    continue
+                self._fill_once()
+        except Exception as e:
+            log.error("流式读取 %s 失败: %s", self.music_path, e)
+            self._eof = True
+        finally:
+            self._file.close()
+
+
+class StreamTap:
+    """
+    StreamingSource 的另一个读取位置
+
+    只读取源的环形缓冲区，文件和解码线程仍由源负责，源关闭后读完剩余的数据即结束。
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._ring = source._ring
+        self._reader = self._ring.add_reader()
+        self.music_path = source.music_path
+        self.samplerate = source.samplerate
+        self.channels = source.channels
+        self.underruns = 0
+
+    @property
+    def finished(self):
+        return self._source._eof and self._ring.available(self._reader) == 0
+
+    def read(self, out):
+        n = self._ring.read(out, self._reader)
+        if n < len(out) and not self._source._eof:
+            self.underruns += 1
+            out[n:].fill(0)
+            return len(out)
+        return n
+
+    def close(self):
+        pass
+
+
+class ChainSource:
+    """
+    依次播放多个音频源 (分组的队列播放)
+
+    当前的源读完时在同一次 read 中接着读下一个源，两首之间没有间隙。
+    下一个源由控制线程预先打开并通过 set_next 追加，音频回调只前进一个下标，
+    不解码也不打开文件。每个源有自己的增益 (响度标准化)。
+    切换到下一个源时在音频线程中调用 on_advance，回调不能阻塞。
+
+    more 为 True 表示后面还有源 (正在准备)，此时即使读完也不结束，输出静音等待；
+    队列播放完毕后控制线程把它设为 False。
+    """
+
+    def __init__(self, source, gain=1.0, key=None, on_advance=None):
+        self.samplerate = source.samplerate
+        self.channels = source.channels
+        self.on_advance = on_advance
+        self.more = False
+        self.index = 0
+        # [(各读取位置的源, 增益, 键)]，只追加；已播放的项由 release 替换为 None
+        self._segments = [([source], gain, key)]
+        self._taps = []
+        self._released = 0
+
+    @property
+    def key(self):
+        """当前正在播放的源的键 (通常是音乐路径)"""
+        return self._segments[self.index][2]
+
+    def set_next(self, source, gain=1.0, key=None):
+        """在控制线程中调用"""
+        sources = [source] + [source.tap() for _ in self._taps]
+        self._segments.append((sources, gain, key))
+
+    @property
+    def finished(self):
+        return self._finished_at(self.index, 0)
+
+    def _finished_at(self, index, reader):
+        return (not self.more and index == len(self._segments) - 1
+                and self._segments[index][0][reader].finished)
+
+    def read(self, out):
+        n, self.index = self._read(out, self.index, 0)
+        return n
+
+    def _read(self, out, index, reader):
+        """从第 index 个源开始读取，返回 (写入的帧数, 新的下标)"""
+        n = 0
+        while True:
+            sources, gain, _ = self._segments[index]
+            source = sources[reader]
+            m = source.read(out[n:])
+            if gain != 1.0:
+                np.multiply(out[n:n + m], gain, out=out[n:n + m])
+            n += m
+            if n >= len(out) or not source.finished:
+                return n, index
+            if index + 1 >= len(self._segments):
+                if self.more:
+                    # 下一个源还没准备好
+                    out[n:].fill(0)
+                    return len(out), index
+                return n, index
+            index += 1
+            if reader == 0 and self.on_advance is not None:
+                self.on_advance()
+
+    def tap(self):
+        """另一个读取位置 (用于同时输出到多个设备)，在开始播放前调用"""
+        reader = len(self._taps) + 1
+        for i in range(self.index, len(self._segments)):
+            self._segments[i][0].append(self._segments[i][0][0].tap())
+        tap = ChainTap(self, reader)
+        self._taps.append(tap)
+        return tap
+
+    def release(self):
+        """关闭所有读取位置都已经播放过的源，在控制线程中调用"""
+        low = min([self.index] + [tap.index for tap in self._taps])
+        for i in range(self._released, low):
+            sources, _, _ = self._segments[i]
+            for source in sources:
+                source.close()
+            self._segments[i] = None
+        self._released = max(self._released, low)
+
+    def close(self):
+        for i in range(self._released, len(self._segments)):
+            for source in self._segments[i][0]:
+                source.close()
+        self._released = len(self._segments)
+
+
+class ChainTap:
+    """ChainSource 的另一个读取位置，源由 ChainSource 负责关闭"""
+
+    def __init__(self, chain, reader):
+        self._chain = chain
+        self._reader = reader
+        self.index = chain.index
+        self.samplerate = chain.samplerate
+        self.channels = chain.channels
+
+    @property
+    def finished(self):
+        return self._chain._finished_at(self.index, self._reader)
+
+    def read(self, out):
+        n, self.index = self._chain._read(out, self.index, self._reader)
+        return n
+
+    def close(self):
+        pass
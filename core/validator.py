@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+OK = "ok"
+MISSING = "missing"
+UNREADABLE = "unreadable"
+
+TrackInfo = namedtuple(
+    "TrackInfo", ["status", "duration", "samplerate", "channels"])
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def validate_paths(music_paths, store=None, workers=16):
+    """
+    并行检查音乐文件，返回 {路径: TrackInfo}
+
+    文件不存在为 MISSING，无法打开或解析为 UNREADABLE。音频信息 (时长、采样率、声道数)
+    按 (mtime, size) 缓存在 store 中，文件未变化时只需要一次 stat。
+    """
+    import soundfile as sf
+    start = time.perf_counter()
+    cached = store.load_track_info() if store is not None else {}
+    updates = []
+
+    def check(music_path):
+        try:
+            st = os.stat(music_path)
+        except FileNotFoundError:
+            return TrackInfo(MISSING, None, None, None)
+        except OSError:
+            return TrackInfo(UNREADABLE, None, None, None)
+        row = cached.get(music_path)
+        if row is not None and row[:2] == (st.st_mtime_ns, st.st_size):
+            return TrackInfo(OK, *row[2:])
+        try:
+            info = sf.info(music_path)
+        except Exception:
+            return TrackInfo(UNREADABLE, None, None, None)
+        updates.append((music_path, st.st_mtime_ns, st.st_size,
+                        info.duration, info.samplerate, info.channels))
+        return TrackInfo(OK, info.duration, info.samplerate, info.channels)
+
+    music_paths = list(dict.fromkeys(music_paths))
+    with ThreadPoolExecutor(workers) as pool:
+        result = dict(zip(music_paths, pool.map(check, music_paths)))
+    if store is not None and updates:
+        store.update_track_info(updates)
+
+    bad = sum(1 for info in result.values() if info.status != OK)
+    log.info("检查 %d 个文件: %d 个无法播放, 读取 %d 个文件信息, 用时 %.2fs",
+             len(result), bad, len(updates), time.perf_counter() - start)
+    return result
@@ -0,0 +1,267 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from core.importer import AUDIO_EXTENSIONS, probe_audio_file
+
+log = logging.getLogger(__name__)
+
+_WATCH = "watch"
+_UNWATCH_GROUP = "unwatch_group"
+_POLL = "poll"
+_STOP = "stop"
+
+
+class _WatchedRoot:
+    def __init__(self, group_name, dirs=None, files=None):
+        self.group_name = group_name
+        self.dirs = dirs or {}     # {目录: mtime_ns}
+        self.files = files or {}   # {目录: {文件: (mtime_ns, size)}}
+        self.pending = {}          # 新出现但还无法读取的文件 (可能仍在复制中)
+
+
+def _stat_key(st):
+    return st.st_mtime_ns, st.st_size
+
+
+class FolderWatcher:
+    """
+    监视导入过的文件夹，把新增、删除和修改的音乐文件通知给界面
+
+    每个目录记录 mtime，每个文件记录 (mtime, size)，索引保存在 LibraryStore 中，
+    重启后也能发现程序关闭期间的变化。每次轮询 stat 已知的目录和文件，
+    只有 mtime 变化的目录才重新列出并与索引比较，不会重新遍历整个目录树；
+    目录未变化时比较文件的 (mtime, size)，发现原地改写的文件。
+
+    所有扫描都在后台线程中进行，on_changes(group_name, added, removed, modified)
+    也在后台线程中调用。监视的目录不存在 (例如移动硬盘未连接) 时不做任何改动。
+    """
+
+    def __init__(self, store, on_changes=None, interval=5.0):
+        self.store = store
+        self.on_changes = on_changes
+        self.interval = interval
+        self._roots = {}  # {root: _WatchedRoot}，只在后台线程中访问
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put((_STOP,))
+
+    def watch(self, root, group_name):
+        """开始监视目录，以当前的内容为基准"""
+        self._queue.put((_WATCH, root, group_name))
+
+    def unwatch_group(self, group_name):
+        self._queue.put((_UNWATCH_GROUP, group_name))
+
+    def poll(self):
+        """立即检查一次"""
+        self._queue.put((_POLL,))
+
+    def _run(self):
+        for root, group_name in self.store.load_watched().items():
+            dirs, files = self.store.load_index(root)
+            self._roots[root] = _WatchedRoot(group_name, dirs, files)
+        log.info("监视 %d 个文件夹", len(self._roots))
+        self._poll_all()
+
+        while True:
+            try:
+                command = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                command = (_POLL,)
+            try:
+                if command[0] == _STOP:
+                    return
+                elif command[0] == _WATCH:
+                    self._watch(*command[1:])
+                elif command[0] == _UNWATCH_GROUP:
+                    for root in [r for r, state in self._roots.items()
+                                 if state.group_name == command[1]]:
+                        del self._roots[root]
+                        self.store.remove_watched(root)
+                else:
+                    self._poll_all()
+            except Exception as e:
+                # 出错不能让监视线程退出
+                log.error("监视文件夹失败: %s", e)
+
+    def _watch(self, root, group_name):
+        start = time.perf_counter()
+        state = _WatchedRoot(group_name)
+        files = []
+        self._scan_tree(state, root, files)
+        self._roots[root] = state
+        self.store.add_watched(root, group_name)
+        self.store.update_index(
+            root, dirs=list(state.dirs.items()),
+            files=[(p, os.path.dirname(p)) + key for p, key in files])
+        log.info("开始监视 %s: %d 个目录, %d 个文件, 用时 %.2fs", root,
+                 len(state.dirs), len(files), time.perf_counter() - start)
+
+    def _poll_all(self):
+        for root, state in list(self._roots.items()):
+            if os.path.isdir(root):
+                self._poll_root(root, state)
+
+    def _poll_root(self, root, state):
+        added, removed, modified = [], [], []
+        changed_dirs, removed_dirs = [], []
+
+        for directory in list(state.dirs):
+            if directory not in state.dirs:
+                continue  # 已随上级目录一起移除
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._drop_tree(state, directory, removed, removed_dirs)
+                continue
+            if mtime_ns != state.dirs[directory]:
+                self._rescan_dir(state, directory, added, removed, modified,
+                                 changed_dirs, removed_dirs)
+            else:
+                self._check_files(state, directory, removed, modified)
+
+        # 上次无法读取的新文件，大小或修改时间变化后重新检查
+        for path, key in list(state.pending.items()):
+            try:
+                current = _stat_key(os.stat(path))
+            except OSError:
+                del state.pending[path]
+                continue
+            if current != key:
+                state.pending[path] = current
+                added.append(path)
+
+        if not (added or removed or modified or changed_dirs or removed_dirs):
+            return
+        accepted = self._accept(state, added)
+        self.store.update_index(
+            root, dirs=[(d, state.dirs[d]) for d in changed_dirs],
+            removed_dirs=removed_dirs,
+            files=[(p, os.path.dirname(p)) + state.files[os.path.dirname(p)][p]
+                   for p in accepted + modified],
+            removed_files=removed)
+        if accepted or removed or modified:
+            log.info("%s: 新增 %d, 删除 %d, 修改 %d 个文件",
+                     root, len(accepted), len(removed), len(modified))
+            if self.on_changes is not None:
+                self.on_changes(state.group_name, accepted, removed, modified)
+
+    def _accept(self, state, added):
+        """新文件能被读取才加入索引，否则留到下次轮询再检查"""
+        accepted = []
+        for path in added:
+            directory = os.path.dirname(path)
+            key = state.files.get(directory, {}).pop(path, None) \
+                or state.pending.get(path)
+            if probe_audio_file(path):
+                state.pending.pop(path, None)
+                state.files.setdefault(directory, {})[path] = key
+                accepted.append(path)
+            elif key is not None:
+                state.pending[path] = key
+        return accepted
+
+    @staticmethod
+    def _check_files(state, directory, removed, modified):
+        """目录未变化时逐个 stat 已知的文件，发现原地改写的文件"""
+        files = state.files.get(directory, {})
+        for path, key in list(files.items()):
+            try:
+                current = _stat_key(os.stat(path))
+            except OSError:
+                del files[path]
+                removed.append(path)
+                continue
+            if current != key:
+                files[path] = current
+                modified.append(path)
+
+    def _rescan_dir(self, state, directory, added, removed, modified,
+                    changed_dirs, removed_dirs):
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            self._drop_tree(state, directory, removed, removed_dirs)
+            return
+        state.dirs[directory] = mtime_ns
+        changed_dirs.append(directory)
+
+        old = state.files.get(directory, {})
+        new = {}
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in state.dirs:
+                        # 新的子目录，完整扫描
+                        files = []
+                        self._scan_tree(state, entry.path, files)
+                        changed_dirs.extend(
+                            d for d in state.dirs
+                            if d == entry.path or d.startswith(entry.path + os.sep))
+                        added.extend(p for p, _ in files)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                    new[entry.path] = _stat_key(entry.stat())
+            except OSError:
+                continue
+
+        for path in list(state.pending):
+            if os.path.dirname(path) == directory and path not in new:
+                del state.pending[path]
+        # 仍在等待的文件由轮询单独检查
+        new = {p: key for p, key in new.items() if p not in state.pending}
+        for path, key in new.items():
+            if path not in old:
+                added.append(path)
+            elif old[path] != key:
+                modified.append(path)
+        for path in old:
+            if path not in new:
+                removed.append(path)
+        # 新文件暂时放在索引中，由 _accept 决定去留
+        state.files[directory] = new
+
+    def _scan_tree(self, state, top, files):
+        """扫描整个子树，记录目录和文件，文件追加到 files: [(路径, (mtime, size))]"""
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError as e:
+                log.warning("无法读取目录 %s: %s", directory, e)
+                continue
+            state.dirs[directory] = mtime_ns
+            dir_files = state.files.setdefault(directory, {})
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                        key = _stat_key(entry.stat())
+                        dir_files[entry.path] = key
+                        files.append((entry.path, key))
+                except OSError:
+                    continue
+
+    @staticmethod
+    def _drop_tree(state, directory, removed, removed_dirs):
+        prefix = directory + os.sep
+        for d in [d for d in state.dirs
+                  if d == directory or d.startswith(prefix)]:
+            del state.dirs[d]
+            removed_dirs.append(d)
+            removed.extend(state.files.pop(d, {}))
+        for path in [p for p in state.pending if p.startswith(prefix)]:
+            del state.pending[path]
@@ -0,0 +1,126 @@
+"""
+无界面模式：不导入 QtWidgets，不监听键盘，通过本地套接字接收命令
+
+    python daemon.py                 # 启动守护进程
+    python daemon.py play <路径>     # 以下为客户端命令
+    python daemon.py stop [<路径>]
+    python daemon.py play_group <分组> [--mode shuffle]
+    python daemon.py list
+    python daemon.py status
+    python daemon.py events          # 持续输出状态事件
+
+与图形界面共用设置和音乐库，同一时间只应运行其中一个。
+"""
+import sys
+import json
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from PyQt5.QtCore import QSettings
+
+from setting import AppSettings
+from core.ipc import IpcClient, IpcServer, default_socket_path
+from core.playlist import MODES, SEQUENTIAL
+from core.service import PlayerService
+
+log = logging.getLogger(__name__)
+
+
+def serve(socket_path, device, warm):
+    settings = QSettings("MusicPlayer", "HotkeyMusicPlayer")
+    config_dir = AppSettings("MusicPlayer").config_dir
+    service = PlayerService(config_dir, settings)
+    service.start()
+    if device is None:
+        device = settings.value("last_device_id", -1, type=int)
+    # -1 表示使用系统默认输出设备
+    service.set_device(None if device < 0 else device)
+
+    groups, hotkeys = service.library.load()
+    music_paths = list(dict.fromkeys(p for files in groups.values() for p in files))
+    hotkey_paths = [p for _, p in hotkeys]
+    # 先预热快捷键对应的文件，请求到来时直接命中缓存
+    if warm == "hotkeys":
+        service.warm(hotkey_paths)
+    elif warm == "all":
+        service.warm(hotkey_paths + music_paths)
+    service.analyze(music_paths)
+
+    server = IpcServer(service, socket_path or default_socket_path(config_dir))
+    if not server.start():
+        service.close()
+        return 1
+    log.info("已加载 %d 个分组, %d 个文件", len(groups), len(music_paths))
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    while not stopped.wait(1):
+        pass
+    server.stop()
+    service.close()
+    return 0
+
+
+def run_client(socket_path, command, path, mode=SEQUENTIAL):
+    if socket_path is None:
+        socket_path = default_socket_path(AppSettings("MusicPlayer").config_dir)
+    try:
+        client = IpcClient(socket_path)
+    except OSError as e:
+        print(f"无法连接 {socket_path}: {e}", file=sys.stderr)
+        return 1
+    with client:
+        if command == "events":
+            try:
+                for event in client.events():
+                    print(json.dumps(event, ensure_ascii=False), flush=True)
+            except KeyboardInterrupt:
+                pass
+            return 0
+        if command == "play_group":
+            kwargs = {"group": path, "mode": mode}
+        else:
+            kwargs = {"path": path} if path else {}
+        response = client.request(command, **kwargs)
+    if response is None:
+        print("连接已断开", file=sys.stderr)
+        return 1
+    if not response.pop("ok", False):
+        print(response.get("error"), file=sys.stderr)
+        return 1
+    if response:
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicPlayer 无界面模式")
+    parser.add_argument("command", nargs="?", default="serve",
+                        choices=["serve", "play", "toggle", "stop", "play_group",
+                                 "list", "status", "events"])
+    parser.add_argument("path", nargs="?", help="音乐文件路径 (play_group 时为分组名)")
+    parser.add_argument("--socket", help="套接字路径，默认在 XDG_RUNTIME_DIR 或配置目录下")
+    parser.add_argument("--device", type=int, help="输出设备编号，默认使用上次选择的设备")
+    parser.add_argument("--warm", choices=["none", "hotkeys", "all"],
+                        default="all", help="启动时预先解码哪些文件 (默认全部，受缓存大小限制)")
+    parser.add_argument("--mode", choices=MODES, default=SEQUENTIAL,
+                        help="play_group 的播放模式")
+    args = parser.parse_args()
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO)
+        return serve(args.socket, args.device, args.warm)
+    if args.command in ("play", "toggle") and not args.path:
+        parser.error(f"{args.command} 需要音乐文件路径")
+    if args.command == "play_group" and not args.path:
+        parser.error("play_group 需要分组名")
+    return run_client(args.socket, args.command, args.path, args.mode)
+
+
+if __name__ == "__main__":
+    # 打包后的程序中分析用的进程池需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,48 +1,106 @@
 import sys
 import os
-import sounddevice as sd
-import soundfile as sf
+import utils
+# 尽早开始计时，--startup-profile 时输出各启动阶段的耗时
+startup_profiler = utils.StartupProfiler("--startup-profile" in sys.argv)
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton,
                              QVBoxLayout, QWidget, QLabel, QComboBox,
                              QFileDialog, QMessageBox,
                              QInputDialog,
                              QHBoxLayout, QAction, QSplitter,
-                             QSizePolicy, QMenu, QSystemTrayIcon, QDialog)
-from PyQt5.QtCore import Qt, QSettings
+                             QSizePolicy, QMenu, QSystemTrayIcon, QDialog,
+                             QProgressDialog)
+from PyQt5.QtCore import Qt, QSettings, QTimer, pyqtSignal
 import sys
 from PyQt5.QtGui import QIcon
-from pynput import keyboard
 import threading
 import logging
-import utils
+import multiprocessing
+from setting import AppSettings
 from components.group import MusicGroupWidget
 from components.list import MusicListWidget
+from components.diagnostics import DiagnosticsDialog
+from components.outputs import OutputDevicesDialog
+from components.search import SearchWidget
+from core.hotkeys import HotkeyIndex, HotkeyMatcher
+from core.importer import FolderImporter
+from core.search import SearchIndex
+from core.library import migrate_qsettings
+from core.ipc import IpcServer, default_socket_path
+from core.service import PlayerService
+from core.watcher import FolderWatcher
+from core.validator import OK, MISSING, validate_paths
+from core.stream import should_stream
 
 log = logging.getLogger(__name__)
 
 
 class MusicPlayerApp(QMainWindow):
-    def __init__(self):
+    # 由音频控制线程发出，经 Qt 排队连接在界面线程中处理
+    playbackStateChanged = pyqtSignal(bool, object)  # playing, music_path
+    playbackError = pyqtSignal(str, str)  # music_path, message
+    # 由后台导入线程发出
+    importBatch = pyqtSignal(str, list)  # group_name, music_paths
+    importProgress = pyqtSignal(int, int)  # scanned, accepted
+    importFinished = pyqtSignal(str, int, int, bool)  # group_name, accepted, rejected, cancelled
+    cacheRebuilt = pyqtSignal(int, int)  # written, failed
+    # 由设备枚举线程发出
+    devicesLoaded = pyqtSignal(list, int)  # [(device_id, name)], default_output
+    # 由文件夹监视线程发出
+    folderChanged = pyqtSignal(str, list, list, list)  # group_name, added, removed, modified
+    # 由文件检查线程发出
+    libraryValidated = pyqtSignal(dict, bool)  # {music_path: TrackInfo}, startup
+    # 由音频分析线程发出
+    peaksReady = pyqtSignal(list)  # music_paths
+    # 由音乐库加载线程发出
+    libraryLoaded = pyqtSignal(dict, list, object)  # groups, hotkeys, SearchIndex
+
+    def __init__(self, audio_backend=None, keyboard_backend=None):
+        """
+        :param audio_backend: 音频输出后端，默认 sounddevice
+        :param keyboard_backend: 全局键盘后端，默认 pynput
+        """
         super().__init__()
 
         # 初始化设置
         self.settings = QSettings("MusicPlayer", "HotkeyMusicPlayer")
+        # -1 表示使用系统默认输出设备
         self.last_device_id = self.settings.value(
-            "last_device_id", sd.default.device[0], type=int)
-        self.stream = None
-        self.current_frame = 0
-        self.data = None
-        self.samplerate = None
+            "last_device_id", -1, type=int)
         self.current_playing = None  # 当前正在播放的音乐路径
         self.current_group = None    # 当前选中的分组
+        self.importer = None         # 正在进行的文件夹导入
+        self.app_settings = AppSettings("MusicPlayer")
+        # 播放核心在窗口显示后由 init_service 创建
+        self.audio_backend = audio_backend
+        self.service = None
+        self.folder_watcher = None
+        self.ipc_server = None
+        self.peaksReady.connect(self.on_peaks_ready)
+        self.playbackStateChanged.connect(self.on_playback_state_changed)
+        self.playbackError.connect(self.on_playback_error)
+        self.audio_devices = []  # [(device_id, name)]，后台枚举完成后填充
+        self.importBatch.connect(self.on_import_batch)
+        self.importProgress.connect(self.on_import_progress)
+        self.importFinished.connect(self.on_import_finished)
+        self.cacheRebuilt.connect(self.on_cache_rebuilt)
+        self.devicesLoaded.connect(self.on_devices_loaded)
+        self.folderChanged.connect(self.on_folder_changed)
+        self.libraryValidated.connect(self.on_library_validated)
+        self.libraryLoaded.connect(self.on_library_loaded)
+        self.library_loaded = False
+
+        # 快捷键与音乐的双向索引，主窗口和音乐列表共用
+        self.hotkey_index = HotkeyIndex()
+        # 文件状态和音频信息 {music_path: TrackInfo}，由后台检查填充
+        self.track_info = {}
+        # 所有分组的搜索索引，音乐库变化时增量更新
+        self.search_index = SearchIndex()
 
         # 初始化UI
         self.init_ui()
-        # 初始化快捷键字典
-        self.shortcuts = {}
-        self.hotkey_listener = None
-        # 加载上次的设置
-        self.load_settings()
+        # 常驻的全局快捷键监听，增删快捷键不会重启监听线程
+        self.hotkey_matcher = HotkeyMatcher(keyboard_backend)
 
         # 创建系统托盘图标
         self.tray_icon = QSystemTrayIcon(self)
@@ -66,6 +124,40 @@ class MusicPlayerApp(QMainWindow):
         # 显示托盘图标
         self.tray_icon.show()
 
+    def start_deferred_init(self):
+        """窗口和托盘显示后，再创建播放核心、枚举设备、加载音乐库和预热快捷键"""
+        self.init_service()
+        self.refresh_audio_devices()
+        QTimer.singleShot(0, self.load_settings)
+
+    def init_service(self):
+        """创建播放核心 (音乐库、缓存、分析、音频引擎)，与无界面的守护进程共用"""
+        if self.service is not None:
+            return
+        self.service = PlayerService(
+            self.app_settings.config_dir, self.settings, self.audio_backend)
+        self.library = self.service.library
+        self.disk_cache = self.service.disk_cache
+        self.audio_cache = self.service.audio_cache
+        self.stream_threshold = self.service.stream_threshold
+        self.peaks = self.service.peaks
+        self.engine = self.service.engine
+        self.analyzer = self.service.analyzer
+        self.controller = self.service.controller
+        self.music_list_widget.set_analysis(
+            self.analyzer.trim_silence, self.peaks)
+        # 导入过的文件夹在后台轮询，只把变化的文件同步到分组
+        self.folder_watcher = FolderWatcher(
+            self.library, on_changes=self.folderChanged.emit,
+            interval=self.settings.value("watch_interval_s", 5, type=int))
+        # 事件在控制线程中产生，经 Qt 排队连接转到界面线程
+        self.service.add_listener(self.on_service_event)
+        self.service.start()
+        # 其他程序 (脚本、控制台) 通过本地套接字触发播放，默认关闭
+        if self.settings.value("ipc_enabled", False, type=bool):
+            self.start_ipc()
+        startup_profiler.mark("创建播放核心")
+
     def init_ui(self):
         self.setWindowTitle("音乐播放器")
         # 屏幕居中放置
@@ -81,14 +173,21 @@ class MusicPlayerApp(QMainWindow):
         self.setCentralWidget(central_widget)
         # 使用QSplitter分割左右布局
         splitter = QSplitter(Qt.Horizontal)
+        # 顶部搜索框，在所有分组中查找
+        self.search_widget = SearchWidget(self.search_index)
+        self.search_widget.resultActivated.connect(self.on_search_result)
         # 左侧分组列表
         self.group_widget = MusicGroupWidget()
         self.group_widget.groupSelected.connect(self.on_group_selected)
         self.group_widget.groupDeleted.connect(self.on_group_deleted)
         self.group_widget.requestMoveMusic.connect(
             self.on_move_music_requested)
+        self.group_widget.playGroupRequested.connect(self.play_group)
         # 右侧音乐列表
-        self.music_list_widget = MusicListWidget()
+        # 裁剪静音设置和波形缓存在播放核心创建后由 set_analysis 设置
+        self.music_list_widget = MusicListWidget(
+            self.hotkey_index, self.track_info)
+        self.music_list_widget.trimSilenceRequested.connect(self.set_trim_silence)
         self.music_list_widget.shortcutRequested.connect(self.set_music_hotkey)
         self.music_list_widget.deleteRequested.connect(
             self.on_delete_music_requested)
@@ -113,7 +212,8 @@ class MusicPlayerApp(QMainWindow):
 
         # 播放设备选择
         self.device_combo = QComboBox()
-        self.refresh_audio_devices()
+        self.device_combo.addItem("正在加载设备...")
+        self.device_combo.currentIndexChanged.connect(self.on_device_changed)
 
         # 播放/停止按钮
         self.play_btn = QPushButton("播放")
@@ -125,10 +225,24 @@ class MusicPlayerApp(QMainWindow):
 
         # 主布局
         main_layout = QVBoxLayout()
+        main_layout.addWidget(self.search_widget)
         main_layout.addWidget(splitter)
         main_layout.addWidget(control_panel)
         central_widget.setLayout(main_layout)
 
+        # 状态栏显示音频回调的 xrun (欠载/过载) 次数
+        self.xrun_label = QLabel()
+        self.statusBar().addPermanentWidget(self.xrun_label)
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.update_status)
+        self.status_timer.start(1000)
+        self.update_status()
+
+    def update_status(self):
+        if self.service is None:
+            return
+        self.xrun_label.setText(f"xrun: {self.engine.xruns}")
+
     def create_menu_bar(self):
         menubar = self.menuBar()
         # 文件菜单
@@ -139,6 +253,154 @@ class MusicPlayerApp(QMainWindow):
         import_music_dir_action.triggered.connect(self.import_music_dir)
         file_menu.addAction(import_music_action)
         file_menu.addAction(import_music_dir_action)
+        # 音乐库加载完成前不能导入，否则加载结果会覆盖导入的音乐
+        self.import_actions = [import_music_action, import_music_dir_action]
+        for action in self.import_actions:
+            action.setEnabled(False)
+        file_menu.addSeparator()
+        search_action = QAction("搜索", self)
+        search_action.setShortcut("Ctrl+F")
+        search_action.triggered.connect(lambda: self.search_widget.focus_search())
+        file_menu.addAction(search_action)
+        # 设置菜单
+        settings_menu = menubar.addMenu("设置")
+        cache_size_action = QAction("缓存大小", self)
+        cache_size_action.triggered.connect(self.set_cache_size)
+        settings_menu.addAction(cache_size_action)
+        rebuild_cache_action = QAction("重建缓存", self)
+        rebuild_cache_action.triggered.connect(self.rebuild_cache)
+        settings_menu.addAction(rebuild_cache_action)
+        low_latency_action = QAction("低延迟模式", self)
+        low_latency_action.setCheckable(True)
+        low_latency_action.setChecked(
+            self.settings.value("latency_profile", "normal", type=str) == "low")
+        low_latency_action.toggled.connect(self.set_low_latency)
+        settings_menu.addAction(low_latency_action)
+        loudness_action = QAction("音量标准化", self)
+        loudness_action.setCheckable(True)
+        loudness_action.setChecked(self.settings.value(
+            "loudness_normalization", True, type=bool))
+        loudness_action.toggled.connect(self.set_loudness_normalization)
+        settings_menu.addAction(loudness_action)
+        ipc_action = QAction("本地控制接口", self)
+        ipc_action.setCheckable(True)
+        ipc_action.setChecked(
+            self.settings.value("ipc_enabled", False, type=bool))
+        ipc_action.toggled.connect(self.set_ipc_enabled)
+        settings_menu.addAction(ipc_action)
+        outputs_action = QAction("多设备输出...", self)
+        outputs_action.triggered.connect(self.set_output_devices)
+        settings_menu.addAction(outputs_action)
+        # 工具菜单
+        tools_menu = menubar.addMenu("工具")
+        diagnostics_action = QAction("延迟诊断", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        tools_menu.addAction(diagnostics_action)
+
+    def start_ipc(self):
+        if self.ipc_server is not None:
+            return
+        self.ipc_server = IpcServer(self.service, default_socket_path(
+            self.app_settings.config_dir))
+        if not self.ipc_server.start():
+            self.ipc_server = None
+            self.statusBar().showMessage("本地控制接口启动失败", 5000)
+
+    def set_ipc_enabled(self, enabled):
+        self.settings.setValue("ipc_enabled", enabled)
+        if self.service is None:
+            return
+        if enabled:
+            self.start_ipc()
+        elif self.ipc_server is not None:
+            self.ipc_server.stop()
+            self.ipc_server = None
+
+    def show_diagnostics(self):
+        if self.service is None:
+            return
+        dialog = DiagnosticsDialog(self.controller, self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def on_service_event(self, event):
+        if event["event"] == "state":
+            self.playbackStateChanged.emit(event["playing"], event["path"])
+        elif event["event"] == "error":
+            self.playbackError.emit(event["path"], event["message"])
+
+    def set_output_devices(self):
+        if not self.audio_devices:
+            QMessageBox.information(self, "多设备输出", "音频设备尚未加载完成")
+            return
+        primary_gain_db, extra = self.service.output_settings()
+        dialog = OutputDevicesDialog(
+            self.audio_devices, self.device_combo.currentData(),
+            primary_gain_db, extra, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        primary_gain_db, extra = dialog.result_outputs()
+        self.service.set_outputs(primary_gain_db, extra)
+        if extra:
+            self.statusBar().showMessage(
+                f"同时输出到 {len(extra) + 1} 个设备", 5000)
+
+    def rebuild_cache(self):
+        if self.service is None:
+            return
+        # 流式播放的大文件不进入缓存
+        # 内容相同的文件只缓存一份
+        content = self.service.content
+        music_paths = {content.canonical(p)
+                       for files in self.group_widget.groups.values()
+                       for p in files
+                       if not should_stream(p, self.stream_threshold)}
+        self.statusBar().showMessage(f"正在缓存 {len(music_paths)} 个文件...")
+
+        self.controller.fill_disk_cache(
+            sorted(music_paths), on_done=self.cacheRebuilt.emit)
+
+    def on_cache_rebuilt(self, written, failed):
+        message = f"缓存重建完成: 新增 {written} 个文件"
+        if failed:
+            message += f"，{failed} 个文件解码失败"
+        self.statusBar().showMessage(message, 10000)
+
+    def set_low_latency(self, enabled):
+        profile = "low" if enabled else "normal"
+        self.settings.setValue("latency_profile", profile)
+        # 播放核心尚未创建时，创建时会读取保存的设置
+        if self.service is None:
+            return
+        self.controller.set_profile(profile)
+
+    def set_loudness_normalization(self, enabled):
+        self.settings.setValue("loudness_normalization", enabled)
+        if self.service is None:
+            return
+        self.analyzer.enabled = enabled
+
+    def set_trim_silence(self, music_path, enabled):
+        self.analyzer.set_trim_silence(music_path, enabled)
+        self.music_list_widget.refresh_music(music_path)
+        if enabled and self.analyzer.offsets(music_path) is None:
+            # 尚未分析 (例如刚导入)，分析完成前按原样播放
+            self.analyze_audio([music_path])
+
+    def analyze_audio(self, music_paths):
+        self.service.analyze(music_paths, on_peaks_ready=self.peaksReady.emit)
+
+    def on_peaks_ready(self, music_paths):
+        self.music_list_widget.refresh_music(*music_paths)
+
+    def set_cache_size(self):
+        current = self.settings.value("cache_size_mb", 512, type=int)
+        size_mb, ok = QInputDialog.getInt(
+            self, "缓存大小", "已解码音频缓存上限 (MB):", current, 16, 65536)
+        if ok:
+            self.settings.setValue("cache_size_mb", size_mb)
+            if self.service is not None:
+                self.audio_cache.set_max_bytes(size_mb * 1024 * 1024)
 
     def import_music(self):
         options = QFileDialog.Options()
@@ -151,71 +413,181 @@ class MusicPlayerApp(QMainWindow):
         if files:
             if not self.current_group:
                 self.group_widget.add_group("默认分组")
-                self.current_group = "默认分组"
+                self.library.add_group("默认分组")
+                self.group_widget.select_group("默认分组")
+                self.on_group_selected("默认分组")
             self.group_widget.groups[self.current_group].extend(files)
-            self.music_list_widget.set_music_files(
-                self.group_widget.groups[self.current_group])
-            # 同步更新设置配置
-            self.group_widget.save_groups(self.settings)
+            self.library.add_tracks(self.current_group, files)
+            self.search_index.add(self.current_group, files)
+            self.search_widget.update_results()
+            self.music_list_widget.add_music(files)
+            self.validate_library(files)
 
     def import_music_dir(self):
+        if self.importer is not None:
+            QMessageBox.information(self, "提示", "正在导入其他文件夹，请稍候")
+            return
         # 导入文件夹
         dir_path = QFileDialog.getExistingDirectory(self, "选择音乐文件夹")
-        if dir_path:
-            group_name = os.path.basename(dir_path)
-            music_files = []
-
-            # 扫描文件夹中的音乐文件
-            for root, _, files in os.walk(dir_path):
-                for file in files:
-                    if file.lower().endswith(('.mp3', '.wav', '.flac', '.ogg', '.aiff')):
-                        music_files.append(os.path.join(root, file))
-
-            if music_files:
-                self.group_widget.add_group(group_name, music_files)
-                self.on_group_selected(group_name)
-        # 同步更新设置配置
-        self.group_widget.save_groups(self.settings)
+        if not dir_path:
+            return
+        group_name = os.path.basename(dir_path)
+
+        # 在后台扫描并探测文件，结果分批加入分组
+        self.import_progress = QProgressDialog(
+            "正在扫描文件夹...", "取消", 0, 0, self)
+        self.import_progress.setWindowTitle("导入文件夹")
+        self.import_progress.setMinimumDuration(500)
+        self.importer = FolderImporter(
+            dir_path,
+            on_batch=lambda batch: self.importBatch.emit(group_name, batch),
+            on_progress=self.importProgress.emit,
+            content=self.service.content,
+            on_finished=lambda accepted, rejected, cancelled:
+                self.importFinished.emit(
+                    group_name, accepted, rejected, cancelled))
+        self.import_progress.canceled.connect(self.importer.cancel)
+        self.importer.start()
+
+    def on_import_batch(self, group_name, music_files):
+        if group_name not in self.group_widget.groups:
+            self.group_widget.add_group(group_name)
+            self.library.add_group(group_name)
+        self.group_widget.groups[group_name].extend(music_files)
+        self.library.add_tracks(group_name, music_files)
+        self.search_index.add(group_name, music_files)
+        self.search_widget.update_results()
+        if self.current_group == group_name:
+            self.music_list_widget.add_music(music_files)
+        elif len(self.group_widget.groups[group_name]) == len(music_files):
+            # 第一批结果到达时切换到新分组
+            self.group_widget.select_group(group_name)
+            self.on_group_selected(group_name)
+
+    def on_import_progress(self, scanned, accepted):
+        self.import_progress.setLabelText(
+            f"已扫描 {scanned} 个文件，已导入 {accepted} 个")
+
+    def on_import_finished(self, group_name, accepted, rejected, cancelled):
+        if not cancelled:
+            # 之后文件夹中的变化自动同步到分组
+            self.folder_watcher.watch(self.importer.root, group_name)
+        duplicates = len(self.importer.duplicates)
+        self.importer = None
+        self.validate_library(
+            [p for p in self.group_widget.get_music_files(group_name)
+             if p not in self.track_info])
+        self.import_progress.reset()
+        message = f"{group_name}: 导入 {accepted} 个文件"
+        if rejected:
+            message += f"，跳过 {rejected} 个无法读取的文件"
+        if duplicates:
+            # 内容相同的文件共用缓存，不会重复占用内存和磁盘
+            message += f"，其中 {duplicates} 个与已有文件内容相同"
+        if cancelled:
+            message += " (已取消)"
+        self.statusBar().showMessage(message, 10000)
+
+    def on_folder_changed(self, group_name, added, removed, modified):
+        music_files = self.group_widget.groups.get(group_name)
+        if music_files is None:
+            return
+        shown = self.current_group == group_name
+        existing = set(music_files)
+        added = [p for p in added if p not in existing]
+        if added:
+            music_files.extend(added)
+            self.library.add_tracks(group_name, added)
+            self.search_index.add(group_name, added)
+            if shown:
+                self.music_list_widget.add_music(added)
+
+        gone = set(removed)
+        if gone:
+            for music_path in music_files:
+                if music_path in gone:
+                    self.library.remove_track(group_name, music_path)
+                    self.search_index.remove(group_name, music_path)
+                    if shown:
+                        self.music_list_widget.remove_music(music_path)
+            music_files[:] = [p for p in music_files if p not in gone]
+            # 文件已被删除，同时移除它的快捷键
+            for music_path in gone:
+                hotkey = self.hotkey_index.hotkey_for(music_path)
+                if hotkey:
+                    self.unbind_hotkey(hotkey)
+                    self.library.remove_hotkey(hotkey)
+
+        # 删除或修改过的文件，丢弃已解码的缓存
+        changed = removed + modified
+        content = self.service.content
+        # 波形缓存以规范路径为键，要在 discard 改变规范路径之前记下
+        stale_peaks = set(changed) | {content.canonical(p) for p in changed}
+        # 内容相同的其他文件改用新的规范路径，需要重新计算波形
+        copies = {q for p in changed for q in content.paths_for(p)} - set(changed)
+        for music_path in changed:
+            self.audio_cache.invalidate(music_path)
+            self.track_info.pop(music_path, None)
+            content.discard(music_path)
+        for music_path in stale_peaks:
+            self.peaks.invalidate(music_path)
+        if copies:
+            self.analyze_audio(sorted(copies))
+        self.validate_library(added + modified)
+        hotkey_paths = [p for p in modified if self.hotkey_index.hotkey_for(p)]
+        if hotkey_paths:
+            self.warm_hotkey_cache(hotkey_paths)
+
+        if added or gone:
+            self.search_widget.update_results()
+            self.statusBar().showMessage(
+                f"{group_name}: 新增 {len(added)} 个文件，移除 {len(gone)} 个文件", 10000)
 
     def on_group_selected(self, group_name):
         self.current_group = group_name
         music_files = self.group_widget.get_music_files(group_name)
         self.music_list_widget.set_music_files(music_files)
 
-    def on_group_deleted(self, group_name):
+    def on_search_result(self, group_name, music_path):
+        """切换到结果所在的分组并选中这首音乐"""
+        if group_name not in self.group_widget.groups:
+            return
+        if self.current_group != group_name:
+            self.group_widget.select_group(group_name)
+            self.on_group_selected(group_name)
+        self.music_list_widget.select_music(music_path)
+
+    def on_group_deleted(self, group_name, music_files):
         if self.current_group == group_name:
             self.current_group = None
             self.music_list_widget.set_music_files([])
 
         # 删除分组下的音乐快捷键
-        if group_name in self.group_widget.groups:
-            for music_path in self.group_widget.groups[group_name]:
-                hotkey = self.music_list_widget.get_hotkey_for_music(
-                    music_path)
-                if hotkey and hotkey in self.shortcuts:
-                    self.shortcuts[hotkey][1].deleteLater()
-                    del self.shortcuts[hotkey]
-
-        # 同步更新设置配置
-        self.group_widget.save_groups(self.settings)
-        self.music_list_widget.save_hotkeys(self.settings)
+        for music_path in music_files:
+            hotkey = self.hotkey_index.hotkey_for(music_path)
+            if hotkey:
+                self.unbind_hotkey(hotkey)
+                self.library.remove_hotkey(hotkey)
+        self.library.remove_group(group_name)
+        self.search_index.remove_group(group_name)
+        self.search_widget.update_results()
+        self.folder_watcher.unwatch_group(group_name)
 
     def on_delete_music_requested(self, music_path):
         if self.current_group:
             if music_path in self.group_widget.groups[self.current_group]:
                 self.group_widget.groups[self.current_group].remove(music_path)
-                self.music_list_widget.set_music_files(
-                    self.group_widget.groups[self.current_group])
+                self.library.remove_track(self.current_group, music_path)
+                if music_path not in self.group_widget.groups[self.current_group]:
+                    self.search_index.remove(self.current_group, music_path)
+                    self.search_widget.update_results()
+                self.music_list_widget.remove_music(music_path)
 
                 # 如果这个音乐有快捷键，移除它
-                hotkey = self.music_list_widget.get_hotkey_for_music(
-                    music_path)
-                if hotkey and hotkey in self.shortcuts:
-                    del self.shortcuts[hotkey]
-
-        self.start_global_hotkey_listener()
-        # 同步更新设置配置
-        self.group_widget.save_groups(self.settings)
+                hotkey = self.hotkey_index.hotkey_for(music_path)
+                if hotkey:
+                    self.unbind_hotkey(hotkey)
+                    self.library.remove_hotkey(hotkey)
 
     def on_move_music_requested(self, music_path):
         if not self.current_group:
@@ -239,13 +611,19 @@ class MusicPlayerApp(QMainWindow):
         if ok and group_name:
             # 从当前分组移除
             self.group_widget.groups[self.current_group].remove(music_path)
-            # 添加到目标分组
-            self.group_widget.groups[group_name].append(music_path)
+            target_files = self.group_widget.groups[group_name]
+            if music_path in target_files:
+                # 目标分组已有这首音乐，只从当前分组删除
+                self.library.remove_track(self.current_group, music_path)
+            else:
+                # 添加到目标分组
+                target_files.append(music_path)
+                self.library.move_track(
+                    music_path, self.current_group, group_name)
+            self.search_index.move(music_path, self.current_group, group_name)
+            self.search_widget.update_results()
             # 更新当前列表
-            self.music_list_widget.set_music_files(
-                self.group_widget.groups[self.current_group])
-        # 同步更新设置配置
-        self.group_widget.save_groups(self.settings)
+            self.music_list_widget.remove_music(music_path)
 
     def record_hotkey_dialog(self, music_path, current_hotkey):
         dialog = QDialog(self)
@@ -266,54 +644,57 @@ class MusicPlayerApp(QMainWindow):
         dialog.setLayout(layout)
         dialog.setModal(True)
 
+        # 按 pynput 的按键名匹配，键盘后端只需提供 name/char 属性
+        special_keys = {
+            'ctrl_l': 'Ctrl',
+            'ctrl_r': 'Ctrl',
+            'shift_l': 'Shift',
+            'shift_r': 'Shift',
+            'alt_l': 'Alt',
+            'alt_r': 'Alt',
+            'cmd_l': 'Cmd',
+            'cmd_r': 'Cmd',
+            'enter': 'Enter',
+            'esc': 'Esc',
+        }
+
         def on_press(key):
-            try:
-                char_key = key.char.lower()
+            name = getattr(key, 'name', None)
+            char = getattr(key, 'char', None)
+            if not name and char:
+                char_key = char.lower()
                 if char_key not in self.formatted_keys:
                     self.keys_pressed.append(char_key)
                     self.formatted_keys.append(char_key)
                     label.setText(
                         f"已记录: {'+'.join(self.formatted_keys)}\n点击 确定 或按 Enter 完成")
-            except AttributeError:
+            elif name:
                 # 处理特殊按键
-                special_keys = {
-                    keyboard.Key.ctrl_l: 'Ctrl',
-                    keyboard.Key.ctrl_r: 'Ctrl',
-                    keyboard.Key.shift_l: 'Shift',
-                    keyboard.Key.shift_r: 'Shift',
-                    keyboard.Key.alt_l: 'Alt',
-                    keyboard.Key.alt_r: 'Alt',
-                    keyboard.Key.cmd_l: 'Cmd',
-                    keyboard.Key.cmd_r: 'Cmd',
-                    keyboard.Key.enter: 'Enter',
-                    keyboard.Key.esc: 'Esc',
-                }
-
-                if key in special_keys:
-                    k = special_keys[key]
+                if name in special_keys:
+                    k = special_keys[name]
                     if k not in self.formatted_keys:
                         self.formatted_keys.append(k)
                         label.setText(
                             f"已记录: {'+'.join(self.formatted_keys)}\n点击 确定 或按 Enter 完成")
-                elif hasattr(key, 'name'):
+                else:
                     # F1-F12 等功能键
-                    k = key.name.capitalize()
+                    k = name.capitalize()
                     if k not in self.formatted_keys:
                         self.formatted_keys.append(k)
                         label.setText(
                             f"已记录: {'+'.join(self.formatted_keys)}\n点击 确定 或按 Enter 完成")
 
         def on_release(key):
-            if key == keyboard.Key.enter:
+            name = getattr(key, 'name', None)
+            if name == 'enter':
                 dialog.accept()
                 return False
-            elif key == keyboard.Key.esc:
+            elif name == 'esc':
                 dialog.reject()
                 return False
 
-        listener = keyboard.Listener(
-            on_press=on_press, on_release=on_release, daemon=True)
-        listener.start()
+        listener = self.hotkey_matcher.get_backend().listen(
+            on_press, on_release)
 
         result = dialog.exec_()
         listener.stop()
@@ -348,173 +729,224 @@ class MusicPlayerApp(QMainWindow):
 
         if ok:
             # 检查快捷键是否已被占用
-            if hotkey and hotkey in self.shortcuts and self.shortcuts[hotkey] != music_path:
+            other = self.hotkey_index.conflict(hotkey, music_path)
+            if hotkey and other:
                 QMessageBox.warning(
-                    self, "警告", f"快捷键 {hotkey} 已被 {os.path.basename(self.shortcuts[hotkey][0])} 占用!")
+                    self, "警告", f"快捷键 {hotkey} 已被 {os.path.basename(other)} 占用!")
                 return
 
-            # 移除旧的快捷键
-            if current_hotkey in self.shortcuts:
-                del self.shortcuts[current_hotkey]
-
-            # 设置新的快捷键
             if hotkey:
-                self.shortcuts[hotkey] = music_path
-                # 保存到列表显示
-                self.music_list_widget.set_hotkey(music_path, hotkey)
-                self.start_global_hotkey_listener()
-            else:
+                # 设置新的快捷键 (同时替换旧的快捷键)
+                self.bind_hotkey(hotkey, music_path)
+                self.library.set_hotkey(hotkey, music_path)
+                self.warm_hotkey_cache([music_path])
+            elif current_hotkey:
                 # 清除快捷键
-                self.music_list_widget.set_hotkey(music_path, "")
-            
-            # 重新启动全局快捷键监听器
-            self.start_global_hotkey_listener()
-
-            # 同步更新设置配置
-            self.group_widget.save_groups(self.settings)
+                self.unbind_hotkey(current_hotkey)
+                self.library.remove_hotkey(current_hotkey)
 
     def toggle_play_music(self, music_path):
-        if self.current_playing == music_path and self.stream is not None:
-            self.stop_music()
-        else:
-            self.play_music(music_path)
+        self.controller.toggle(music_path)
 
     def play_selected_music(self):
-        selected_items = self.music_list_widget.music_list.selectedItems()
-        if not selected_items:
+        music_path = self.music_list_widget.selected_music()
+        if not music_path:
             QMessageBox.warning(self, "警告", "请先选择要播放的音乐!")
             return
 
-        item = selected_items[0]
-        index = self.music_list_widget.music_list.row(item)
-        music_path = self.music_list_widget.music_files[index]
         self.play_music(music_path)
 
     def play_music(self, music_path):
-        try:
-            # 如果已经在播放其他音乐，先停止
-            if self.stream is not None:
-                self.stop_music()
-
-            # 获取选择的设备
-            device_id = self.device_combo.currentData()
-            self.last_device_id = device_id
-            self.settings.setValue("last_device_id", device_id)
-
-            # 读取音频文件
-            self.data, self.samplerate = sf.read(music_path, dtype='float32')
-            self.current_frame = 0
-            self.current_playing = music_path
-
-            # 确保数据是二维的 (frames, channels)
-            if len(self.data.shape) == 1:
-                self.data = self.data.reshape(-1, 1)
-
-            # 定义回调函数
-            def callback(outdata, frames, time, status):
-                if status:
-                    print(status)
-
-                chunksize = min(len(self.data) - self.current_frame, frames)
-                outdata[:chunksize] = self.data[self.current_frame:self.current_frame + chunksize]
-
-                if chunksize < frames:
-                    outdata[chunksize:] = 0
-                    raise sd.CallbackStop
-
-                self.current_frame += chunksize
-
-            # 开始播放
-            self.stream = sd.OutputStream(
-                device=device_id,
-                samplerate=self.samplerate,
-                channels=self.data.shape[1],
-                callback=callback,
-                finished_callback=self.playback_finished
-            )
-
-            self.stream.start()
-
-            # 更新按钮状态
-            self.play_btn.setText("停止")
-            self.play_btn.clicked.disconnect()
-            self.play_btn.clicked.connect(self.stop_music)
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"播放音乐时出错:\n{str(e)}")
-            self.current_playing = None
-
-    def playback_finished(self):
-        # 播放完成后的回调
-        self.current_frame = 0
-        self.current_playing = None
-        self.play_btn.setText("播放")
+        # 加入混音器，与正在播放的声音叠加
+        self.controller.play(music_path)
+
+    def play_group(self, group_name, mode):
+        """按顺序、随机或循环播放整个分组，跳过已知无法播放的文件"""
+        music_paths = [p for p in self.group_widget.get_music_files(group_name)
+                       if p not in self.track_info
+                       or self.track_info[p].status == OK]
+        if not music_paths:
+            self.statusBar().showMessage(f"{group_name}: 没有可以播放的音乐", 5000)
+            return
+        self.service.play_queue(music_paths, mode)
+
+    def set_play_button(self, playing):
+        self.play_btn.setText("停止" if playing else "播放")
         self.play_btn.clicked.disconnect()
-        self.play_btn.clicked.connect(self.play_selected_music)
+        self.play_btn.clicked.connect(
+            self.stop_music if playing else self.play_selected_music)
+
+    def on_playback_state_changed(self, playing, music_path):
+        self.current_playing = music_path
+        self.set_play_button(playing)
+
+    def on_playback_error(self, music_path, message):
+        # 演奏过程中不弹出模态对话框，只提示并更新该文件的状态
+        name = os.path.basename(music_path) if music_path else ""
+        self.statusBar().showMessage(f"播放 {name} 时出错: {message}", 10000)
+        self.tray_icon.showMessage(
+            "播放失败", f"{name}\n{message}", QSystemTrayIcon.Warning, 3000)
+        if music_path:
+            self.track_info.pop(music_path, None)
+            self.validate_library([music_path])
 
     def stop_music(self):
-        if self.stream is not None:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
-            self.current_frame = 0
-            self.current_playing = None
-
-            # 更新按钮状态
-            self.play_btn.setText("播放")
-            self.play_btn.clicked.disconnect()
-            self.play_btn.clicked.connect(self.play_selected_music)
+        self.controller.stop_all()
+
+    def on_device_changed(self, index):
+        device_id = self.device_combo.itemData(index)
+        if device_id is None:
+            return
+        self.last_device_id = device_id
+        self.settings.setValue("last_device_id", device_id)
+        # 切换设备时重新打开常驻输出流
+        self.controller.set_device(device_id)
 
     def refresh_audio_devices(self):
+        # 在后台线程中枚举设备 (首次导入 sounddevice 会加载 PortAudio)
+        def query():
+            started = startup_profiler.last
+            try:
+                devices, default_output = self.engine.backend.query_devices()
+            except Exception as e:
+                log.error("枚举音频设备失败: %s", e)
+                devices, default_output = [], -1
+            startup_profiler.mark("枚举音频设备", started)
+            self.devicesLoaded.emit(devices, default_output)
+
+        threading.Thread(target=query, daemon=True).start()
+
+    def on_devices_loaded(self, devices, default_output):
+        self.audio_devices = devices
+        self.device_combo.blockSignals(True)
         self.device_combo.clear()
-        devices = sd.query_devices()
-        default_output = sd.default.device[1]  # 默认输出设备
-
-        for i, device in enumerate(devices):
-            # 只显示输出设备
-            if device['max_output_channels'] > 0:
-                is_default = "(默认设备)" if i == default_output else ""
-                self.device_combo.addItem(f"{device['name']} {is_default}", i)
-
-                # 如果是上次选择的设备，设置为选中
-                if i == self.last_device_id:
-                    self.device_combo.setCurrentIndex(
-                        self.device_combo.count() - 1)
+        selected = None
+        for i, name in devices:
+            is_default = "(默认设备)" if i == default_output else ""
+            self.device_combo.addItem(f"{name} {is_default}", i)
+
+            # 如果是上次选择的设备，设置为选中；否则选中默认设备
+            if i == self.last_device_id or (
+                    selected is None and i == default_output):
+                selected = self.device_combo.count() - 1
+        if selected is not None:
+            self.device_combo.setCurrentIndex(selected)
+        self.device_combo.blockSignals(False)
+        self.controller.set_device(self.device_combo.currentData())
 
     def load_settings(self):
-        # 加载设备选择
-        for i in range(self.device_combo.count()):
-            if self.device_combo.itemData(i) == self.last_device_id:
-                self.device_combo.setCurrentIndex(i)
-                break
+        """在后台迁移旧设置、读取音乐库并建立搜索索引，完成后在界面线程中应用"""
+        def run():
+            try:
+                self.migrate_library()
+                groups, hotkeys = self.library.load()
+                search_index = SearchIndex()
+                search_index.rebuild(groups)
+            except Exception as e:
+                log.error("加载音乐库失败: %s", e)
+                return
+            self.libraryLoaded.emit(groups, hotkeys, search_index)
 
-        # 加载分组和音乐文件
-        self.group_widget.load_groups(self.settings)
+        threading.Thread(target=run, daemon=True).start()
 
-        # 加载快捷键设置
-        self.music_list_widget.load_hotkeys(self.settings)
+    def on_library_loaded(self, groups, hotkeys, search_index):
+        self.group_widget.set_groups(groups)
+        self.search_index = search_index
+        self.search_widget.index = search_index
+        for action in self.import_actions:
+            action.setEnabled(True)
 
         # 重新创建快捷键
-        for hotkey, music_path in self.music_list_widget.hotkeys.items():
-            self.shortcuts[hotkey] = music_path
-
-        self.start_global_hotkey_listener()
+        for hotkey, music_path in hotkeys:
+            self.bind_hotkey(hotkey, music_path)
 
         # 选择第一个分组
         groups = self.group_widget.get_all_groups()
         if groups:
             self.group_widget.group_list.setCurrentRow(0)
             self.on_group_selected(groups[0])
+        self.library_loaded = True
+        startup_profiler.mark("加载音乐库")
+
+        # 在后台启动键盘监听 (首次导入 pynput 会连接显示服务器)
+        def start_listener():
+            started = startup_profiler.last
+            self.hotkey_matcher.start()
+            startup_profiler.mark("启动快捷键监听", started)
+
+        threading.Thread(target=start_listener, daemon=True).start()
+        self.folder_watcher.start()
+        # 在后台检查所有文件是否存在并读取音频信息
+        self.validate_library(
+            [p for files in self.group_widget.groups.values() for p in files]
+            + self.hotkey_index.paths(), startup=True)
+        # 后台预解码所有绑定了快捷键的音乐
+        self.warm_hotkey_cache(self.hotkey_index.paths())
+
+    def migrate_library(self):
+        """旧版本把音乐库保存在 QSettings 数组中，首次启动时导入数据库"""
+        # 在后台线程中调用，QSettings 对象不能跨线程共用
+        count = migrate_qsettings(
+            self.library, QSettings("MusicPlayer", "HotkeyMusicPlayer"))
+        if count:
+            log.info("已从旧设置迁移 %d 个分组", count)
+
+    def validate_library(self, music_paths, startup=False):
+        if not music_paths and not startup:
+            return
+
+        def run():
+            try:
+                info = validate_paths(music_paths, self.library)
+            except Exception as e:
+                log.error("检查音乐文件失败: %s", e)
+                return
+            self.libraryValidated.emit(info, startup)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_library_validated(self, info, startup):
+        self.track_info.update(info)
+        self.music_list_widget.refresh_all()
+        # 已不存在的文件不再作为同内容文件的规范路径
+        for music_path, i in info.items():
+            if i.status == MISSING:
+                self.service.content.discard(music_path)
+        # 可以播放的文件在后台分析响度 (已分析且未变化的文件会跳过)
+        self.analyze_audio([p for p, i in info.items() if i.status == OK])
+        bad = [p for p, i in info.items() if i.status != OK]
+        if bad:
+            self.statusBar().showMessage(f"{len(bad)} 个音乐文件不存在或无法读取", 10000)
+        if not startup:
+            return
+        # 启动时一次性报告失效的快捷键，不等到演奏中触发时才发现
+        broken = [(hotkey, p) for hotkey, p in self.hotkey_index.items()
+                  if p in info and info[p].status != OK]
+        if broken:
+            lines = [f"{hotkey}: {os.path.basename(p)}"
+                     for hotkey, p in broken[:10]]
+            if len(broken) > 10:
+                lines.append(f"... 等 {len(broken)} 个")
+            box = QMessageBox(
+                QMessageBox.Warning, "快捷键",
+                "以下快捷键对应的文件不存在或无法读取:\n" + "\n".join(lines),
+                QMessageBox.Ok, self)
+            box.setAttribute(Qt.WA_DeleteOnClose)
+            box.setModal(False)
+            box.show()
+
+    def warm_hotkey_cache(self, music_paths):
+        self.service.warm(music_paths)
 
     def save_settings(self):
+        # 音乐库尚未加载完成时不能覆盖已保存的设置
+        if not self.library_loaded:
+            return
         # 保存设备设置
         self.settings.setValue("last_device_id", self.last_device_id)
 
-        # 保存分组和音乐文件
-        self.group_widget.save_groups(self.settings)
-
-        # 保存快捷键设置
-        self.music_list_widget.save_hotkeys(self.settings)
+        # 音乐库在修改时已写入，这里只需等待未提交的写操作完成
+        self.library.flush()
 
     def closeEvent(self, event):
         event.ignore()
@@ -536,44 +968,46 @@ class MusicPlayerApp(QMainWindow):
         if reason == QSystemTrayIcon.DoubleClick:
             self.show_window()
 
-    def start_global_hotkey_listener(self):
-        if self.hotkey_listener:
-            # 如果已存在监听器，先停止它
-            try:
-                self.hotkey_listener.stop()
-            except:
-                pass
-            self.hotkey_listener = None
-
-        if self.shortcuts:
-            log.info("当前注册的快捷键:", self.shortcuts)
-            # 创建新的监听器，并绑定对应的回调函数
-            self.hotkey_listener = keyboard.GlobalHotKeys(
-                {hotkey: lambda hk=hotkey: self.toggle_play_music(
-                    self.shortcuts[hk]) for hotkey in self.shortcuts}
-            )
-            
-
-            def for_thread():
-                with self.hotkey_listener:
-                    self.hotkey_listener.join()
-
-            # 设置 daemon=True 表示该线程为守护线程，主程序退出时自动结束
-            thread = threading.Thread(target=for_thread, daemon=True)
-            thread.start()
+    def bind_hotkey(self, hotkey, music_path):
+        try:
+            self.hotkey_matcher.add(
+                hotkey, lambda: self.controller.toggle(music_path))
+        except ValueError as e:
+            log.warning("无效的快捷键 %s: %s", hotkey, e)
+            self.hotkey_index.unbind_hotkey(hotkey)
+            return
+        old_hotkey, displaced = self.hotkey_index.bind(hotkey, music_path)
+        if old_hotkey and old_hotkey != hotkey:
+            self.hotkey_matcher.remove(old_hotkey)
+        self.music_list_widget.refresh_music(music_path, displaced)
+
+    def unbind_hotkey(self, hotkey):
+        self.hotkey_matcher.remove(hotkey)
+        music_path = self.hotkey_index.unbind_hotkey(hotkey)
+        self.music_list_widget.refresh_music(music_path)
 
     def quit(self):
-        if self.hotkey_listener:
-            self.hotkey_listener.stop()
-        # 保存设置
-        self.save_settings()
-        # 停止播放并退出
-        self.stop_music()
+        self.hotkey_matcher.stop()
+        if self.service is not None:
+            self.folder_watcher.stop()
+            if self.ipc_server is not None:
+                self.ipc_server.stop()
+            # 保存设置
+            self.save_settings()
+            # 停止播放并退出 (控制线程退出前会关闭输出流)
+            self.service.close()
         QApplication.quit()
 
 
 if __name__ == "__main__":
+    # 打包后的程序中响度分析的进程池需要
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO)
+    startup_profiler.mark("导入模块")
     app = QApplication(sys.argv)
     player = MusicPlayerApp()
     player.show()
+    startup_profiler.mark("显示窗口")
+    # 事件循环开始后 (窗口已绘制) 再创建播放核心
+    QTimer.singleShot(0, player.start_deferred_init)
     sys.exit(app.exec_())
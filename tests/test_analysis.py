@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.analysis import (AudioAnalyzer, compute_gain, gated_loudness,
+                           measure_file)
+from core.library import LibraryStore
+
+SAMPLERATE = 44100
+
+
+def write_tone(path, silence_s, tone_s):
+    """开头 silence_s 秒静音，之后 tone_s 秒正弦波"""
+    t = np.arange(int(tone_s * SAMPLERATE)) / SAMPLERATE
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    data = np.concatenate([np.zeros(int(silence_s * SAMPLERATE)), tone])
+    sf.write(path, data.astype('float32'), SAMPLERATE)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def test_offsets_follow_file_changes(tmp_path, store):
+    music_path = str(tmp_path / "a.wav")
+    write_tone(music_path, 0.5, 1.0)
+    stale = []
+    analyzer = AudioAnalyzer(store, on_stale=stale.append)
+    assert analyzer.offsets(music_path) is None
+    assert analyzer.analyze([music_path]) == 1
+    start_s, end_s = analyzer.offsets(music_path)
+    assert start_s == pytest.approx(0.5, abs=0.05)
+
+    analyzer.set_trim_silence(music_path, True)
+    assert analyzer.trim_for(music_path) == (start_s, end_s)
+
+    # 文件被替换后不能再使用旧的起止时刻
+    write_tone(music_path, 1.0, 1.0)
+    assert analyzer.offsets(music_path) is None
+    assert analyzer.trim_for(music_path) is None
+    # 只安排一次重新分析
+    assert stale == [music_path]
+
+    assert analyzer.analyze([music_path]) == 1
+    start_s, _ = analyzer.offsets(music_path)
+    assert start_s == pytest.approx(1.0, abs=0.05)
+
+
+def test_gated_loudness_of_known_rms():
+    # 幅度 0.5 的正弦波，均方为 0.125 (-9.03 dB)
+    assert gated_loudness(np.full(50, 0.125)) == pytest.approx(-9.03, abs=0.01)
+    # 低于绝对门限的静音部分不参与计算，只有跨过边界的几个窗口略微拉低结果
+    # (不加门限时整体均值为 -12.04 dB)
+    energies = np.concatenate([np.full(50, 0.125), np.zeros(50)])
+    assert gated_loudness(energies) == pytest.approx(-9.03, abs=0.2)
+    assert gated_loudness(np.zeros(20)) is None
+    assert gated_loudness([]) is None
+
+
+def test_measure_file(tmp_path):
+    music_path = str(tmp_path / "a.wav")
+    write_tone(music_path, 0.0, 2.0)
+    loudness, peak, _, _ = measure_file(music_path)
+    assert loudness == pytest.approx(-9.03, abs=0.05)
+    assert peak == pytest.approx(0.5, abs=1e-3)
+
+
+def test_compute_gain():
+    # 调整到目标响度
+    gain = compute_gain(-9.03, 0.5, -18.0)
+    assert 20 * np.log10(gain) == pytest.approx(-8.97, abs=0.01)
+    # 提升受峰值上限 (-1 dBFS) 限制
+    gain = compute_gain(-30.0, 0.9, -18.0)
+    assert 20 * np.log10(gain * 0.9) == pytest.approx(-1.0, abs=0.01)
+    # 提升和衰减都有上限
+    assert 20 * np.log10(compute_gain(-60.0, 0.01, -18.0)) == pytest.approx(12.0)
+    assert 20 * np.log10(compute_gain(20.0, 1.0, -18.0)) == pytest.approx(-24.0)
+    # 静音文件不调整
+    assert compute_gain(None, 0.0, -18.0) == 1.0
+
+
+def test_gain_for(tmp_path, store):
+    music_path = str(tmp_path / "a.wav")
+    write_tone(music_path, 0.0, 1.0)
+    analyzer = AudioAnalyzer(store, target_db=-18.0)
+    assert analyzer.gain_for(music_path) == 1.0
+    analyzer.analyze([music_path])
+    assert 20 * np.log10(analyzer.gain_for(music_path)) == pytest.approx(
+        -8.97, abs=0.05)
+    analyzer.set_target(-12.0)
+    assert 20 * np.log10(analyzer.gain_for(music_path)) == pytest.approx(
+        -2.97, abs=0.05)
+    analyzer.enabled = False
+    assert analyzer.gain_for(music_path) == 1.0
+
+
+def test_process_pool_uses_spawn(tmp_path, store, monkeypatch):
+    from core import analysis
+    assert analysis.POOL_CONTEXT.get_start_method() == "spawn"
+    monkeypatch.setattr(analysis, "PROCESS_POOL_THRESHOLD", 2)
+    paths = []
+    for i in range(2):
+        paths.append(str(tmp_path / f"{i}.wav"))
+        write_tone(paths[-1], 0.1 * i, 0.5)
+    analyzer = AudioAnalyzer(store)
+    assert analyzer.analyze(paths, workers=2) == 2
+    assert analyzer.offsets(paths[1])[0] == pytest.approx(0.1, abs=0.02)
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.cache import AudioCache, decode_file
+from core.metrics import Trace
+
+FRAMES = 1000
+NBYTES = FRAMES * 2 * 4  # 每个文件解码后的字节数 (float32 双声道)
+
+
+def write(path, value=0.1, frames=FRAMES, samplerate=8000):
+    sf.write(str(path), np.full((frames, 2), value, dtype=np.float32),
+             samplerate, subtype='FLOAT')
+    return str(path)
+
+
+def bump_mtime(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+@pytest.fixture
+def music_paths(tmp_path):
+    return [write(tmp_path / f"{i}.wav", value=0.1 * (i + 1)) for i in range(4)]
+
+
+def test_hit_after_first_get(music_paths):
+    cache = AudioCache(NBYTES * 4)
+    first = cache.get(music_paths[0])
+    assert cache.get(music_paths[0]) is first
+    assert (cache.hits, cache.misses, cache.decodes) == (1, 1, 1)
+    assert cache.current_bytes == NBYTES
+
+
+def test_lru_eviction_by_bytes(music_paths):
+    cache = AudioCache(NBYTES * 2)
+    cache.get(music_paths[0])
+    cache.get(music_paths[1])
+    cache.get(music_paths[0])  # 1 变为最久未使用
+    cache.get(music_paths[2])
+    assert cache.contains(music_paths[0]) and cache.contains(music_paths[2])
+    assert not cache.contains(music_paths[1])
+    assert cache.current_bytes == NBYTES * 2
+
+
+def test_file_larger_than_budget_is_not_cached(music_paths):
+    cache = AudioCache(NBYTES - 1)
+    data, _ = cache.get(music_paths[0])
+    assert data.shape == (FRAMES, 2)
+    assert not cache.contains(music_paths[0]) and cache.current_bytes == 0
+
+
+def test_modified_file_is_decoded_again(music_paths):
+    cache = AudioCache(NBYTES * 4)
+    cache.get(music_paths[0])
+    write(music_paths[0], value=0.5)
+    bump_mtime(music_paths[0])
+    assert not cache.contains(music_paths[0])
+    data, _ = cache.get(music_paths[0])
+    assert np.allclose(data, 0.5)
+    # 旧条目被替换，不重复计算大小
+    assert cache.current_bytes == NBYTES and cache.decodes == 2
+
+
+def test_format_change_clears_and_converts(music_paths):
+    cache = AudioCache(NBYTES * 16)
+    cache.get(music_paths[0])
+    cache.set_format(16000, 1)
+    assert not cache.contains(music_paths[0]) and cache.current_bytes == 0
+    data, samplerate = cache.get(music_paths[0])
+    assert samplerate == 16000 and data.shape == (FRAMES * 2, 1)
+    # 格式不变时不清空
+    cache.set_format(16000, 1)
+    assert cache.contains(music_paths[0])
+
+
+def test_invalidate(music_paths):
+    cache = AudioCache(NBYTES * 4)
+    cache.get(music_paths[0])
+    cache.invalidate(music_paths[0])
+    assert not cache.contains(music_paths[0]) and cache.current_bytes == 0
+
+
+def test_set_max_bytes_evicts(music_paths):
+    cache = AudioCache(NBYTES * 4)
+    cache.warm(music_paths)
+    assert cache.current_bytes == NBYTES * 4
+    cache.set_max_bytes(NBYTES)
+    assert [cache.contains(p) for p in music_paths] == [False, False, False, True]
+    assert cache.current_bytes == NBYTES
+
+
+def test_warm_skips_broken_files(music_paths, tmp_path):
+    broken = str(tmp_path / "broken.wav")
+    with open(broken, "wb") as f:
+        f.write(b"not audio")
+    cache = AudioCache(NBYTES * 4)
+    cache.warm([broken, music_paths[0]])
+    assert cache.contains(music_paths[0]) and not cache.contains(broken)
+
+
+def test_trace_records_hit(music_paths):
+    cache = AudioCache(NBYTES * 4)
+    trace = Trace(music_paths[0], 0.0)
+    cache.get(music_paths[0], trace)
+    assert trace.cache_hit is False and trace.decode_ms > 0
+    trace = Trace(music_paths[0], 0.0)
+    cache.get(music_paths[0], trace)
+    assert trace.cache_hit is True
+
+
+def test_decode_file(music_paths):
+    data, samplerate = decode_file(music_paths[0])
+    assert samplerate == 8000 and data.dtype == np.float32
+    data, samplerate = decode_file(music_paths[0], 16000, 1)
+    assert samplerate == 16000 and data.shape == (FRAMES * 2, 1)
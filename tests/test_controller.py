@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+import soundfile as sf
+
+from core.backends import FakeAudioBackend
+from core.cache import AudioCache
+from core.controller import PlaybackController
+from core.engine import AudioEngine
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_warm_repeated_after_format_change(tmp_path):
+    music_path = str(tmp_path / "a.wav")
+    sf.write(music_path, np.zeros((4410, 2), dtype=np.float32), 44100)
+    backend = FakeAudioBackend(samplerate=48000, threaded=False)
+    cache = AudioCache(64 << 20)
+    controller = PlaybackController(AudioEngine(backend=backend), cache,
+                                    stream_threshold=1 << 30)
+    controller.start()
+    try:
+        # 设备枚举完成前按默认设备的格式预加载
+        controller.warm([music_path])
+        assert wait_for(lambda: cache.contains(music_path))
+        assert cache.samplerate == 48000
+
+        # 选中保存的设备后格式变化，缓存被清空后应重新预加载
+        backend.samplerate = 44100
+        controller.set_device(0)
+        assert wait_for(lambda: cache.samplerate == 44100
+                        and cache.contains(music_path))
+    finally:
+        controller.shutdown()
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from core.dedup import ContentIndex
+from core.library import LibraryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_duplicates_share_canonical(tmp_path, store):
+    a = write(tmp_path / "a.wav", b"same")
+    b = write(tmp_path / "b.wav", b"same")
+    c = write(tmp_path / "c.wav", b"other")
+    content = ContentIndex(store)
+    assert content.update([a, b, c]) == [b]
+    assert content.canonical(b) == a
+    assert content.resolve(b) == a
+    assert sorted(content.paths_for(a)) == [a, b]
+    assert content.resolve(c) == c
+
+
+def test_resolve_checks_canonical_file(tmp_path, store):
+    a = write(tmp_path / "a.wav", b"same")
+    b = write(tmp_path / "b.wav", b"same")
+    content = ContentIndex(store)
+    content.update([a, b])
+
+    # 规范路径的文件在计算摘要后被修改，不能再代替 b 读取
+    write(a, b"changed!")
+    st = os.stat(a)
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert content.canonical(b) == a
+    assert content.resolve(b) == b
+
+    # 重新计算后 b 成为新的规范路径
+    content.update([a, b])
+    assert content.resolve(b) == b
+    assert content.canonical(a) == a
+
+
+def test_resolve_checks_own_file(tmp_path, store):
+    a = write(tmp_path / "a.wav", b"same")
+    b = write(tmp_path / "b.wav", b"same")
+    content = ContentIndex(store)
+    content.update([a, b])
+    write(b, b"different")
+    assert content.resolve(b) == b
+    os.remove(a)
+    assert content.resolve(a) == a
@@ -0,0 +1,134 @@
+import os
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.backends import FakeAudioBackend
+from core.cache import AudioCache
+from core.controller import PlaybackController
+from core.diskcache import HEADER_SIZE, PcmDiskCache
+from core.engine import AudioEngine
+
+
+def write(path, frames=4410, samplerate=44100, channels=2):
+    data = np.linspace(-0.5, 0.5, frames * channels, dtype=np.float32)
+    sf.write(str(path), data.reshape(frames, channels), samplerate,
+             subtype='FLOAT')
+    return str(path)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def bump_mtime(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return PcmDiskCache(tmp_path / "pcm_cache", 1 << 30)
+
+
+def test_store_and_load_memmap(disk_cache, tmp_path):
+    music_path = write(tmp_path / "a.wav")
+    data, _ = sf.read(music_path, dtype='float32', always_2d=True)
+    assert disk_cache.store(music_path, data, 44100, native=True)
+
+    loaded, samplerate = disk_cache.load(music_path)
+    assert isinstance(loaded, np.memmap)
+    assert samplerate == 44100 and loaded.shape == (4410, 2)
+    assert loaded.dtype == np.float32 and loaded.offset == HEADER_SIZE
+    np.testing.assert_array_equal(loaded, data)
+    # 指定格式的条目与原格式的条目互不影响
+    assert disk_cache.load(music_path, 48000, 2) is None
+
+
+def test_fill_converts_to_target_format(disk_cache, tmp_path):
+    music_paths = [write(tmp_path / f"{i}.wav") for i in range(3)]
+    broken = str(tmp_path / "broken.wav")
+    with open(broken, "wb") as f:
+        f.write(b"not audio")
+
+    assert disk_cache.fill(music_paths + [broken], 48000, 1) == (3, 1)
+    data, samplerate = disk_cache.load(music_paths[0], 48000, 1)
+    assert samplerate == 48000 and data.shape == (4800, 1)
+    # 已缓存的文件不再解码
+    assert disk_cache.fill(music_paths, 48000, 1) == (0, 0)
+
+
+def test_changed_source_invalidates_entry(disk_cache, tmp_path):
+    music_path = write(tmp_path / "a.wav")
+    disk_cache.fill([music_path])
+    assert disk_cache.contains(music_path)
+
+    bump_mtime(music_path)
+    assert not disk_cache.contains(music_path)
+    assert disk_cache.load(music_path) is None
+    # 过期的文件在读取时删除
+    assert disk_cache.total_bytes() == 0
+
+
+def test_invalidate(disk_cache, tmp_path):
+    music_path = write(tmp_path / "a.wav")
+    disk_cache.fill([music_path], 48000, 2)
+    disk_cache.invalidate(music_path, 48000, 2)
+    assert not disk_cache.contains(music_path, 48000, 2)
+
+
+def test_limit_removes_least_recently_used(disk_cache, tmp_path):
+    music_paths = [write(tmp_path / f"{i}.wav") for i in range(3)]
+    disk_cache.fill(music_paths)
+    entry_size = disk_cache.total_bytes() // 3
+    for name in os.listdir(disk_cache.cache_dir):
+        os.utime(os.path.join(disk_cache.cache_dir, name), (1000, 1000))
+    # 读取会更新条目的使用时间
+    disk_cache.load(music_paths[0])
+
+    disk_cache.set_max_bytes(entry_size * 2)
+    assert disk_cache.total_bytes() <= entry_size * 2
+    assert disk_cache.contains(music_paths[0])
+
+
+def test_mapped_entries_do_not_use_heap_budget(tmp_path):
+    disk_cache = PcmDiskCache(tmp_path / "pcm_cache", 1 << 30)
+    music_paths = [write(tmp_path / f"{i}.wav") for i in range(4)]
+    nbytes = 4410 * 2 * 4
+    # 堆内存预算只够一个文件，映射的磁盘缓存不受影响
+    cache = AudioCache(nbytes, disk_cache, max_mapped=3)
+    for music_path in music_paths:
+        data, _ = cache.get(music_path)
+        assert isinstance(data, np.memmap)
+    assert cache.current_bytes == 0
+    # 超过映射条目数上限时淘汰最久未使用的
+    assert cache.mapped == 3
+    assert not cache.contains(music_paths[0])
+    assert all(cache.contains(p) for p in music_paths[1:])
+
+
+def test_controller_fills_in_device_format(tmp_path):
+    music_path = write(tmp_path / "a.wav")
+    disk_cache = PcmDiskCache(tmp_path / "pcm_cache", 1 << 30)
+    backend = FakeAudioBackend(samplerate=48000, threaded=False)
+    controller = PlaybackController(
+        AudioEngine(backend=backend), AudioCache(1 << 20, disk_cache),
+        stream_threshold=1 << 30)
+    results = []
+    controller.start()
+    try:
+        # 设备尚未打开，按默认设备的格式写入
+        controller.fill_disk_cache(
+            [music_path], on_done=lambda *result: results.append(result))
+        assert wait_for(lambda: results)
+    finally:
+        controller.shutdown()
+    assert results == [(1, 0)]
+    assert disk_cache.contains(music_path, 48000, 2)
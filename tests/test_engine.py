@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+
+from core.backends import FakeAudioBackend
+from core.engine import LATENCY_PROFILES, AudioEngine
+from core.stream import BufferSource
+
+SAMPLERATE = 8000
+
+
+def make_engine(devices=1, **kwargs):
+    backend = FakeAudioBackend(samplerate=SAMPLERATE, threaded=False,
+                               devices=devices)
+    return AudioEngine(backend=backend, **kwargs), backend
+
+
+def source(value, frames=4096):
+    return BufferSource(np.full((frames, 2), value, dtype=np.float32), SAMPLERATE)
+
+
+def test_stream_stays_open_between_plays():
+    engine, backend = make_engine()
+    engine.set_device(0)
+    engine.play(source(0.25), key="a")
+    stream = engine.stream
+    stream.process()
+    assert np.allclose(stream._outdata, 0.25)
+
+    engine.play(source(0.5), key="b")
+    assert engine.stream is stream and backend.stream is stream
+    stream.process()
+    assert np.allclose(stream._outdata, 0.75)
+
+    # 再次选择同一设备不重新打开
+    engine.set_device(0)
+    assert engine.stream is stream
+
+
+def test_on_idle_after_last_voice():
+    idle = []
+    engine, _ = make_engine(on_idle=lambda: idle.append(True))
+    engine.play(source(0.25, frames=100), key="a")
+    engine.stream.process()
+    assert idle == [True]
+    assert not engine.is_playing("a")
+    # 结束的声音在控制线程中关闭
+    assert len(engine.mixer.finished) == 1
+    engine.collect_finished()
+    assert not engine.mixer.finished
+
+
+def test_switch_latency_profile():
+    engine, _ = make_engine()
+    engine.play(source(0.25), key="a")
+    normal = engine.stream
+    assert normal.blocksize == LATENCY_PROFILES["normal"]["blocksize"]
+
+    # 相同的配置不关闭输出流
+    engine.set_profile("normal")
+    assert engine.stream is normal
+
+    engine.set_profile("low")
+    assert engine.stream is None and not normal.active
+    assert not engine.mixer.voices
+    engine.play(source(0.25), key="a")
+    assert engine.stream.blocksize == LATENCY_PROFILES["low"]["blocksize"]
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.25)
+
+
+def test_rejects_wrong_samplerate():
+    engine, _ = make_engine()
+    with pytest.raises(ValueError):
+        engine.play(BufferSource(np.zeros((10, 2), dtype=np.float32),
+                                 SAMPLERATE * 2))
+
+
+def test_stop_and_gain():
+    engine, _ = make_engine()
+    engine.play(source(0.25), key="a")
+    engine.play(source(0.25), key="b")
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.5)
+    engine.set_gain("b", 2.0)
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.75)
+    engine.stop("a")
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.5)
+    engine.stop_all()
+    engine.stream.process()
+    assert not engine.stream._outdata.any()
+
+
+def test_add_and_remove_extra_output_mid_play():
+    engine, backend = make_engine(devices=2)
+    engine.set_device(0)
+    engine.play(source(0.25), key="a")
+    primary = engine.stream
+    primary.process()
+
+    # 播放中加入附加设备：之后触发的声音同时输出到两个设备，已有的声音不中断
+    engine.set_outputs(1.0, [(1, 0.5)])
+    engine.play(source(0.25), key="b")
+    extra = backend.streams[1]
+    assert extra is not primary and extra.active
+    primary.process()
+    extra.process()
+    assert np.allclose(primary._outdata, 0.5)
+    assert np.allclose(extra._outdata, 0.125)
+
+    # 修改附加设备的音量不重新打开输出流
+    engine.set_outputs(1.0, [(1, 1.0)])
+    assert backend.streams[1] is extra and extra.active
+    extra.process()
+    assert np.allclose(extra._outdata, 0.25)
+
+    # 移除附加设备只关闭它的输出流，主设备继续播放
+    engine.set_outputs(1.0, [])
+    assert not extra.active and primary.active
+    primary.process()
+    assert np.allclose(primary._outdata, 0.5)
+    engine.stop("b")
+    primary.process()
+    assert np.allclose(primary._outdata, 0.25)
+
+
+def test_extra_output_same_as_primary_is_ignored():
+    engine, backend = make_engine(devices=2)
+    engine.set_device(0)
+    engine.set_outputs(0.5, [(0, 1.0)])
+    engine.play(source(0.5), key="a")
+    assert list(backend.streams) == [0]
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.25)
+
+
+def test_failed_extra_output_does_not_stop_primary():
+    engine, backend = make_engine(devices=2)
+    engine.set_device(0)
+    engine.set_outputs(1.0, [(5, 1.0)])  # 不存在的设备
+    backend.device_info = lambda device_id: (
+        {"name": "x", "default_samplerate": SAMPLERATE, "max_output_channels": 2}
+        if device_id in (None, 0) else _raise())
+    engine.play(source(0.25), key="a")
+    engine.play(source(0.25), key="b")
+    assert list(backend.streams) == [0]
+    assert engine.outputs[0].failed
+    engine.stream.process()
+    assert np.allclose(engine.stream._outdata, 0.5)
+
+    # 重新设置输出后再尝试打开
+    engine.set_outputs(1.0, [(5, 1.0)])
+    assert not engine.outputs[0].failed
+
+
+def _raise():
+    raise OSError("no such device")
@@ -0,0 +1,129 @@
+import pytest
+
+from core.backends import FakeKey, FakeKeyboardBackend
+from core.hotkeys import (HotkeyMatcher, parse_hotkey, MOD_CTRL, MOD_SHIFT,
+                          MOD_ALT)
+
+
+def test_parse_hotkey():
+    assert parse_hotkey("<Ctrl>+<Shift>+a") == (MOD_CTRL | MOD_SHIFT, "a")
+    assert parse_hotkey("<alt>+<F5>") == (MOD_ALT, "f5")
+    assert parse_hotkey("b") == (0, "b")
+    assert parse_hotkey(" <Ctrl> + X ") == (MOD_CTRL, "x")
+
+
+def test_parse_hotkey_requires_key():
+    with pytest.raises(ValueError):
+        parse_hotkey("<Ctrl>+<Shift>")
+
+
+@pytest.fixture
+def keyboard():
+    backend = FakeKeyboardBackend()
+    matcher = HotkeyMatcher(backend)
+    fired = []
+    matcher.add("<Ctrl>+a", lambda: fired.append("ctrl+a"))
+    matcher.add("b", lambda: fired.append("b"))
+    matcher.start()
+    yield backend, matcher, fired
+    matcher.stop()
+
+
+def test_press_fires_once(keyboard):
+    backend, _, fired = keyboard
+    backend.tap("<ctrl>+a")
+    backend.tap("b")
+    assert fired == ["ctrl+a", "b"]
+    # 没有修饰键时不匹配 <Ctrl>+a
+    backend.tap("a")
+    assert fired == ["ctrl+a", "b"]
+
+
+def test_auto_repeat_ignored(keyboard):
+    backend, _, fired = keyboard
+    backend.press("b")
+    backend.press("b")
+    backend.press("b")
+    backend.release("b")
+    backend.press("b")
+    assert fired == ["b", "b"]
+
+
+def test_modifier_released_first(keyboard):
+    backend, _, fired = keyboard
+    backend.press("ctrl_l")
+    backend.press("a")
+    backend.release("ctrl_l")
+    backend.release("a")
+    backend.tap("<ctrl>+a")
+    assert fired == ["ctrl+a", "ctrl+a"]
+
+
+def test_both_sides_of_modifier(keyboard):
+    backend, matcher, fired = keyboard
+    backend.press("ctrl_l")
+    backend.press("ctrl_r")
+    backend.release("ctrl_r")
+    # 左 Ctrl 仍按着
+    backend.press("a")
+    backend.release("a")
+    backend.release("ctrl_l")
+    assert fired == ["ctrl+a"]
+    assert matcher._modifiers == 0
+
+
+def test_shifted_character_release_order():
+    backend = FakeKeyboardBackend()
+    matcher = HotkeyMatcher(backend)
+    fired = []
+    matcher.add("<Shift>+!", lambda: fired.append("!"))
+    matcher.start()
+    # Shift+1: 按下时报告 '!'，先松开 Shift 后松开 1 时报告 '1'，键码相同
+    for _ in range(2):
+        matcher._on_press(FakeKey("shift", None))
+        matcher._on_press(FakeKey(None, "!", 0x31))
+        matcher._on_release(FakeKey("shift", None))
+        matcher._on_release(FakeKey(None, "1", 0x31))
+    assert fired == ["!", "!"]
+    assert not matcher._pressed
+
+
+def test_missed_release_recovers(keyboard):
+    backend, matcher, fired = keyboard
+    backend.press("b")
+    # 漏掉了 b 的松开事件，修饰键变化后 b 不再被当作自动重复
+    backend.press("ctrl_l")
+    backend.release("ctrl_l")
+    backend.press("b")
+    assert fired == ["b", "b"]
+
+    # 漏掉了 Ctrl 的松开事件，reset 后恢复
+    backend.press("ctrl_l")
+    matcher.reset()
+    backend.tap("b")
+    assert fired == ["b", "b", "b"]
+
+
+def test_unmatched_release_clears_modifier(keyboard):
+    backend, matcher, fired = keyboard
+    matcher._on_press(FakeKey("ctrl_l", None))
+    # 松开事件报告的是另一侧，仍然清除该修饰键
+    matcher._on_release(FakeKey("ctrl", None))
+    backend.tap("b")
+    assert fired == ["b"]
+    assert matcher._modifiers == 0
+
+
+def test_binding_error_does_not_break_listener():
+    backend = FakeKeyboardBackend()
+    matcher = HotkeyMatcher(backend)
+    fired = []
+
+    def broken():
+        raise RuntimeError("boom")
+    matcher.add("a", broken)
+    matcher.add("b", lambda: fired.append("b"))
+    matcher.start()
+    backend.tap("a")
+    backend.tap("b")
+    assert fired == ["b"]
@@ -0,0 +1,101 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.dedup import ContentIndex
+from core.importer import FolderImporter, probe_audio_file, scan_audio_files
+from core.library import LibraryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def write(path, value=0.1):
+    sf.write(str(path), np.full(800, value, dtype=np.float32), 8000)
+    return str(path)
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    root = tmp_path / "music"
+    (root / "b").mkdir(parents=True)
+    (root / "a").mkdir()
+    write(root / "2.wav", 0.2)
+    write(root / "1.WAV", 0.1)
+    write(root / "a" / "3.wav", 0.3)
+    write(root / "b" / "4.wav", 0.4)
+    (root / "cover.jpg").write_bytes(b"jpg")
+    (root / "notes.txt").write_text("not audio")
+    (root / "broken.mp3").write_bytes(b"not really audio")
+    return str(root)
+
+
+def run(importer):
+    batches, progress, finished = [], [], []
+    importer.on_batch = batches.append
+    importer.on_progress = lambda *args: progress.append(args)
+    importer.on_finished = lambda *args: finished.append(args)
+    importer.start()
+    importer._thread.join(10)
+    return batches, progress, finished
+
+
+def test_scan_filters_extensions_in_name_order(music_dir):
+    names = [os.path.relpath(p, music_dir) for p in scan_audio_files(music_dir)]
+    # 扩展名不区分大小写，子目录按名称顺序遍历
+    assert names == ["1.WAV", "2.wav", "broken.mp3",
+                     os.path.join("a", "3.wav"), os.path.join("b", "4.wav")]
+
+
+def test_probe_audio_file(music_dir):
+    assert probe_audio_file(os.path.join(music_dir, "2.wav"))
+    assert not probe_audio_file(os.path.join(music_dir, "broken.mp3"))
+    assert not probe_audio_file(os.path.join(music_dir, "missing.wav"))
+
+
+def test_import_in_batches(music_dir):
+    batches, progress, finished = run(FolderImporter(music_dir, batch_size=2))
+    imported = [os.path.relpath(p, music_dir) for batch in batches for p in batch]
+    # 无法读取的文件被跳过
+    assert imported == ["1.WAV", "2.wav", os.path.join("a", "3.wav"),
+                        os.path.join("b", "4.wav")]
+    assert all(len(batch) <= 2 for batch in batches)
+    assert progress[-1] == (5, 4)
+    assert finished == [(4, 1, False)]
+
+
+def test_duplicates_are_recorded(music_dir, tmp_path, store):
+    # 与已有文件内容相同的副本
+    shutil.copy(os.path.join(music_dir, "2.wav"),
+                os.path.join(music_dir, "b", "copy.wav"))
+    content = ContentIndex(store)
+    importer = FolderImporter(music_dir, content=content)
+    batches, _, finished = run(importer)
+
+    copy_path = os.path.join(music_dir, "b", "copy.wav")
+    original = os.path.join(music_dir, "2.wav")
+    # 副本仍然导入，只是与原文件共用缓存
+    assert copy_path in batches[0]
+    assert importer.duplicates == [copy_path]
+    assert content.canonical(copy_path) == original
+    assert finished == [(5, 1, False)]
+
+
+def test_cancel(music_dir):
+    importer = FolderImporter(music_dir, batch_size=1)
+    importer.cancel()
+    batches, _, finished = run(importer)
+    assert batches == []
+    assert finished == [(0, 0, True)]
+
+
+def test_missing_root(tmp_path):
+    batches, _, finished = run(FolderImporter(str(tmp_path / "missing")))
+    assert batches == [] and finished == [(0, 0, False)]
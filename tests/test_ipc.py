@@ -0,0 +1,109 @@
+import json
+import socket
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+from PyQt5.QtCore import QSettings
+
+from core.backends import FakeAudioBackend
+from core.ipc import IpcClient, IpcServer
+from core.service import PlayerService
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def service(tmp_path):
+    settings = QSettings(str(tmp_path / "settings.ini"), QSettings.IniFormat)
+    service = PlayerService(tmp_path / "config", settings,
+                            audio_backend=FakeAudioBackend(samplerate=8000))
+    service.start()
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def server(service, tmp_path):
+    server = IpcServer(service, tmp_path / "ipc.sock")
+    assert server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def music_path(tmp_path):
+    path = str(tmp_path / "a.wav")
+    sf.write(path, np.full((8000 * 5, 2), 0.1, dtype=np.float32), 8000)
+    return path
+
+
+def test_play_status_stop(server, music_path):
+    with IpcClient(server.socket_path) as client:
+        assert client.request("play", path=music_path) == {"ok": True}
+        assert wait_for(lambda: client.request("status")["playing"] == [music_path])
+        assert client.request("stop") == {"ok": True}
+        assert wait_for(lambda: client.request("status")["playing"] == [])
+
+
+def test_list(server, service):
+    service.library.add_group("g")
+    service.library.add_tracks("g", ["/m/1.wav"])
+    service.library.set_hotkey("f1", "/m/1.wav")
+    service.library.flush()
+    with IpcClient(server.socket_path) as client:
+        assert client.request("list") == {
+            "ok": True, "groups": {"g": ["/m/1.wav"]}, "hotkeys": {"f1": "/m/1.wav"}}
+
+
+def test_errors(server):
+    with IpcClient(server.socket_path) as client:
+        assert not client.request("play")["ok"]
+        assert not client.request("play", path=1)["ok"]
+        assert not client.request("bogus")["ok"]
+        assert not client.request("play_group", group="g", mode="bogus")["ok"]
+        assert not client.request("play_group", group="missing")["ok"]
+        # 无效的行不影响同一连接上后续的请求
+        client._sock.sendall(b"not json\n")
+        assert client._read() == {"ok": False, "error": "无效的请求"}
+        assert client.request("status")["ok"]
+
+
+def test_subscribe_receives_state_events(server, music_path):
+    with IpcClient(server.socket_path) as subscriber, \
+            IpcClient(server.socket_path) as client:
+        events = subscriber.events()
+        client.request("play", path=music_path)
+        assert next(events) == {"event": "state", "playing": True, "path": music_path}
+
+
+def test_socket_in_use_is_not_taken_over(server, service):
+    other = IpcServer(service, server.socket_path)
+    assert not other.start()
+    with IpcClient(server.socket_path) as client:
+        assert client.request("status")["ok"]
+
+
+def test_stale_socket_file_is_replaced(service, tmp_path):
+    socket_path = str(tmp_path / "ipc.sock")
+    # 上次异常退出留下的套接字文件
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.close()
+
+    server = IpcServer(service, socket_path)
+    try:
+        assert server.start()
+        with IpcClient(socket_path) as client:
+            client._sock.sendall(json.dumps({"cmd": "status"}).encode() + b"\n")
+            assert client._read() == {"ok": True, "playing": []}
+    finally:
+        server.stop()
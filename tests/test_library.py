@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+from PyQt5.QtCore import QSettings
+
+from core.library import SCHEMA_VERSION, LibraryStore, migrate_qsettings
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def test_load_keeps_group_and_track_order(store):
+    store.add_group("b")
+    store.add_group("a")
+    store.add_tracks("a", ["/m/2.wav", "/m/1.wav"])
+    store.add_tracks("b", ["/m/3.wav"])
+    store.add_tracks("a", ["/m/0.wav"])
+    store.set_hotkey("f1", "/m/1.wav")
+    store.flush()
+
+    groups, hotkeys = store.load()
+    assert list(groups) == ["b", "a"]
+    assert groups["a"] == ["/m/2.wav", "/m/1.wav", "/m/0.wav"]
+    assert hotkeys == [("f1", "/m/1.wav")]
+
+
+def test_move_and_remove_track(store):
+    store.add_group("a")
+    store.add_group("b")
+    store.add_tracks("a", ["/m/1.wav", "/m/2.wav"])
+    store.move_track("/m/1.wav", "a", "b")
+    store.remove_track("a", "/m/2.wav")
+    store.flush()
+
+    groups, _ = store.load()
+    assert groups == {"a": [], "b": ["/m/1.wav"]}
+
+
+def test_writes_are_debounced_until_flush(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=60)
+    try:
+        store.add_group("a")
+        # 写操作在后台线程等待 delay 秒，尚未提交
+        assert store.is_empty()
+        assert store.flush(timeout=5)
+        assert not store.is_empty()
+    finally:
+        store.close()
+
+
+def test_close_flushes_pending_writes(tmp_path):
+    db_path = tmp_path / "library.db"
+    store = LibraryStore(db_path, delay=60)
+    store.add_group("a")
+    store.add_tracks("a", ["/m/1.wav"])
+    store.close()
+    assert not store._thread.is_alive()
+
+    reopened = LibraryStore(db_path, delay=0)
+    try:
+        assert reopened.load()[0] == {"a": ["/m/1.wav"]}
+    finally:
+        reopened.close()
+
+
+def test_failed_statement_keeps_rest_of_batch(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=60)
+    try:
+        store.add_group("a")
+        store._submit("INSERT INTO no_such_table VALUES (?)", (1,))
+        store.add_tracks("a", ["/m/1.wav"])
+        store.flush()
+        assert store.load()[0] == {"a": ["/m/1.wav"]}
+    finally:
+        store.close()
+
+
+def test_schema_version(tmp_path):
+    db_path = tmp_path / "library.db"
+    LibraryStore(db_path).close()
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    finally:
+        conn.close()
+    # 不打开更新版本程序创建的数据库
+    with pytest.raises(RuntimeError):
+        LibraryStore(db_path)
+
+
+def _write_settings(path, groups, hotkeys):
+    settings = QSettings(str(path), QSettings.IniFormat)
+    settings.beginWriteArray("groups")
+    for i, (name, music_files) in enumerate(groups.items()):
+        settings.setArrayIndex(i)
+        settings.setValue("name", name)
+        settings.beginWriteArray("music_files")
+        for j, music_path in enumerate(music_files):
+            settings.setArrayIndex(j)
+            settings.setValue("path", music_path)
+        settings.endArray()
+    settings.endArray()
+    settings.beginWriteArray("hotkeys")
+    for i, (hotkey, music_path) in enumerate(hotkeys):
+        settings.setArrayIndex(i)
+        settings.setValue("hotkey", hotkey)
+        settings.setValue("music_path", music_path)
+    settings.endArray()
+    settings.sync()
+    return QSettings(str(path), QSettings.IniFormat)
+
+
+def test_migrate_qsettings(store, tmp_path):
+    groups = {"b": ["/m/2.wav", "/m/1.wav"], "a": []}
+    settings = _write_settings(
+        tmp_path / "settings.ini", groups, [("f1", "/m/2.wav")])
+
+    assert migrate_qsettings(store, settings) == 2
+    assert store.load() == (groups, [("f1", "/m/2.wav")])
+    # 只迁移一次，之后的修改不会被旧设置覆盖
+    store.remove_group("a")
+    assert migrate_qsettings(store, settings) == 0
+    store.flush()
+    assert list(store.load()[0]) == ["b"]
+
+
+def test_migrate_skips_non_empty_library(store, tmp_path):
+    store.add_group("x")
+    store.flush()
+    settings = _write_settings(tmp_path / "settings.ini", {"a": ["/m/1.wav"]}, [])
+    assert migrate_qsettings(store, settings) == 0
+    assert store.load()[0] == {"x": []}
+    assert store.get_meta("qsettings_migrated") == "1"
@@ -0,0 +1,90 @@
+import pytest
+from PyQt5.QtCore import QModelIndex, Qt
+from PyQt5.QtTest import QAbstractItemModelTester
+
+from components.list import HotkeyRole, MusicListModel, PathRole, StatusRole
+from core.hotkeys import HotkeyIndex
+from core.validator import MISSING, OK, TrackInfo
+
+
+@pytest.fixture
+def model():
+    model = MusicListModel(HotkeyIndex())
+    # 每次修改后检查模型的行数、索引和信号是否一致
+    model.tester = QAbstractItemModelTester(
+        model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+    return model
+
+
+def paths(model):
+    return [model.index(row).data(PathRole) for row in range(model.rowCount())]
+
+
+def record_signals(model):
+    events = []
+    model.rowsInserted.connect(
+        lambda parent, first, last: events.append(("insert", first, last)))
+    model.rowsRemoved.connect(
+        lambda parent, first, last: events.append(("remove", first, last)))
+    model.modelReset.connect(lambda: events.append(("reset",)))
+    return events
+
+
+def test_set_music_files_copies_list(model):
+    music_files = ["/m/a.wav", "/m/b.wav"]
+    model.set_music_files(music_files)
+    music_files.append("/m/c.wav")
+    assert model.rowCount() == 2
+    assert paths(model) == ["/m/a.wav", "/m/b.wav"]
+
+
+def test_insert_and_remove_rows(model):
+    model.set_music_files(["/m/a.wav", "/m/b.wav", "/m/c.wav"])
+    events = record_signals(model)
+
+    model.insert_paths(["/m/d.wav", "/m/e.wav"])
+    model.insert_paths(["/m/x.wav"], row=0)
+    assert model.remove_path("/m/b.wav")
+    assert not model.remove_path("/m/missing.wav")
+
+    assert events == [("insert", 3, 4), ("insert", 0, 0), ("remove", 2, 2)]
+    assert paths(model) == ["/m/x.wav", "/m/a.wav", "/m/c.wav",
+                            "/m/d.wav", "/m/e.wav"]
+    assert [model.row_of(p) for p in paths(model)] == [0, 1, 2, 3, 4]
+    assert model.row_of("/m/b.wav") is None
+
+
+def test_duplicate_paths(model):
+    model.set_music_files(["/m/a.wav", "/m/b.wav", "/m/a.wav"])
+    assert model.row_of("/m/a.wav") == 0
+    # 与分组列表的 remove 一致，先移除第一次出现的一行
+    model.remove_path("/m/a.wav")
+    assert paths(model) == ["/m/b.wav", "/m/a.wav"]
+    assert model.row_of("/m/a.wav") == 1
+    model.remove_path("/m/a.wav")
+    assert model.row_of("/m/a.wav") is None
+
+
+def test_refresh_path_emits_single_row(model):
+    model.set_music_files(["/m/a.wav", "/m/b.wav"])
+    changed = []
+    model.dataChanged.connect(
+        lambda top, bottom, roles: changed.append((top.row(), bottom.row())))
+    model.refresh_path("/m/b.wav")
+    model.refresh_path("/m/missing.wav")
+    assert changed == [(1, 1)]
+
+
+def test_row_data(model):
+    model.hotkeys.bind("f1", "/m/a.wav")
+    model.track_info["/m/a.wav"] = TrackInfo(OK, 65.0, 44100, 2)
+    model.track_info["/m/b.wav"] = TrackInfo(MISSING, 0, 0, 0)
+    model.set_music_files(["/m/a.wav", "/m/b.wav"])
+
+    a, b = model.index(0), model.index(1)
+    assert a.data(Qt.DisplayRole) == "a.wav  [1:05]"
+    assert a.data(HotkeyRole) == "f1"
+    assert b.data(Qt.DisplayRole) == "b.wav  (文件不存在)"
+    assert b.data(StatusRole) == MISSING
+    assert model.rowCount(a) == 0
+    assert model.data(QModelIndex()) is None
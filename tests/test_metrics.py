@@ -0,0 +1,106 @@
+import csv
+import json
+
+import pytest
+
+from core.metrics import (STAGES, LatencyMetrics, Trace, export_csv,
+                          export_json, export_report)
+
+
+def complete(metrics, music_path, latency_ms, cache_hit=True, key_event=100.0):
+    trace = metrics.start(music_path, key_event)
+    trace.dispatch = key_event + 0.001
+    trace.loaded = key_event + 0.002
+    trace.started = key_event + 0.003
+    trace.first_callback = key_event + latency_ms / 1000
+    trace.cache_hit = cache_hit
+    return trace
+
+
+def test_trace_stages():
+    trace = Trace("/m/a.wav", 10.0)
+    assert not trace.complete and trace.latency_ms is None
+    trace.dispatch = 10.002
+    trace.first_callback = 10.010
+    assert trace.complete
+    assert trace.stage_ms("dispatch") == pytest.approx(2.0)
+    assert trace.stage_ms("loaded") is None
+    # 没有 DAC 时间时以第一次回调为准
+    assert trace.latency_ms == pytest.approx(10.0)
+    trace.output = 10.025
+    assert trace.latency_ms == pytest.approx(25.0)
+
+    row = trace.to_dict()
+    assert set(row) == {"music_path", "cache_hit", "decode_ms", "latency_ms"} | {
+        stage + "_ms" for stage in STAGES}
+    assert row["output_ms"] == pytest.approx(25.0)
+
+
+def test_percentiles_against_known_data():
+    metrics = LatencyMetrics()
+    # 延迟为 1..100 ms，前 25 次未命中缓存
+    for i in range(1, 101):
+        complete(metrics, "/m/a.wav", i, cache_hit=i > 25)
+    complete(metrics, "/m/b.wav", 7)
+    metrics.start("/m/c.wav", 100.0)  # 尚未输出，不参与统计
+
+    summary = metrics.summary()
+    assert set(summary) == {"/m/a.wav", "/m/b.wav"}
+    a = summary["/m/a.wav"]
+    assert a["count"] == 100
+    # numpy 默认的线性插值
+    assert a["p50"] == pytest.approx(50.5)
+    assert a["p95"] == pytest.approx(95.05)
+    assert a["p99"] == pytest.approx(99.01)
+    assert a["cache_hit_rate"] == pytest.approx(0.75)
+    assert summary["/m/b.wav"]["p99"] == pytest.approx(7.0)
+
+
+def test_keeps_most_recent_traces():
+    metrics = LatencyMetrics(max_traces=3)
+    for i in range(5):
+        complete(metrics, f"/m/{i}.wav", 1)
+    assert [t.music_path for t in metrics.completed()] == [
+        "/m/2.wav", "/m/3.wav", "/m/4.wav"]
+    metrics.clear()
+    assert metrics.summary() == {}
+
+
+def test_export_json_round_trip(tmp_path):
+    metrics = LatencyMetrics()
+    traces = [complete(metrics, "/m/a.wav", 5), complete(metrics, "/m/音乐.wav", 9)]
+    report = {"counters": {"xruns": 2}, "sounds": metrics.summary()}
+
+    path = tmp_path / "report.json"
+    export_json(path, report)
+    assert json.loads(path.read_text(encoding="utf-8")) == report
+
+    export_report(str(path), report, traces)
+    loaded = json.loads(path.read_text(encoding="utf-8"))
+    assert loaded["counters"] == {"xruns": 2}
+    assert [row["music_path"] for row in loaded["traces"]] == [
+        "/m/a.wav", "/m/音乐.wav"]
+    assert loaded["traces"][1]["latency_ms"] == pytest.approx(9.0)
+
+
+def test_export_csv_round_trip(tmp_path):
+    metrics = LatencyMetrics()
+    traces = [complete(metrics, "/m/a.wav", 5, cache_hit=False)]
+    traces[0].decode_ms = 12.5
+
+    path = tmp_path / "report.csv"
+    export_report(str(path), {}, traces)
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 1
+    row = rows[0]
+    assert list(row)[:2] == ["music_path", "latency_ms"]
+    assert row["music_path"] == "/m/a.wav"
+    assert float(row["latency_ms"]) == pytest.approx(5.0)
+    assert float(row["dispatch_ms"]) == pytest.approx(1.0)
+    assert row["cache_hit"] == "False" and float(row["decode_ms"]) == 12.5
+    # 没有 DAC 时间的阶段为空
+    assert row["output_ms"] == ""
+
+    export_csv(path, [])
+    assert path.read_text(encoding="utf-8").strip().split(",")[0] == "music_path"
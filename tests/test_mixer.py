@@ -0,0 +1,97 @@
+import numpy as np
+
+from core.mixer import Mixer, Voice
+from core.stream import BufferSource
+
+
+def voice(key, value=1.0, frames=100, channels=2):
+    data = np.full((frames, channels), value, dtype='float32')
+    return Voice(BufferSource(data, 48000), key, blocksize=16,
+                 out_channels=2)
+
+
+def mix(mixer, frames=16):
+    out = np.zeros((frames, 2), dtype='float32')
+    idle = mixer.mix(out, frames)
+    return out, idle
+
+
+def test_voices_are_summed():
+    mixer = Mixer(4)
+    mixer.add(voice("a", 0.25))
+    mixer.add(voice("b", 0.5))
+    assert mixer.is_playing("a")
+    out, idle = mix(mixer)
+    assert not idle
+    np.testing.assert_allclose(out, 0.75)
+    assert [v.key for v in mixer.voices] == ["a", "b"]
+
+
+def test_slots_are_reused_in_place():
+    mixer = Mixer(2)
+    slots = mixer.slots
+    mixer.add(voice("a"))
+    mixer.add(voice("b"))
+    mix(mixer)
+    mixer.remove("a")
+    mixer.add(voice("c"))
+    mix(mixer)
+    # 槽位列表本身不被替换
+    assert mixer.slots is slots and len(slots) == 2
+    assert [v.key for v in mixer.voices] == ["c", "b"]
+    assert [v.key for v in mixer.finished] == ["a"]
+
+
+def test_oldest_voice_evicted():
+    mixer = Mixer(2)
+    for key in ("a", "b"):
+        mixer.add(voice(key))
+    mix(mixer)
+    mixer.remove("a")
+    mixer.add(voice("c"))
+    mixer.add(voice("d"))
+    mix(mixer)
+    # 槽位用完时淘汰最早开始的 b，而不是槽位靠前的 c
+    assert sorted(v.key for v in mixer.voices) == ["c", "d"]
+    assert [v.key for v in mixer.finished] == ["a", "b"]
+
+
+def test_finished_voices_and_idle():
+    mixer = Mixer(4)
+    mixer.add(voice("short", frames=10))
+    mixer.add(voice("long", frames=40))
+    _, idle = mix(mixer)
+    assert not idle
+    assert [v.key for v in mixer.voices] == ["long"]
+    _, idle = mix(mixer)
+    assert not idle
+    out, idle = mix(mixer)
+    assert idle
+    assert not mixer.active
+    np.testing.assert_allclose(out[:8], 1.0)
+    np.testing.assert_allclose(out[8:], 0.0)
+
+
+def test_clear_and_reset():
+    mixer = Mixer(4)
+    mixer.add(voice("a"))
+    mixer.add(voice(None))
+    mix(mixer)
+    mixer.remove(None)
+    mix(mixer)
+    assert [v.key for v in mixer.voices] == ["a"]
+    mixer.clear()
+    _, idle = mix(mixer)
+    assert idle and mixer.count == 0
+    mixer.add(voice("b"))
+    mix(mixer)
+    mixer.add(voice("c"))
+    assert sorted(v.key for v in mixer.reset()) == ["b", "c"]
+    assert not mixer.active
+
+
+def test_output_gain():
+    mixer = Mixer(2, gain=0.5)
+    mixer.add(voice("a", 0.5))
+    out, _ = mix(mixer)
+    np.testing.assert_allclose(out, 0.25)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core import peaks as peaks_module
+from core.library import LibraryStore
+from core.peaks import BUCKETS, HEADER_SIZE, RECORD_SIZE, PeakCache, compute_peaks
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def write(path, data, samplerate=8000):
+    sf.write(str(path), np.asarray(data, dtype='float32'), samplerate,
+             subtype='FLOAT')
+    return str(path)
+
+
+def test_quantized_min_max(tmp_path):
+    # 前半段 [-0.5, 0.25]，后半段 [-1, 1]
+    half = BUCKETS * 10
+    data = np.concatenate([np.tile([-0.5, 0.25], half // 2),
+                           np.tile([-1.0, 1.0], half // 2)])
+    result = compute_peaks(write(tmp_path / "a.wav", data))
+    assert result.shape == (BUCKETS, 2) and result.dtype == np.int8
+    assert (result[:BUCKETS // 2] == [-64, 32]).all()
+    assert (result[BUCKETS // 2:] == [-127, 127]).all()
+
+
+def test_multichannel_uses_all_channels(tmp_path):
+    data = np.zeros((BUCKETS * 4, 2))
+    data[:, 0] = 0.5
+    data[:, 1] = -0.5
+    result = compute_peaks(write(tmp_path / "a.wav", data))
+    assert (result == [-64, 64]).all()
+
+
+def test_short_file_fills_every_bucket(tmp_path):
+    # 帧数少于桶数时不能有空的桶 (开头不能是平的)
+    data = [0.5, -0.5, 1.0]
+    result = compute_peaks(write(tmp_path / "a.wav", data))
+    assert result.shape == (BUCKETS, 2)
+    assert (result[0] == [64, 64]).all()
+    assert (result[-1] == [127, 127]).all()
+    assert (result != 0).any(axis=1).all()
+
+
+def test_cache_put_get_and_reopen(tmp_path, store):
+    music_path = write(tmp_path / "a.wav", np.full(BUCKETS, 0.5))
+    cache_file = tmp_path / "peaks.bin"
+    cache = PeakCache(cache_file, store)
+    assert cache.get(music_path) is None
+    assert cache.compute([music_path]) == 1
+    expected = cache.get(music_path)
+    assert (expected == [64, 64]).all()
+    # 未变化的文件不再计算
+    assert cache.compute([music_path]) == 0
+    cache.close()
+    store.flush()
+    assert (tmp_path / "peaks.bin").stat().st_size == HEADER_SIZE + RECORD_SIZE
+
+    reopened = PeakCache(cache_file, store)
+    reopened.load()
+    np.testing.assert_array_equal(reopened.get(music_path), expected)
+    reopened.close()
+
+
+def test_invalidate_reuses_slot(tmp_path, store):
+    a = write(tmp_path / "a.wav", np.full(BUCKETS, 0.5))
+    b = write(tmp_path / "b.wav", np.full(BUCKETS, -0.25))
+    cache = PeakCache(tmp_path / "peaks.bin", store)
+    cache.compute([a])
+    cache.invalidate(a)
+    assert cache.get(a) is None
+    cache.compute([b])
+    # b 使用 a 空出的记录
+    assert cache._index[b][2] == 0
+    assert (cache.get(b) == [-32, -32]).all()
+    cache.close()
+
+
+def test_changed_file_recomputed(tmp_path, store):
+    music_path = write(tmp_path / "a.wav", np.full(BUCKETS, 0.5))
+    cache = PeakCache(tmp_path / "peaks.bin", store)
+    cache.compute([music_path])
+    write(music_path, np.full(BUCKETS * 2, 0.25))
+    assert cache.compute([music_path]) == 1
+    assert (cache.get(music_path) == [32, 32]).all()
+    cache.close()
+
+
+def test_bad_header_discards_index(tmp_path, store):
+    music_path = write(tmp_path / "a.wav", np.full(BUCKETS, 0.5))
+    cache_file = tmp_path / "peaks.bin"
+    cache = PeakCache(cache_file, store)
+    cache.compute([music_path])
+    cache.close()
+    store.flush()
+    cache_file.write_bytes(b"garbage")
+    reopened = PeakCache(cache_file, store)
+    reopened.load()
+    assert reopened.get(music_path) is None
+    reopened.close()
+
+
+def test_process_pool(tmp_path, store, monkeypatch):
+    assert peaks_module.POOL_CONTEXT.get_start_method() == "spawn"
+    monkeypatch.setattr(peaks_module, "PROCESS_POOL_THRESHOLD", 2)
+    paths = [write(tmp_path / f"{i}.wav", np.full(BUCKETS, 0.5))
+             for i in range(2)]
+    ready = []
+    cache = PeakCache(tmp_path / "peaks.bin", store)
+    assert cache.compute(paths, workers=2, on_ready=ready.extend) == 2
+    assert sorted(ready) == sorted(paths)
+    cache.close()
@@ -0,0 +1,109 @@
+import random
+
+import numpy as np
+import pytest
+
+from core.playlist import LOOP, SEQUENTIAL, SHUFFLE, PlayQueue
+from core.stream import BufferSource, ChainSource
+
+PATHS = ["a", "b", "c", "d"]
+
+
+def drain(queue, limit=20):
+    order = []
+    while len(order) < limit:
+        music_path = queue.next()
+        if music_path is None:
+            break
+        order.append(music_path)
+    return order
+
+
+def test_sequential():
+    assert drain(PlayQueue(PATHS, SEQUENTIAL)) == PATHS
+    assert drain(PlayQueue([], SEQUENTIAL)) == []
+
+
+def test_shuffle_plays_each_once():
+    queue = PlayQueue(PATHS, SHUFFLE, rng=random.Random(3))
+    order = drain(queue)
+    assert sorted(order) == PATHS
+    expected = list(PATHS)
+    random.Random(3).shuffle(expected)
+    assert order == expected
+
+
+def test_loop_repeats():
+    assert drain(PlayQueue(PATHS, LOOP), limit=10) == (PATHS * 3)[:10]
+
+
+def test_skip_removes_bad_file():
+    queue = PlayQueue(PATHS, LOOP)
+    assert queue.next() == "a"
+    assert queue.next() == "b"
+    queue.skip("b")
+    assert drain(queue, limit=6) == ["c", "d", "a", "c", "d", "a"]
+    # 不是刚取出的路径时不改变队列
+    queue.skip("d")
+    assert len(queue) == 3
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        PlayQueue(PATHS, "random")
+
+
+def source(value, frames, channels=2):
+    return BufferSource(np.full((frames, channels), value, dtype='float32'),
+                        48000)
+
+
+def test_chain_gapless_handoff():
+    advances = []
+    chain = ChainSource(source(1, 5), key="a",
+                        on_advance=lambda: advances.append(True))
+    chain.set_next(source(2, 5), gain=0.5, key="b")
+    out = np.zeros((8, 2), dtype='float32')
+    # 一次读取跨过两首的边界，中间没有静音
+    assert chain.read(out) == 8
+    # 第二首的增益为 0.5
+    assert out[:, 0].tolist() == [1] * 5 + [1.0] * 3
+    assert advances == [True]
+    assert chain.key == "b"
+    assert not chain.finished
+    assert chain.read(out) == 2
+    assert out[:2, 0].tolist() == [1.0, 1.0]
+    assert chain.finished
+
+
+def test_chain_waits_for_next_source():
+    chain = ChainSource(source(1, 3), key="a")
+    chain.more = True
+    out = np.ones((5, 2), dtype='float32')
+    # 下一首还没准备好时补静音，不结束
+    assert chain.read(out) == 5
+    assert out[:, 0].tolist() == [1, 1, 1, 0, 0]
+    assert not chain.finished
+    chain.set_next(source(3, 2), key="b")
+    chain.more = False
+    assert chain.read(out) == 2
+    assert out[:2, 0].tolist() == [3, 3]
+    assert chain.key == "b"
+    assert chain.finished
+
+
+def test_chain_tap_and_release():
+    first, second = source(1, 4), source(2, 4)
+    chain = ChainSource(first, key="a")
+    tap = chain.tap()
+    chain.set_next(second, key="b")
+    out = np.zeros((6, 2), dtype='float32')
+    assert chain.read(out) == 6
+    mirror = np.zeros((6, 2), dtype='float32')
+    assert tap.read(mirror) == 6
+    np.testing.assert_array_equal(out, mirror)
+    chain.release()
+    assert chain._segments[0] is None
+    assert chain.read(out) == 2
+    assert tap.read(mirror) == 2
+    assert chain.finished and tap.finished
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from core.resample import Resampler, convert, remix
+
+
+def tone(freq, samplerate, seconds=1.0, channels=1):
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    data = np.sin(2 * np.pi * freq * t).astype('float32')
+    return np.repeat(data[:, None], channels, axis=1)
+
+
+def peak_amplitude(data):
+    """去掉首尾过渡后，频谱中最大分量的幅度"""
+    data = data[len(data) // 4:3 * len(data) // 4, 0]
+    window = np.hanning(len(data))
+    spectrum = np.abs(np.fft.rfft(data * window)) / (window.sum() / 2)
+    return spectrum.max()
+
+
+@pytest.mark.parametrize("src,dst", [(48000, 44100), (44100, 48000),
+                                     (22050, 48000), (96000, 44100)])
+def test_output_length(src, dst):
+    for frames in (0, 1, 7, 1000, src):
+        data = np.zeros((frames, 2), dtype='float32')
+        out = convert(data, src, dst, 2)
+        assert out.shape == (-(-frames * dst // src), 2)
+        assert out.dtype == np.float32
+
+
+def test_same_rate_passthrough():
+    data = tone(1000, 48000, 0.1, channels=2)
+    np.testing.assert_array_equal(convert(data, 48000, 48000, 2), data)
+
+
+@pytest.mark.parametrize("src,dst", [(48000, 44100), (44100, 48000)])
+def test_chunked_matches_whole(src, dst):
+    rng = np.random.default_rng(1)
+    data = rng.uniform(-1, 1, (src // 2, 2)).astype('float32')
+    whole = Resampler(src, dst, 2).process(data, final=True)
+    resampler = Resampler(src, dst, 2)
+    parts = []
+    pos = 0
+    # 包括比滤波器长度还短的块
+    for size in (1, 5, 17, 1024, 3, 4096, 10000):
+        parts.append(resampler.process(data[pos:pos + size]))
+        pos += size
+    parts.append(resampler.process(data[pos:], final=True))
+    chunked = np.concatenate(parts)
+    assert chunked.shape == whole.shape
+    np.testing.assert_allclose(chunked, whole, atol=1e-5)
+
+
+@pytest.mark.parametrize("freq", [440, 5000, 18000])
+def test_passband(freq):
+    out = convert(tone(freq, 48000), 48000, 44100, 1)
+    assert peak_amplitude(out) == pytest.approx(1.0, abs=0.01)
+
+
+@pytest.mark.parametrize("freq", [22500, 23000, 24000 - 100])
+def test_stopband_rejection(freq):
+    # 高于 44.1k 的 Nyquist 频率的成分降采样后会混叠到可听频段
+    out = convert(tone(freq, 48000), 48000, 44100, 1)
+    assert 20 * np.log10(peak_amplitude(out)) < -60
+
+
+def test_upsample_no_images():
+    out = convert(tone(10000, 44100), 44100, 48000, 1)
+    data = out[len(out) // 4:3 * len(out) // 4, 0]
+    window = np.hanning(len(data))
+    spectrum = np.abs(np.fft.rfft(data * window)) / (window.sum() / 2)
+    freqs = np.fft.rfftfreq(len(data), 1 / 48000)
+    # 原采样率 Nyquist 频率以上没有镜像
+    assert spectrum[freqs > 22050].max() < 1e-3
+
+
+def test_remix():
+    stereo = np.array([[1.0, 0.0], [0.5, 0.5]], dtype='float32')
+    np.testing.assert_allclose(remix(stereo, 1), [[0.5], [0.5]])
+    assert remix(stereo[:, :1], 2).shape == (2, 2)
+    assert remix(np.zeros((3, 6), dtype='float32'), 2).shape == (3, 2)
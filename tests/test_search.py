@@ -0,0 +1,117 @@
+from core import search
+from core.search import SearchIndex
+
+GROUPS = {
+    "Drums": ["/sfx/drums/Kick Hard.wav", "/sfx/drums/snare roll.wav"],
+    "Horns": ["/sfx/brass/Air Horn.wav", "/sfx/brass/horn long.wav"],
+}
+
+
+def make_index(groups=GROUPS):
+    index = SearchIndex()
+    index.rebuild({name: list(paths) for name, paths in groups.items()})
+    return index
+
+
+def test_prefix_and_substring():
+    index = make_index()
+    assert index.search("kick") == [("Drums", "/sfx/drums/Kick Hard.wav")]
+    # 前缀匹配排在子串匹配之前
+    assert index.search("horn") == [("Horns", "/sfx/brass/horn long.wav"),
+                                    ("Horns", "/sfx/brass/Air Horn.wav")]
+    # 少于 3 个字符只按前缀查找文件名
+    assert index.search("sn") == [("Drums", "/sfx/drums/snare roll.wav")]
+    assert index.search("  ") == []
+    assert index.search("xyz") == []
+
+
+def test_group_and_directory_tags():
+    index = make_index()
+    assert {key for key in index.search("drums")} == {
+        ("Drums", p) for p in GROUPS["Drums"]}
+    assert {key for key in index.search("brass")} == {
+        ("Horns", p) for p in GROUPS["Horns"]}
+    # 所有词都要匹配，可以分别匹配文件名和分组名
+    assert index.search("horns air") == [("Horns", "/sfx/brass/Air Horn.wav")]
+    assert index.search("drums horn") == []
+
+
+def test_add_and_remove():
+    index = make_index()
+    index.add("Drums", ["/sfx/drums/kick soft.wav"])
+    assert len(index.search("kick")) == 2
+    index.remove("Drums", "/sfx/drums/Kick Hard.wav")
+    assert index.search("kick") == [("Drums", "/sfx/drums/kick soft.wav")]
+    assert index.search("hard") == []
+    # 重复添加不会产生重复的结果
+    index.add("Drums", ["/sfx/drums/kick soft.wav"])
+    assert len(index.search("kick")) == 1
+    assert len(index) == 4
+
+
+def test_same_path_in_two_groups():
+    index = make_index()
+    index.add("Favourites", ["/sfx/brass/Air Horn.wav"])
+    assert set(index.search("air")) == {
+        ("Horns", "/sfx/brass/Air Horn.wav"),
+        ("Favourites", "/sfx/brass/Air Horn.wav")}
+    index.remove("Horns", "/sfx/brass/Air Horn.wav")
+    assert index.search("air") == [("Favourites", "/sfx/brass/Air Horn.wav")]
+
+
+def test_move():
+    index = make_index()
+    index.move("/sfx/drums/snare roll.wav", "Drums", "Horns")
+    assert index.search("snare") == [("Horns", "/sfx/drums/snare roll.wav")]
+    assert index.search("horns snare") == [("Horns", "/sfx/drums/snare roll.wav")]
+    assert index.search("drums snare") == [("Horns", "/sfx/drums/snare roll.wav")]  # 目录仍是 drums
+    assert ("Drums", "/sfx/drums/snare roll.wav") not in index.search("drums")
+
+
+def test_move_into_group_that_has_the_path():
+    index = make_index()
+    index.add("Favourites", ["/sfx/drums/Kick Hard.wav"])
+    index.move("/sfx/drums/Kick Hard.wav", "Drums", "Favourites")
+    assert index.search("kick") == [("Favourites", "/sfx/drums/Kick Hard.wav")]
+    assert len(index) == 4
+
+
+def test_remove_group():
+    index = make_index()
+    index.remove_group("Horns")
+    assert index.search("horn") == []
+    assert len(index.search("drums")) == 2
+    assert len(index) == 2
+
+
+def test_compaction_keeps_results():
+    index = SearchIndex()
+    paths = [f"/lib/track {i:04d}.wav" for i in range(3000)]
+    index.add("All", paths)
+    for path in paths[:2500]:
+        index.remove("All", path)
+    # 失效条目多于有效条目时整体重建
+    assert index._dead < 2500
+    assert len(index) == 500
+    assert index.search("track 2999") == [("All", "/lib/track 2999.wav")]
+    assert index.search("track 0001") == []
+    assert len(index.search("track", limit=1000)) == 500
+
+
+def test_pool_limits_candidates(monkeypatch):
+    monkeypatch.setattr(search, "POOL_SIZE", 10)
+    index = SearchIndex()
+    index.add("All", [f"/lib/kick {i}.wav" for i in range(50)])
+    assert len(index.search("kick", limit=100)) == 10
+
+
+def test_group_named_like_a_directory():
+    # 分组名与目录路径相同，删除其中一个不影响另一个的查找
+    index = make_index({"/sfx/drums": ["/other/clap.wav"],
+                        "Drums": ["/sfx/drums/Kick Hard.wav"]})
+    index.remove_group("/sfx/drums")
+    assert index.search("sfx") == [("Drums", "/sfx/drums/Kick Hard.wav")]
+    index.remove("Drums", "/sfx/drums/Kick Hard.wav")
+    index.add("/sfx/drums", ["/other/clap.wav"])
+    assert index.search("sfx") == [("/sfx/drums", "/other/clap.wav")]
+    assert index.search("clap sfx") == [("/sfx/drums", "/other/clap.wav")]
@@ -0,0 +1,49 @@
+import numpy as np
+import soundfile as sf
+from PyQt5.QtCore import QSettings
+
+from core.backends import FakeAudioBackend
+from core.library import LibraryStore
+from core.service import PlayerService
+
+
+def make_service(tmp_path):
+    settings = QSettings(str(tmp_path / "settings.ini"), QSettings.IniFormat)
+    return PlayerService(tmp_path / "config", settings,
+                         audio_backend=FakeAudioBackend(samplerate=8000))
+
+
+def test_close_waits_for_analysis(tmp_path):
+    music_paths = []
+    for i in range(3):
+        path = str(tmp_path / f"{i}.wav")
+        sf.write(path, np.full(8000, 0.1 * (i + 1), dtype=np.float32), 8000)
+        music_paths.append(path)
+
+    service = make_service(tmp_path)
+    service.start()
+    service.analyze(music_paths)
+    tasks = list(service._tasks)
+    service.close()
+
+    # 后台任务在音乐库和波形文件关闭之前结束
+    assert not any(t.is_alive() for t in tasks)
+    assert not service.controller._thread.is_alive()
+    assert not service.library._thread.is_alive()
+    assert service.peaks._file is None
+
+    # 关闭前完成的分析都已保存
+    store = LibraryStore(tmp_path / "config" / "library.db")
+    try:
+        assert set(store.load_analysis()) <= set(music_paths)
+    finally:
+        store.close()
+
+
+def test_no_tasks_after_close(tmp_path):
+    service = make_service(tmp_path)
+    service.start()
+    service.close()
+    service.analyze([str(tmp_path / "a.wav")])
+    service.warm([str(tmp_path / "a.wav")])
+    assert not service._tasks
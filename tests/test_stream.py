@@ -0,0 +1,197 @@
+import time
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.stream import BufferSource, RingBuffer, StreamingSource, should_stream
+
+
+def frames(start, n, channels=1):
+    """第 i 帧的值为 i，便于检查读到的是哪一段"""
+    data = np.arange(start, start + n, dtype='float32')
+    return np.repeat(data[:, None], channels, axis=1)
+
+
+def test_buffer_source_and_tap():
+    source = BufferSource(frames(0, 10, 2), 48000)
+    tap = source.tap()
+    out = np.zeros((4, 2), dtype='float32')
+    assert source.read(out) == 4
+    assert out[:, 0].tolist() == [0, 1, 2, 3]
+    assert tap.read(out) == 4
+    assert out[:, 0].tolist() == [0, 1, 2, 3]
+    assert source.read(np.zeros((8, 2), dtype='float32')) == 6
+    assert source.finished
+    assert not tap.finished
+
+
+def test_ring_wraparound():
+    ring = RingBuffer(8, 1)
+    out = np.zeros((8, 1), dtype='float32')
+    position = 0
+    for _ in range(10):
+        # 每次写 5 帧、读 5 帧，写入位置不断跨过缓冲区末尾
+        assert ring.space >= 5
+        ring.write(frames(position, 5))
+        assert ring.available() == 5
+        assert ring.read(out[:5]) == 5
+        assert out[:5, 0].tolist() == list(range(position, position + 5))
+        position += 5
+    assert ring.available() == 0
+    assert ring.read(out) == 0
+
+
+def test_ring_space_follows_fastest_reader():
+    ring = RingBuffer(8, 1)
+    slow = ring.add_reader()
+    ring.write(frames(0, 6))
+    out = np.zeros((6, 1), dtype='float32')
+    ring.read(out)
+    # 最快的读取者已读完，慢的读取者不占用可写空间
+    assert ring.space == 8
+    assert ring.available(slow) == 6
+
+
+def test_slow_reader_skips_ahead():
+    ring = RingBuffer(8, 1, margin=2)
+    slow = ring.add_reader()
+    out = np.zeros((8, 1), dtype='float32')
+    position = 0
+    for _ in range(4):
+        ring.write(frames(position, 4))
+        ring.read(out[:4])
+        position += 4
+    # 慢的读取者落后 16 帧，数据已被覆盖，直接跳到最快读取者的位置
+    assert ring.available(slow) == 16
+    assert ring.read(out, slow) == 0
+    ring.write(frames(position, 3))
+    assert ring.read(out, slow) == 3
+    assert out[:3, 0].tolist() == [16, 17, 18]
+
+
+def test_add_reader_starts_at_oldest_data():
+    ring = RingBuffer(8, 1)
+    ring.write(frames(0, 6))
+    ring.read(np.zeros((2, 1), dtype='float32'))
+    reader = ring.add_reader()
+    out = np.zeros((8, 1), dtype='float32')
+    assert ring.read(out, reader) == 4
+    assert out[:4, 0].tolist() == [2, 3, 4, 5]
+
+
+def read_all(source, block=1000):
+    """等解码线程写够一块再读，结果中不会有解码跟不上时补的静音"""
+    parts = []
+    out = np.zeros((block, source.channels), dtype='float32')
+    deadline = time.monotonic() + 5
+    while not source.finished:
+        assert time.monotonic() < deadline
+        if not source._eof and source._ring.available() < block:
+            time.sleep(0.001)
+            continue
+        n = source.read(out)
+        parts.append(out[:n].copy())
+    assert source.underruns == 0
+    return np.concatenate(parts)
+
+
+@pytest.fixture
+def ramp_file(tmp_path):
+    path = str(tmp_path / "ramp.wav")
+    ramp = (np.arange(48000) % 1000 / 1000).astype('float32')
+    data = np.column_stack([ramp, -ramp])
+    sf.write(path, data, 48000, subtype='FLOAT')
+    return path, data
+
+
+def test_streaming_source_reads_whole_file(ramp_file):
+    path, data = ramp_file
+    source = StreamingSource(path, block_frames=1024, buffer_blocks=4)
+    source.start()
+    out = read_all(source)
+    source.close()
+    np.testing.assert_array_equal(out, data)
+
+
+def test_streaming_source_range(ramp_file):
+    path, data = ramp_file
+    source = StreamingSource(path, start_s=0.25, end_s=0.5, block_frames=1024)
+    source.start()
+    out = read_all(source)
+    source.close()
+    np.testing.assert_array_equal(out, data[12000:24000])
+
+
+def test_streaming_source_resamples(ramp_file):
+    path, _ = ramp_file
+    source = StreamingSource(path, samplerate=44100, channels=1,
+                             block_frames=1024)
+    source.start()
+    out = read_all(source)
+    source.close()
+    assert out.shape == (44100, 1)
+
+
+def test_streaming_tap_reads_same_data(ramp_file):
+    path, _ = ramp_file
+    source = StreamingSource(path, block_frames=1024, buffer_blocks=64)
+    source.start()
+    tap = source.tap()
+    block = np.zeros((512, 2), dtype='float32')
+    mirror = np.zeros((512, 2), dtype='float32')
+    n = source.read(block)
+    assert tap.read(mirror) == n
+    np.testing.assert_array_equal(block, mirror)
+    source.close()
+
+
+class _SlowFile:
+    """读取时可以被挡住的 SoundFile，模拟读取线程卡在一次慢速读取中"""
+
+    def __init__(self, file):
+        self.file = file
+        self.blocking = False
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def read(self, *args, **kwargs):
+        if self.blocking:
+            self.entered.set()
+            self.release.wait(5)
+        return self.file.read(*args, **kwargs)
+
+    def close(self):
+        self.file.close()
+
+
+def test_close_does_not_close_file_under_reader(ramp_file):
+    path, _ = ramp_file
+    source = StreamingSource(path, block_frames=256, buffer_blocks=64)
+    slow = source._file = _SlowFile(source._file)
+    source.start()
+    slow.blocking = True
+    assert slow.entered.wait(5)
+
+    # 等待超时后返回，读取中的文件仍然打开
+    source.close(timeout=0.05)
+    assert source._eof and not slow.file.closed
+    slow.release.set()
+    source._thread.join(5)
+    assert slow.file.closed
+
+
+def test_close_without_reader_closes_file(ramp_file):
+    path, _ = ramp_file
+    source = StreamingSource(path)
+    source.close()
+    assert source._file.closed
+
+
+def test_should_stream(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"x" * 100)
+    assert should_stream(str(path), 50)
+    assert not should_stream(str(path), 100)
+    assert not should_stream(str(tmp_path / "missing"), 0)
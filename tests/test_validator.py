@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.library import LibraryStore
+from core.validator import (MISSING, OK, UNREADABLE, TrackInfo,
+                            format_duration, validate_paths)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def write(path, seconds=1.5, samplerate=8000, channels=2):
+    sf.write(str(path), np.zeros((int(seconds * samplerate), channels),
+                                 dtype=np.float32), samplerate)
+    return str(path)
+
+
+@pytest.mark.parametrize("seconds, text", [
+    (0, "0:00"), (59.4, "0:59"), (59.6, "1:00"), (125, "2:05"),
+    (3599.4, "59:59"), (3600, "1:00:00"), (3725, "1:02:05")])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
+
+
+def test_classifies_files(tmp_path):
+    ok = write(tmp_path / "ok.wav")
+    missing = str(tmp_path / "missing.wav")
+    broken = str(tmp_path / "broken.wav")
+    with open(broken, "wb") as f:
+        f.write(b"RIFF not really")
+    directory = str(tmp_path / "dir.wav")
+    os.mkdir(directory)
+
+    result = validate_paths([ok, missing, broken, directory, ok])
+    assert list(result) == [ok, missing, broken, directory]
+    assert result[ok] == TrackInfo(OK, 1.5, 8000, 2)
+    assert result[missing].status == MISSING
+    assert result[broken].status == UNREADABLE
+    assert result[directory].status == UNREADABLE
+
+
+def test_info_cached_by_mtime_and_size(tmp_path, store):
+    music_path = write(tmp_path / "a.wav")
+    assert validate_paths([music_path], store)[music_path].duration == 1.5
+    store.flush()
+    st = os.stat(music_path)
+    assert store.load_track_info()[music_path] == (
+        st.st_mtime_ns, st.st_size, 1.5, 8000, 2)
+
+    # 未变化的文件直接使用缓存的信息，不再读取文件
+    with open(music_path, "r+b") as f:
+        f.write(b"XXXX")
+    os.utime(music_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert validate_paths([music_path], store)[music_path] == \
+        TrackInfo(OK, 1.5, 8000, 2)
+
+    # 文件变化后重新读取
+    write(music_path, seconds=3, channels=1)
+    os.utime(music_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**10))
+    assert validate_paths([music_path], store)[music_path] == \
+        TrackInfo(OK, 3.0, 8000, 1)
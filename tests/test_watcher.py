@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from core.library import LibraryStore
+from core.watcher import FolderWatcher
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(tmp_path / "library.db", delay=0)
+    yield store
+    store.close()
+
+
+def write(path, frames=800):
+    sf.write(str(path), np.zeros(frames, dtype='float32'), 8000)
+    return str(path)
+
+
+def bump_mtime(path, seconds=10):
+    # 文件系统的时间精度可能很粗，直接把修改时间往后推
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    root = tmp_path / "music"
+    (root / "sub").mkdir(parents=True)
+    write(root / "a.wav")
+    write(root / "sub" / "b.wav")
+    (root / "notes.txt").write_text("not audio")
+    return str(root)
+
+
+def make_watcher(store):
+    changes = []
+    watcher = FolderWatcher(
+        store, lambda *args: changes.append(args), interval=60)
+    return watcher, changes
+
+
+def test_detects_added_and_removed_files(store, music_dir):
+    watcher, changes = make_watcher(store)
+    watcher._watch(music_dir, "g")
+
+    new = write(os.path.join(music_dir, "sub", "c.wav"))
+    os.remove(os.path.join(music_dir, "a.wav"))
+    bump_mtime(music_dir)
+    bump_mtime(os.path.join(music_dir, "sub"))
+    watcher._poll_all()
+
+    assert changes == [("g", [new], [os.path.join(music_dir, "a.wav")], [])]
+    watcher._poll_all()
+    assert len(changes) == 1
+
+
+def test_detects_in_place_rewrite(store, music_dir):
+    watcher, changes = make_watcher(store)
+    watcher._watch(music_dir, "g")
+    path = os.path.join(music_dir, "sub", "b.wav")
+    dir_mtime = os.stat(os.path.dirname(path)).st_mtime_ns
+
+    write(path, frames=1600)
+    bump_mtime(path)
+    # 原地改写不改变目录的 mtime
+    assert os.stat(os.path.dirname(path)).st_mtime_ns == dir_mtime
+    watcher._poll_all()
+    assert changes == [("g", [], [], [path])]
+
+
+def test_unreadable_file_waits_until_complete(store, music_dir):
+    watcher, changes = make_watcher(store)
+    watcher._watch(music_dir, "g")
+
+    # 仍在复制中的文件无法解析，完整后再加入
+    path = os.path.join(music_dir, "partial.wav")
+    with open(path, "wb") as f:
+        f.write(b"RIFF")
+    bump_mtime(music_dir)
+    watcher._poll_all()
+    assert changes == []
+
+    write(path)
+    bump_mtime(path)
+    watcher._poll_all()
+    assert changes == [("g", [path], [], [])]
+
+
+def test_removed_subdirectory(store, music_dir):
+    watcher, changes = make_watcher(store)
+    watcher._watch(music_dir, "g")
+    path = os.path.join(music_dir, "sub", "b.wav")
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    watcher._poll_all()
+    assert changes == [("g", [], [path], [])]
+
+
+def test_changes_while_stopped_are_found_on_start(store, music_dir):
+    watcher, _ = make_watcher(store)
+    watcher._watch(music_dir, "g")
+    store.flush()
+
+    path = os.path.join(music_dir, "a.wav")
+    write(path, frames=1600)
+    bump_mtime(path)
+
+    # 重新启动时从数据库加载索引并检查一次
+    watcher, changes = make_watcher(store)
+    watcher.start()
+    watcher.stop()
+    watcher._thread.join(5)
+    assert changes == [("g", [], [], [path])]
+
+
+def test_missing_root_is_left_alone(store, tmp_path):
+    watcher, changes = make_watcher(store)
+    root = str(tmp_path / "music")
+    os.mkdir(root)
+    write(os.path.join(root, "a.wav"))
+    watcher._watch(root, "g")
+
+    # 例如移动硬盘未连接
+    os.rename(root, root + ".offline")
+    watcher._poll_all()
+    assert changes == []
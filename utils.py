@@ -1,5 +1,6 @@
 import sys
 import os
+import time
 
 def resource_path(relative_path):
     """ 获取资源的绝对路径，适用于 PyInstaller """
@@ -7,4 +8,23 @@ def resource_path(relative_path):
         base_path = sys._MEIPASS
     except Exception:
         base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
\ No newline at end of file
+    return os.path.join(base_path, relative_path)
+
+class StartupProfiler:
+    """ 记录启动各阶段耗时，--startup-profile 时输出到标准输出 """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def mark(self, phase, started=None):
+        """ 记录一个阶段结束，started 为该阶段的开始时间，默认从上一个阶段结束算起 """
+        now = time.perf_counter()
+        if started is None:
+            started, self.last = self.last, now
+        if self.enabled:
+            # 各阶段可能在不同线程中结束，一次写入整行避免输出交错
+            sys.stdout.write(f"[startup] {phase}: {(now - started) * 1000:.1f} ms "
+                             f"(累计 {(now - self.start) * 1000:.1f} ms)\n")
+            sys.stdout.flush()